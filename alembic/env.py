@@ -1,6 +1,7 @@
 # alembic/env.py
 import sys
 import os
+import logging
 from logging.config import fileConfig
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
@@ -30,9 +31,11 @@ except ImportError:
         from models import Base
         target_metadata = Base.metadata
     except ImportError as e:
-        print(f"Error importing models: {e}")
-        print(f"Current working directory: {os.getcwd()}")
-        print(f"sys.path: {sys.path}")
+        # Логи alembic настраиваются из alembic.ini (fileConfig выше)
+        logger = logging.getLogger("alembic.env")
+        logger.error(f"Error importing models: {e}")
+        logger.error(f"Current working directory: {os.getcwd()}")
+        logger.error(f"sys.path: {sys.path}")
         raise
 
 def run_migrations_offline() -> None:
@@ -0,0 +1,135 @@
+"""Partition report by month on Postgres
+
+Revision ID: 3b9d2c7a1e54
+Revises: f4d86381a83e
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d2c7a1e54'
+down_revision: Union[str, None] = 'f4d86381a83e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сколько месяцев вперед создать сразу; дальше их создает задача планировщика
+MONTHS_AHEAD = 3
+
+
+def _add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_indexes() -> None:
+    op.create_index('ix_report_report_date', 'report', ['report_date'])
+    op.create_index(
+        'ix_report_employee_id_report_date', 'report', ['employee_id', 'report_date']
+    )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # Секционирование только для Postgres, остальным достаточно индексов
+        _create_indexes()
+        return
+
+    # Старая таблица уходит в сторону, последовательность id переходит к новой
+    op.execute("ALTER TABLE report RENAME TO report_legacy")
+    op.execute("ALTER TABLE report_legacy ALTER COLUMN id DROP DEFAULT")
+    op.execute("ALTER SEQUENCE report_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE report_legacy RENAME CONSTRAINT report_pkey TO report_legacy_pkey")
+
+    # Ключ секционирования обязан входить в первичный ключ
+    op.execute("""
+        CREATE TABLE report (
+            id INTEGER NOT NULL DEFAULT nextval('report_id_seq'),
+            report_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            total_income NUMERIC(10, 2) NOT NULL,
+            cash NUMERIC(10, 2) NOT NULL,
+            cashless NUMERIC(10, 2) NOT NULL,
+            cash_balance NUMERIC(10, 2) NOT NULL,
+            clients_count INTEGER NOT NULL,
+            cash_to_suppliers NUMERIC(10, 2) NOT NULL,
+            cashless_to_suppliers NUMERIC(10, 2) NOT NULL,
+            version INTEGER NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            employee_id INTEGER NOT NULL REFERENCES employee (id),
+            branch_id INTEGER NOT NULL REFERENCES branch (id),
+            PRIMARY KEY (id, report_date)
+        ) PARTITION BY RANGE (report_date)
+    """)
+
+    bounds = bind.execute(sa.text(
+        "SELECT min(report_date), max(report_date) FROM report_legacy"
+    )).one()
+    today = datetime.utcnow().date().replace(day=1)
+    first = bounds[0].date().replace(day=1) if bounds[0] else today
+    last = max(bounds[1].date().replace(day=1) if bounds[1] else today, today)
+    last = _add_months(last, MONTHS_AHEAD)
+
+    month = first
+    while month <= last:
+        following = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE report_y{month.year:04d}m{month.month:02d} PARTITION OF report "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+        )
+        month = following
+    # Страховка на случай, если задача планировщика не успела создать месяц
+    op.execute("CREATE TABLE report_default PARTITION OF report DEFAULT")
+
+    _create_indexes()
+
+    op.execute("INSERT INTO report SELECT * FROM report_legacy")
+    op.execute("ALTER SEQUENCE report_id_seq OWNED BY report.id")
+    op.execute("DROP TABLE report_legacy")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        op.drop_index('ix_report_employee_id_report_date', table_name='report')
+        op.drop_index('ix_report_report_date', table_name='report')
+        return
+
+    op.execute("ALTER TABLE report RENAME TO report_partitioned")
+    op.execute("ALTER TABLE report_partitioned ALTER COLUMN id DROP DEFAULT")
+    op.execute("ALTER SEQUENCE report_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE report_partitioned RENAME CONSTRAINT report_pkey TO report_partitioned_pkey")
+    op.execute("ALTER INDEX ix_report_report_date RENAME TO ix_report_partitioned_report_date")
+    op.execute(
+        "ALTER INDEX ix_report_employee_id_report_date "
+        "RENAME TO ix_report_partitioned_employee_id_report_date"
+    )
+
+    op.execute("""
+        CREATE TABLE report (
+            id INTEGER NOT NULL DEFAULT nextval('report_id_seq'),
+            report_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            total_income NUMERIC(10, 2) NOT NULL,
+            cash NUMERIC(10, 2) NOT NULL,
+            cashless NUMERIC(10, 2) NOT NULL,
+            cash_balance NUMERIC(10, 2) NOT NULL,
+            clients_count INTEGER NOT NULL,
+            cash_to_suppliers NUMERIC(10, 2) NOT NULL,
+            cashless_to_suppliers NUMERIC(10, 2) NOT NULL,
+            version INTEGER NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            employee_id INTEGER NOT NULL REFERENCES employee (id),
+            branch_id INTEGER NOT NULL REFERENCES branch (id),
+            CONSTRAINT report_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("INSERT INTO report SELECT * FROM report_partitioned")
+    op.execute("ALTER SEQUENCE report_id_seq OWNED BY report.id")
+    # Вместе с родительской таблицей удаляются и все партиции
+    op.execute("DROP TABLE report_partitioned")
+    _create_indexes()
@@ -0,0 +1,50 @@
+"""Add report archive table
+
+Revision ID: 8e2f4a6c0d13
+Revises: 3b9d2c7a1e54
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2f4a6c0d13'
+down_revision: Union[str, None] = '3b9d2c7a1e54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('report_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('report_date', sa.DateTime(), nullable=False),
+    sa.Column('total_income', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('cash', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('cashless', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('cash_balance', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('clients_count', sa.Integer(), nullable=False),
+    sa.Column('cash_to_suppliers', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('cashless_to_suppliers', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('branch_id', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['branch_id'], ['branch.id'], ),
+    sa.ForeignKeyConstraint(['employee_id'], ['employee.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_report_archive_report_date', 'report_archive', ['report_date'])
+    op.create_index(
+        'ix_report_archive_employee_id_report_date', 'report_archive', ['employee_id', 'report_date']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_report_archive_employee_id_report_date', table_name='report_archive')
+    op.drop_index('ix_report_archive_report_date', table_name='report_archive')
+    op.drop_table('report_archive')
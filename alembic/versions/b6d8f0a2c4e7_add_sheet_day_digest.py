@@ -0,0 +1,32 @@
+"""Add sheet day digest table
+
+Revision ID: b6d8f0a2c4e7
+Revises: a2c4e6f8b0d1
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d8f0a2c4e7'
+down_revision: Union[str, None] = 'a2c4e6f8b0d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('sheet_day_digest',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('signature', sa.String(length=128), nullable=False),
+    sa.Column('digest', sa.String(length=64), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sheet_day_digest')
@@ -0,0 +1,34 @@
+"""Add change log for cache invalidation
+
+Revision ID: c5a7e9b1d3f2
+Revises: 8e2f4a6c0d13
+Create Date: 2026-10-19 15:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a7e9b1d3f2'
+down_revision: Union[str, None] = '8e2f4a6c0d13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # На Postgres таблица не используется (там NOTIFY), но схема одна для всех
+    op.create_table('change_log',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=32), nullable=False),
+    sa.Column('key', sa.String(length=64), nullable=True),
+    sa.Column('origin', sa.String(length=16), nullable=False),
+    sa.Column('published_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('change_log')
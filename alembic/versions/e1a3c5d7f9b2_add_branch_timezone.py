@@ -0,0 +1,27 @@
+"""Add branch timezone
+
+Revision ID: e1a3c5d7f9b2
+Revises: d7b9f1a3c5e4
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1a3c5d7f9b2'
+down_revision: Union[str, None] = 'd7b9f1a3c5e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('branch', sa.Column('timezone', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('branch') as batch_op:
+        batch_op.drop_column('timezone')
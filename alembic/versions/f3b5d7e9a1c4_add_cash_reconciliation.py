@@ -0,0 +1,40 @@
+"""Add cash reconciliation table
+
+Revision ID: f3b5d7e9a1c4
+Revises: e1a3c5d7f9b2
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b5d7e9a1c4'
+down_revision: Union[str, None] = 'e1a3c5d7f9b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('cash_reconciliation',
+    sa.Column('branch_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('cash', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('cash_to_suppliers', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('actual_balance', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('prev_day', sa.Date(), nullable=True),
+    sa.Column('expected_balance', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('difference', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('checked_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['branch_id'], ['branch.id'], ),
+    sa.PrimaryKeyConstraint('branch_id', 'day')
+    )
+    op.create_index('ix_cash_reconciliation_day', 'cash_reconciliation', ['day'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cash_reconciliation_day', table_name='cash_reconciliation')
+    op.drop_table('cash_reconciliation')
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.memory import MemoryStorage
+from config import config
+from middlewares.auth import AuthMiddleware
+from middlewares.log_context import LogContextMiddleware
+from middlewares.throttling import ThrottlingMiddleware
+from middlewares.outbound import OutboundMiddleware
+from middlewares.metrics import HandlerMetricsMiddleware, TelegramApiMetricsMiddleware
+from middlewares.profiler import ProfilerMiddleware
+from handlers import common, employee, owner, admin
+from services.reminders import ReminderService
+from services.scheduler import scheduler
+from services.archiver import report_archiver
+from services.submission_tracker import submission_tracker
+from services.search_index import search_index
+from services.branch_directory import branch_directory
+from services.reconciliation import cash_reconciler
+from services.charts import chart_service
+from services.sheets_reconcile import sheets_reconciler
+from services.backup import sqlite_backup
+from services.metrics_server import metrics_server
+from services.reporting_api import reporting_api
+from services.outbound import TunedAiohttpSession, outbound_gate
+from utils.logger import logger
+from utils.fsm_storage import InstrumentedStorage
+from utils.loop_monitor import loop_monitor
+from database.base import Base
+from database.session import engine
+from database.partitions import ensure_report_partitions
+from database.write_queue import write_queue
+from database.replicas import replica_router
+from database.invalidation import invalidation_bus
+from database.leader import leader
+
+async def on_startup(bot: Bot):
+    logger.info("Bot starting up...")
+    
+    await metrics_server.start()
+    await reporting_api.start()
+    loop_monitor.start()
+    
+    # Создаем таблицы в БД
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    # Кто сдал отчет за сегодня - одним запросом, дальше по событиям шины
+    await submission_tracker.rebuild()
+    # Справочник филиалов (id -> название, часовой пояс)
+    await branch_directory.load()
+    # Поисковый индекс сотрудников и филиалов для /find и inline-режима
+    await search_index.rebuild()
+    
+    # Фоновые задачи и рассылки выполняет только лидер среди экземпляров
+    leader.start()
+    
+    # Запускаем сервис напоминаний
+    reminder_service = ReminderService(bot)
+    asyncio.create_task(reminder_service.start_scheduler())
+    
+    # Фоновые задачи обслуживания БД
+    scheduler.add_job(
+        "report_partitions",
+        lambda: ensure_report_partitions(engine, config.REPORT_PARTITIONS_AHEAD),
+        interval=24 * 3600
+    )
+    scheduler.add_job("report_archive", report_archiver.run, interval=24 * 3600)
+    scheduler.add_job("change_log_prune", invalidation_bus.prune, interval=3600)
+    scheduler.add_job("job_run_prune", scheduler.prune_runs, interval=24 * 3600)
+    # Сверка остатка кассы по дням, затронутым новыми отчетами
+    scheduler.add_job("cash_reconcile", cash_reconciler.run, interval=config.RECONCILE_INTERVAL)
+    if config.SHEETS_RECONCILE_ENABLED:
+        # Догоняет отчеты, не дошедшие до таблицы, и ручные правки листа
+        scheduler.add_job("sheets_reconcile", sheets_reconciler.run, interval=24 * 3600)
+    if sqlite_backup.supported and config.BACKUP_INTERVAL > 0:
+        scheduler.add_job("sqlite_backup", sqlite_backup.run, interval=config.BACKUP_INTERVAL)
+    scheduler.start()
+    invalidation_bus.start()
+    
+    logger.info("Bot started successfully")
+
+async def on_shutdown(bot: Bot):
+    logger.info("Bot shutting down...")
+    await scheduler.stop()
+    await invalidation_bus.stop()
+    await leader.stop()
+    await write_queue.close()
+    await engine.dispose()
+    await replica_router.dispose()
+    await loop_monitor.stop()
+    await metrics_server.stop()
+    await reporting_api.stop()
+    chart_service.close()
+
+def create_bot(**kwargs) -> Bot:
+    kwargs.setdefault("session", TunedAiohttpSession())
+    bot = Bot(token=config.BOT_TOKEN, **kwargs)
+    # Сначала очередь с приоритетами, внутри нее - замер самого вызова
+    bot.session.middleware(OutboundMiddleware(outbound_gate, max_retries=config.OUTBOUND_MAX_RETRIES))
+    bot.session.middleware(TelegramApiMetricsMiddleware())
+    return bot
+
+def create_dispatcher() -> Dispatcher:
+    storage = InstrumentedStorage(MemoryStorage())
+    dp = Dispatcher(storage=storage)
+    
+    # Добавляем конфиг в данные
+    dp["config"] = config
+    
+    # Подключаем middleware
+    dp.update.outer_middleware(LogContextMiddleware())
+    # Ограничение частоты - до авторизации, чтобы флуд не доходил до БД
+    if config.THROTTLE_ENABLED:
+        limits = {
+            kind: (rate, burst)
+            for kind, rate, burst in (
+                ("message", config.THROTTLE_MESSAGE_RATE, config.THROTTLE_MESSAGE_BURST),
+                ("callback", config.THROTTLE_CALLBACK_RATE, config.THROTTLE_CALLBACK_BURST)
+            )
+            if rate > 0
+        }
+        dp.update.outer_middleware(ThrottlingMiddleware(
+            limits,
+            global_limit=(config.THROTTLE_GLOBAL_RATE, config.THROTTLE_GLOBAL_BURST),
+            max_users=config.THROTTLE_MAX_USERS,
+            exempt_ids=frozenset(config.ADMIN_IDS)
+        ))
+    dp.update.outer_middleware(ProfilerMiddleware(
+        sample_rate=config.PROFILER_SAMPLE_RATE,
+        slow_threshold_ms=config.SLOW_UPDATE_THRESHOLD_MS,
+        use_cprofile=config.PROFILER_CPROFILE
+    ))
+    dp.update.outer_middleware(AuthMiddleware())
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    dp.inline_query.middleware(HandlerMetricsMiddleware())
+    
+    # Регистрируем роутеры
+    dp.include_router(common.router)
+    dp.include_router(employee.router)
+    dp.include_router(owner.router)
+    dp.include_router(admin.router)
+    return dp
+
+async def main():
+    # Настройка бота и диспетчера
+    bot = create_bot()
+    dp = create_dispatcher()
+    
+    # Регистрируем обработчики startup/shutdown
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    
+    # Запускаем бота
+    await bot.delete_webhook(drop_pending_updates=True)
+    await dp.start_polling(bot)
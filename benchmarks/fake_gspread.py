@@ -0,0 +1,96 @@
+"""Фейковый бэкенд gspread: таблицы в памяти с настраиваемой задержкой"""
+import itertools
+import re
+import time
+from typing import Dict, List
+
+_sheet_ids = itertools.count(1)
+
+
+def _rows(range_name: str):
+    """Номера первой и последней строки диапазона A1:L100 (с единицы)"""
+    first, last = re.findall(r"\d+", range_name)[:2]
+    return int(first), int(last)
+
+
+class FakeWorksheet:
+    def __init__(self, title: str, latency: float = 0.0):
+        self.title = title
+        self.id = next(_sheet_ids)
+        self.latency = latency
+        self.rows: List[list] = []
+        self.calls = 0
+
+    def _call(self):
+        # gspread синхронный: задержка блокирует поток так же, как настоящий HTTP
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def append_row(self, row, **kwargs):
+        self._call()
+        self.rows.append(list(row))
+
+    def append_rows(self, rows, **kwargs):
+        self._call()
+        self.rows.extend(list(row) for row in rows)
+
+    def clear(self):
+        self._call()
+        self.rows.clear()
+
+    def get_all_values(self, **kwargs):
+        self._call()
+        return [list(row) for row in self.rows]
+
+    @property
+    def row_count(self) -> int:
+        # Как у настоящего листа: сетка больше заполненной части
+        return max(1000, len(self.rows))
+
+    def batch_get(self, ranges, **kwargs):
+        self._call()
+        result = []
+        for range_name in ranges:
+            first, last = _rows(range_name)
+            result.append([list(row) for row in self.rows[first - 1:last]])
+        return result
+
+    def batch_update(self, data, **kwargs):
+        self._call()
+        for item in data:
+            first, _ = _rows(item['range'])
+            for offset, values in enumerate(item['values']):
+                while len(self.rows) < first + offset:
+                    self.rows.append([])
+                self.rows[first + offset - 1] = list(values)
+
+
+class FakeSpreadsheet:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.worksheets: Dict[str, FakeWorksheet] = {}
+        self.calls = 0
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        if title not in self.worksheets:
+            self.worksheets[title] = FakeWorksheet(title, self.latency)
+        return self.worksheets[title]
+
+    def batch_update(self, body):
+        """Поддерживается только deleteDimension по строкам; один запрос на весь пакет"""
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        by_id = {worksheet.id: worksheet for worksheet in self.worksheets.values()}
+        for request in body['requests']:
+            target = request['deleteDimension']['range']
+            del by_id[target['sheetId']].rows[target['startIndex']:target['endIndex']]
+
+
+class FakeGspreadClient:
+    def __init__(self, latency: float = 0.0):
+        self.spreadsheet = FakeSpreadsheet(latency)
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        return self.spreadsheet
@@ -0,0 +1,69 @@
+"""Локальная замена Telegram Bot API для нагрузочных тестов"""
+import asyncio
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from aiohttp import web
+
+
+class FakeTelegramServer:
+    """Принимает вызовы Bot API, записывает их и отвечает валидными объектами"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.calls: List[Dict[str, Any]] = []
+        self._message_id = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def counts(self) -> Counter:
+        return Counter(call['method'] for call in self.calls)
+
+    def _message(self, chat_id: int, text: str) -> Dict[str, Any]:
+        self._message_id += 1
+        return {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": text
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        payload = dict(await request.post())
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.calls.append({
+            'method': method,
+            'chat_id': payload.get("chat_id"),
+            'text': payload.get("text"),
+            'at': time.monotonic()
+        })
+
+        if method in ("sendMessage", "editMessageText"):
+            result: Any = self._message(int(payload.get("chat_id") or 0), payload.get("text", ""))
+        elif method == "getMe":
+            result = {"id": 42, "is_bot": True, "first_name": "LoadTest", "username": "load_test_bot"}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # При port=0 берем порт, выданный системой
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,125 @@
+"""Микробенчмарк стоимости вызова логгера в потоке цикла событий.
+
+Сравнивает прежнюю схему (FileHandler пишет в файл прямо в вызывающем
+потоке) с очередью utils/logger.py: QueueHandler с фильтрами контекста и
+ограничения ошибок, QueueListener с JSON и ротацией в фоновом потоке.
+Замеряется время самого вызова logger.info внутри корутины и отдельно -
+сколько фоновый поток дописывает очередь. Консоль в замер не входит.
+--write-delay-us имитирует медленный диск (задержка на каждую запись в файл):
+в прежней схеме она целиком ложится на цикл событий.
+
+Запуск:
+    python -m benchmarks.logging_bench
+    python -m benchmarks.logging_bench --records 200000 --write-delay-us 200
+"""
+import argparse
+import asyncio
+import logging
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import time
+from logging.handlers import QueueListener
+
+
+class SlowStream:
+    """Обертка файла: каждая запись задерживается, как на занятом диске"""
+
+    def __init__(self, stream, delay: float):
+        self._stream = stream
+        self._delay = delay
+
+    def write(self, text):
+        time.sleep(self._delay)
+        return self._stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def slow_down(handler: logging.StreamHandler, delay: float):
+    if delay > 0:
+        handler.stream = SlowStream(handler.stream, delay)
+
+
+def legacy_logger(path: str, delay: float) -> logging.Logger:
+    logger = logging.getLogger("bench.legacy")
+    logger.propagate = False
+    handler = logging.FileHandler(path, encoding="utf-8")
+    slow_down(handler, delay)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def queued_logger(path: str, queue_size: int, delay: float):
+    from utils.logger import (
+        ContextFilter, DroppingQueueHandler, ErrorRateLimitFilter, JsonFormatter,
+        SizeAndTimeRotatingFileHandler
+    )
+
+    logger = logging.getLogger("bench.queued")
+    logger.propagate = False
+    file_handler = SizeAndTimeRotatingFileHandler(path, max_bytes=50 * 1024 * 1024, interval=86400, backup_count=3)
+    file_handler.setFormatter(JsonFormatter())
+    slow_down(file_handler, delay)
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(ErrorRateLimitFilter(10))
+    handler.addFilter(ContextFilter())
+    listener = QueueListener(handler.queue, file_handler)
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return logger, handler, listener
+
+
+async def measure(logger: logging.Logger, records: int, batch: int = 100) -> list:
+    from utils.logger import log_context
+
+    log_context.set({'update_id': 1, 'user_id': 42, 'handler': "bench.handler"})
+    timings = []
+    for i in range(0, records, batch):
+        start = time.perf_counter()
+        for j in range(batch):
+            logger.info("Report saved: employee=%s version=%s", i + j, 1)
+        timings.append((time.perf_counter() - start) / batch * 1e6)
+        # Даем поработать другим задачам, как в реальном цикле
+        await asyncio.sleep(0)
+    return timings
+
+
+def report(name: str, timings: list, drain: float = 0.0):
+    timings = sorted(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{name:<10}{statistics.median(timings):>10.2f}{p99:>10.2f}{drain * 1000:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарк логирования")
+    parser.add_argument("--records", type=int, default=50_000)
+    parser.add_argument("--write-delay-us", type=float, default=0)
+    args = parser.parse_args()
+    os.environ.setdefault("BOT_TOKEN", "42:LOG-BENCH")
+    delay = args.write_delay_us / 1e6
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'pipeline':<10}{'p50 us':>10}{'p99 us':>10}{'drain ms':>12}")
+
+        legacy = legacy_logger(os.path.join(tmp, "legacy.log"), delay)
+        report("legacy", asyncio.run(measure(legacy, args.records)))
+
+        queued, handler, listener = queued_logger(os.path.join(tmp, "queued.log"), args.records, delay)
+        listener.start()
+        timings = asyncio.run(measure(queued, args.records))
+        start = time.perf_counter()
+        listener.stop()
+        report("queued", timings, time.perf_counter() - start)
+        if handler.dropped:
+            print(f"dropped: {handler.dropped}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Замер накладных расходов инструментирования на один апдейт.
+
+Запуск: python -m benchmarks.metrics_overhead [--batch 50] [--pairs 10] [--api-latency-ms 50]
+
+Вызовы Bot API заменены задержкой --api-latency-ms: бюджет в 2% считается
+от реального апдейта, который почти всегда ждет ответа Telegram.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Message, Update
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from database.instrumentation import instrument_engine, timed_pool_class
+from middlewares.metrics import HandlerMetricsMiddleware, TelegramApiMetricsMiddleware
+from utils.fsm_storage import InstrumentedStorage
+
+BUDGET_PERCENT = 2.0
+DB_URL = "sqlite+aiosqlite:///:memory:"
+
+
+class NullSession(BaseSession):
+    """Сессия бота без сети: вызовы API успешны после фиксированной задержки"""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+
+    async def make_request(self, bot, method, timeout=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return None
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def build(instrumented: bool, api_latency: float = 0.0):
+    if instrumented:
+        engine = create_async_engine(DB_URL, poolclass=timed_pool_class(DB_URL))
+        instrument_engine(engine)
+    else:
+        engine = create_async_engine(DB_URL)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    storage = MemoryStorage()
+    if instrumented:
+        storage = InstrumentedStorage(storage)
+
+    router = Router(name="bench")
+
+    @router.message()
+    async def handle(message: Message, state: FSMContext):
+        # Типичный апдейт: чтение FSM, пара запросов в БД и ответ
+        await state.update_data(last=message.text)
+        await state.get_data()
+        async with session_maker() as session:
+            await session.execute(text("SELECT 1"))
+            await session.execute(text("SELECT 2"))
+        await message.answer("ok")
+
+    dp = Dispatcher(storage=storage)
+    dp.include_router(router)
+    bot = Bot(token="42:BENCHMARK", session=NullSession(api_latency))
+    if instrumented:
+        dp.message.middleware(HandlerMetricsMiddleware())
+        bot.session.middleware(TelegramApiMetricsMiddleware())
+    return dp, bot, engine
+
+
+def make_update(update_id: int) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(datetime.now().timestamp()),
+            "chat": {"id": 1000 + update_id % 50, "type": "private"},
+            "from": {"id": 1000 + update_id % 50, "is_bot": False, "first_name": "Bench"},
+            "text": str(update_id)
+        }
+    })
+
+
+async def run_batch(dp, bot, updates) -> float:
+    start = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - start) / len(updates)
+
+
+async def main(batch_size: int, pairs: int, api_latency: float) -> int:
+    updates = [make_update(i) for i in range(batch_size)]
+    plain = build(False, api_latency)
+    instrumented = build(True, api_latency)
+
+    # Прогрев: соединение, кеши компиляции SQL
+    for dp, bot, _ in (plain, instrumented):
+        await run_batch(dp, bot, updates)
+
+    # Пачки чередуются попарно, чтобы дрейф машины гасился в разнице пары
+    baseline, deltas = [], []
+    for i in range(pairs):
+        order = (plain, instrumented) if i % 2 == 0 else (instrumented, plain)
+        results = {}
+        for dp, bot, engine in order:
+            results[engine] = await run_batch(dp, bot, updates)
+        baseline.append(results[plain[2]])
+        deltas.append(results[instrumented[2]] - results[plain[2]])
+
+    for _, _, engine in (plain, instrumented):
+        await engine.dispose()
+
+    base = statistics.median(baseline)
+    delta = statistics.median(deltas)
+    overhead = delta / base * 100
+
+    print(f"updates:             {batch_size} x {pairs} pairs")
+    print(f"baseline per update: {base * 1e6:.1f} us")
+    print(f"instrumentation:     {delta * 1e6:+.1f} us per update")
+    print(f"overhead:            {overhead:+.2f}% (budget {BUDGET_PERCENT}%)")
+    return 0 if overhead <= BUDGET_PERCENT else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--pairs", type=int, default=10)
+    parser.add_argument("--api-latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.batch, args.pairs, args.api_latency_ms / 1000)))
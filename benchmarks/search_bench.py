@@ -0,0 +1,77 @@
+"""Микробенчмарк поискового индекса сотрудников и филиалов.
+
+Заполняет services/search_index.py синтетическими ФИО и филиалами без БД
+и замеряет поиск по типичным запросам: короткие префиксы, подстроки,
+несколько слов, Telegram ID. Цель - меньше 1 мс на запрос при 10k записей.
+
+Запуск:
+    python -m benchmarks.search_bench
+    python -m benchmarks.search_bench --employees 50000 --repeat 500
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+FIRST_NAMES = ["Иван", "Петр", "Анна", "Мария", "Сергей", "Ольга", "Дмитрий", "Елена", "Алексей", "Наталья"]
+LAST_NAMES = [
+    "Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Васильев", "Соколов",
+    "Михайлов", "Новиков", "Федоров", "Морозов", "Волков", "Алексеев", "Лебедев"
+]
+DISTRICTS = ["Центр", "Север", "Юг", "Запад", "Восток"]
+QUERIES = ["и", "ив", "иван", "петров анна", "сидоров мария дмит", "100001234", "центр", "нет такого"]
+
+
+def fill(index, employees: int, branches: int, seed: int):
+    rng = random.Random(seed)
+    branch_rows = [
+        (branch_id, f"Филиал {rng.choice(DISTRICTS)} {branch_id}") for branch_id in range(1, branches + 1)
+    ]
+    employee_rows = [
+        (
+            100_000_000 + i,
+            f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES)}ович",
+            rng.randint(1, branches),
+            True
+        )
+        for i in range(employees)
+    ]
+    index.load(branch_rows, employee_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарк поискового индекса")
+    parser.add_argument("--employees", type=int, default=10_000)
+    parser.add_argument("--branches", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    os.environ.setdefault("BOT_TOKEN", "42:SEARCH-BENCH")
+
+    from services.search_index import SearchIndex
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    fill(index, args.employees, args.branches, args.seed)
+    print(f"index: {len(index)} docs, "
+          f"built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    slowest = 0.0
+    print(f"{'query':<24}{'hits':>6}{'p50 ms':>10}{'p99 ms':>10}")
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            hits = index.search(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        slowest = max(slowest, p99)
+        print(f"{query:<24}{len(hits):>6}{statistics.median(timings):>10.3f}{p99:>10.3f}")
+    return 0 if slowest < 1.0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,5 +10,151 @@ class Config:
     GOOGLE_SHEETS_CREDENTIALS_PATH = os.getenv("GOOGLE_SHEETS_CREDENTIALS_PATH")
     REPORT_SHEET_ID = os.getenv("REPORT_SHEET_ID")
     TIMEZONE = os.getenv("TIMEZONE", "Europe/Moscow")
-    
+
+    # Кеш админских сводок
+    REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "512"))
+    REPORT_CACHE_TODAY_TTL = float(os.getenv("REPORT_CACHE_TODAY_TTL", "60"))
+    REPORT_CACHE_PAST_TTL = float(os.getenv("REPORT_CACHE_PAST_TTL", "86400"))
+
+    # Эндпоинт метрик Prometheus (порт 0 - отключен)
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+    # Профилирование апдейтов и журнал медленных
+    PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0.1"))
+    PROFILER_CPROFILE = os.getenv("PROFILER_CPROFILE", "false").lower() in ("1", "true", "yes")
+    SLOW_UPDATE_THRESHOLD_MS = float(os.getenv("SLOW_UPDATE_THRESHOLD_MS", "1000"))
+    SLOW_UPDATE_DIR = os.getenv("SLOW_UPDATE_DIR", "slow_updates")
+    SLOW_UPDATE_KEEP = int(os.getenv("SLOW_UPDATE_KEEP", "50"))
+
+    # Монитор задержки event loop
+    LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "100"))
+    LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "250"))
+
+    # Рабочий режим SQLite
+    SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() in ("1", "true", "yes")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+    SQLITE_WRITE_QUEUE = os.getenv("SQLITE_WRITE_QUEUE", "true").lower() in ("1", "true", "yes")
+    WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "50"))
+    WRITE_QUEUE_MAX_DELAY_MS = float(os.getenv("WRITE_QUEUE_MAX_DELAY_MS", "5"))
+
+    # Движок и пул соединений БД
+    DB_ECHO = os.getenv("DB_ECHO", "false").lower()
+    DB_ECHO_SAMPLE_RATE = float(os.getenv("DB_ECHO_SAMPLE_RATE", "0"))
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+    # Реплики для чтения (через запятую) и привязка к основной БД после записи
+    DB_REPLICA_URLS = os.getenv("DB_REPLICA_URLS", "")
+    READ_STICKY_SECONDS = float(os.getenv("READ_STICKY_SECONDS", "10"))
+    REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+    # Секционирование report по месяцам (Postgres): сколько месяцев вперед создавать
+    REPORT_PARTITIONS_AHEAD = int(os.getenv("REPORT_PARTITIONS_AHEAD", "3"))
+
+    # Архив замененных версий и старой истории отчетов
+    REPORT_ARCHIVE_DAYS = int(os.getenv("REPORT_ARCHIVE_DAYS", "365"))
+    REPORT_ARCHIVE_BATCH = int(os.getenv("REPORT_ARCHIVE_BATCH", "5000"))
+
+    # Шина инвалидации кешей между экземплярами (Postgres NOTIFY / опрос change_log)
+    INVALIDATION_BUS = os.getenv("INVALIDATION_BUS", "true").lower() in ("1", "true", "yes")
+    INVALIDATION_POLL_MS = float(os.getenv("INVALIDATION_POLL_MS", "500"))
+
+    # Выбор лидера для фоновых задач (аренда SQLite / advisory lock Postgres)
+    LEADER_LEASE_SECONDS = float(os.getenv("LEADER_LEASE_SECONDS", "15"))
+    LEADER_HEARTBEAT_SECONDS = float(os.getenv("LEADER_HEARTBEAT_SECONDS", "3"))
+    # Повторные ежечасные напоминания не сдавшим отчет: с NUDGE_FROM_HOUR до NUDGE_TO_HOUR
+    NUDGE_FROM_HOUR = int(os.getenv("NUDGE_FROM_HOUR", "20"))
+    NUDGE_TO_HOUR = int(os.getenv("NUDGE_TO_HOUR", "23"))
+    # Логирование: JSON в файл через фоновый поток, ротация по размеру и времени (.gz)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    LOG_ROTATE_HOURS = float(os.getenv("LOG_ROTATE_HOURS", "24"))
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "14"))
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Не больше стольких одинаковых ошибок (одно место вызова) в минуту, 0 - без ограничения
+    LOG_ERROR_BURST = int(os.getenv("LOG_ERROR_BURST", "10"))
+    # Ограничение частоты апдейтов (ведра токенов): скорость в секунду и запас подряд.
+    # Скорость 0 - без ограничения
+    THROTTLE_ENABLED = os.getenv("THROTTLE_ENABLED", "true").lower() in ("1", "true", "yes")
+    THROTTLE_MESSAGE_RATE = float(os.getenv("THROTTLE_MESSAGE_RATE", "1"))
+    THROTTLE_MESSAGE_BURST = float(os.getenv("THROTTLE_MESSAGE_BURST", "5"))
+    THROTTLE_CALLBACK_RATE = float(os.getenv("THROTTLE_CALLBACK_RATE", "2"))
+    THROTTLE_CALLBACK_BURST = float(os.getenv("THROTTLE_CALLBACK_BURST", "10"))
+    THROTTLE_GLOBAL_RATE = float(os.getenv("THROTTLE_GLOBAL_RATE", "100"))
+    THROTTLE_GLOBAL_BURST = float(os.getenv("THROTTLE_GLOBAL_BURST", "200"))
+    THROTTLE_MAX_USERS = int(os.getenv("THROTTLE_MAX_USERS", "10000"))
+    # Очередь исходящих сообщений: ответы пользователям раньше массовых рассылок.
+    # OUTBOUND_RATE - сообщений в секунду на весь бот (0 - без ограничения),
+    # OUTBOUND_CHAT_INTERVAL - пауза между массовыми сообщениями в один чат
+    OUTBOUND_CONCURRENCY = int(os.getenv("OUTBOUND_CONCURRENCY", "8"))
+    OUTBOUND_RATE = float(os.getenv("OUTBOUND_RATE", "25"))
+    OUTBOUND_CHAT_INTERVAL = float(os.getenv("OUTBOUND_CHAT_INTERVAL", "1"))
+    OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+    # Соединения к Bot API: размер пула и сколько держать простаивающее соединение
+    BOT_API_CONNECTIONS = int(os.getenv("BOT_API_CONNECTIONS", "16"))
+    BOT_API_KEEPALIVE_SECONDS = float(os.getenv("BOT_API_KEEPALIVE_SECONDS", "60"))
+
+    # Сверка остатка кассы: горизонт пересчета (дней), запас дней назад для
+    # предыдущего остатка, допуск расхождения и период пересчета (секунд)
+    RECONCILE_DAYS = int(os.getenv("RECONCILE_DAYS", "31"))
+    RECONCILE_LOOKBACK_DAYS = int(os.getenv("RECONCILE_LOOKBACK_DAYS", "31"))
+    RECONCILE_TOLERANCE = float(os.getenv("RECONCILE_TOLERANCE", "0.01"))
+    RECONCILE_INTERVAL = int(os.getenv("RECONCILE_INTERVAL", "600"))
+    # За сколько последних дней показывать расхождения в вечерней сводке
+    RECONCILE_DIGEST_DAYS = int(os.getenv("RECONCILE_DIGEST_DAYS", "7"))
+
+    # Поиск опечаток в отчетах: поле необычно, если дальше ANOMALY_Z_THRESHOLD
+    # стандартных отклонений от среднего филиала за тот же день недели;
+    # оценивается только после ANOMALY_MIN_SAMPLES отчетов
+    ANOMALY_Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "3.5"))
+    ANOMALY_MIN_SAMPLES = int(os.getenv("ANOMALY_MIN_SAMPLES", "5"))
+
+    # Графики (/chart): процессов отрисовки, каталог кеша PNG, сколько дней
+    # хранить невостребованные картинки, самый длинный период в днях
+    CHART_WORKERS = int(os.getenv("CHART_WORKERS", "1"))
+    CHART_CACHE_DIR = os.getenv("CHART_CACHE_DIR", "chart_cache")
+    CHART_CACHE_DAYS = int(os.getenv("CHART_CACHE_DAYS", "7"))
+    CHART_MAX_DAYS = int(os.getenv("CHART_MAX_DAYS", "366"))
+
+    # Сверка листа Reports с БД: раз в сутки (если включена), строк в одном
+    # диапазоне чтения, диапазонов на запрос, предел исправлений за запуск и
+    # сколько секунд до последнего отчета в БД строки не сверяются (их
+    # append_report может еще идти)
+    SHEETS_RECONCILE_ENABLED = os.getenv("SHEETS_RECONCILE_ENABLED", "false").lower() == "true"
+    SHEETS_RECONCILE_CHUNK_ROWS = int(os.getenv("SHEETS_RECONCILE_CHUNK_ROWS", "10000"))
+    SHEETS_RECONCILE_RANGES_PER_CALL = int(os.getenv("SHEETS_RECONCILE_RANGES_PER_CALL", "10"))
+    SHEETS_RECONCILE_MAX_CHANGES = int(os.getenv("SHEETS_RECONCILE_MAX_CHANGES", "1000"))
+    SHEETS_RECONCILE_SETTLE_SECONDS = int(os.getenv("SHEETS_RECONCILE_SETTLE_SECONDS", "600"))
+
+    # Локальный API отчетности для BI (0 - выключен): свой пул соединений к БД
+    # и предел одновременных запросов, чтобы выгрузки не мешали боту
+    REPORTING_API_HOST = os.getenv("REPORTING_API_HOST", "127.0.0.1")
+    REPORTING_API_PORT = int(os.getenv("REPORTING_API_PORT", "0"))
+    REPORTING_API_TOKEN = os.getenv("REPORTING_API_TOKEN", "")
+    REPORTING_API_DB_URL = os.getenv("REPORTING_API_DB_URL", "")
+    REPORTING_API_POOL_SIZE = int(os.getenv("REPORTING_API_POOL_SIZE", "2"))
+    REPORTING_API_MAX_CONCURRENCY = int(os.getenv("REPORTING_API_MAX_CONCURRENCY", "4"))
+    REPORTING_API_PAGE_SIZE = int(os.getenv("REPORTING_API_PAGE_SIZE", "1000"))
+    REPORTING_API_MAX_PAGE_SIZE = int(os.getenv("REPORTING_API_MAX_PAGE_SIZE", "5000"))
+
+    # Резервные копии SQLite (только для DB_URL на файле SQLite): каталог,
+    # сколько копий хранить, интервал в секундах (0 - только /backup),
+    # страниц за шаг онлайн-копии, пауза между шагами и число перезапусков
+    # из-за записи в БД, после которого остаток копируется за один шаг
+    BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+    BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+    BACKUP_INTERVAL = int(os.getenv("BACKUP_INTERVAL", str(24 * 3600)))
+    BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+    BACKUP_STEP_PAUSE_MS = int(os.getenv("BACKUP_STEP_PAUSE_MS", "20"))
+    BACKUP_MAX_RESTARTS = int(os.getenv("BACKUP_MAX_RESTARTS", "5"))
+
 config = Config()
\ No newline at end of file
@@ -1,14 +1,94 @@
-from typing import Optional, List
-from datetime import datetime, date, timedelta
-from sqlalchemy import select, update, delete, and_, func
+from typing import Callable, Optional, List
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import Date, Table, select, update, delete, and_, or_, func, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
-from .models import Branch, Employee, Report
+from sqlalchemy.orm import aliased
+from .models import Branch, Employee, Report, ReportArchive
+from .invalidation import invalidation_bus
 
 
-class BranchDAO:
+def report_day_filter(first_day: date, last_day: Optional[date] = None):
+    """Отчеты за дни [first_day, last_day] как полуинтервал по report_date.
+
+    В отличие от func.date(report_date) условие использует индекс и дает
+    Postgres отсечь партиции других месяцев.
+    """
+    start = datetime.combine(first_day, time.min)
+    end = datetime.combine(last_day or first_day, time.min) + timedelta(days=1)
+    return and_(Report.report_date >= start, Report.report_date < end)
+
+
+def _archive_as_report(*criteria):
+    """Строки архива с колонками report, чтобы загружать их как Report"""
+    archive = ReportArchive.__table__
+    return select(*[archive.c[column.name] for column in Report.__table__.c]).where(*criteria)
+
+
+def reports_with_archive(criteria: Callable[[Table], tuple]):
+    """Сущность Report для select() по report вместе с report_archive.
+
+    criteria(table) возвращает условия на колонки таблицы; она вызывается
+    для обеих таблиц. Строки архива приходят как обычные Report и
+    предназначены только для чтения.
+    """
+    hot = select(Report).where(*criteria(Report.__table__))
+    cold = _archive_as_report(*criteria(ReportArchive.__table__))
+    return aliased(Report, union_all(hot, cold).subquery("report"))
+
+
+def reports_for_days(first_day: date, last_day: Optional[date] = None):
+    """Сущность Report для select() за дни [first_day, last_day].
+
+    Прошлые дни могут быть частично в архиве, поэтому для них читается
+    объединение report и report_archive. Строки архива приходят как обычные
+    Report и предназначены только для чтения.
+    """
+    if first_day >= datetime.utcnow().date():
+        hot = select(Report).where(report_day_filter(first_day, last_day))
+        return aliased(Report, hot.subquery("report"))
+    start = datetime.combine(first_day, time.min)
+    end = datetime.combine(last_day or first_day, time.min) + timedelta(days=1)
+    return reports_with_archive(lambda table: (
+        table.c.report_date >= start,
+        table.c.report_date < end
+    ))
+
+
+def latest_reports(first_day: date, last_day: Optional[date] = None):
+    """Подзапрос: последняя версия отчета каждого сотрудника за день.
+
+    Колонки report плюс day (дата отчета); архив тоже читается.
+    """
+    reports = reports_for_days(first_day, last_day)
+    day = func.date(reports.report_date, type_=Date)
+    ranked = select(
+        reports,
+        day.label("day"),
+        func.row_number().over(
+            partition_by=(reports.employee_id, day),
+            order_by=(reports.version.desc(), reports.id.desc())
+        ).label("rank")
+    ).subquery()
+    return select(ranked).where(ranked.c.rank == 1).subquery("latest")
+
+
+class BaseDAO:
     def __init__(self, session: AsyncSession):
         self.session = session
     
+    async def _commit(self):
+        # Внутри пакета очереди записи фиксирует сама очередь
+        if self.session.info.get("write_batch"):
+            await self.session.flush()
+        else:
+            await self.session.commit()
+    
+    async def _publish(self, entity: str, key=None):
+        # До фиксации: событие уходит другим экземплярам вместе с транзакцией
+        await invalidation_bus.publish(self.session, entity, key)
+
+
+class BranchDAO(BaseDAO):
     async def get_all(self) -> List[Branch]:
         result = await self.session.execute(
             select(Branch).order_by(Branch.name)
@@ -30,15 +110,27 @@ class BranchDAO:
     async def create(self, name: str) -> Branch:
         branch = Branch(name=name)
         self.session.add(branch)
-        await self.session.commit()
+        await self.session.flush()
+        await self._publish("branch", branch.id)
+        await self._commit()
         await self.session.refresh(branch)
         return branch
     
-    async def update(self, branch_id: int, name: str) -> Optional[Branch]:
+    async def update(
+        self,
+        branch_id: int,
+        name: Optional[str] = None,
+        timezone: Optional[str] = None
+    ) -> Optional[Branch]:
         branch = await self.get_by_id(branch_id)
         if branch:
-            branch.name = name
-            await self.session.commit()
+            if name is not None:
+                branch.name = name
+            if timezone is not None:
+                # Пустая строка - вернуть общий часовой пояс из конфига
+                branch.timezone = timezone or None
+            await self._publish("branch", branch_id)
+            await self._commit()
             await self.session.refresh(branch)
         return branch
     
@@ -46,15 +138,13 @@ class BranchDAO:
         branch = await self.get_by_id(branch_id)
         if branch:
             await self.session.delete(branch)
-            await self.session.commit()
+            await self._publish("branch", branch_id)
+            await self._commit()
             return True
         return False
 
 
-class EmployeeDAO:
-    def __init__(self, session: AsyncSession):
-        self.session = session
-    
+class EmployeeDAO(BaseDAO):
     async def get_all(self) -> List[Employee]:
         result = await self.session.execute(
             select(Employee)
@@ -81,6 +171,19 @@ class EmployeeDAO:
         )
         return result.scalars().all()
     
+    async def get_page(self, after_id: int = 0, limit: int = 1000) -> List[Employee]:
+        """Постраничное чтение по id (keyset): следующая страница - after_id последнего"""
+        result = await self.session.execute(
+            select(Employee).where(Employee.id > after_id).order_by(Employee.id).limit(limit)
+        )
+        return result.scalars().all()
+    
+    async def get_admin_telegram_ids(self) -> List[int]:
+        result = await self.session.execute(
+            select(Employee.telegram_id).where(and_(Employee.is_admin == True, Employee.is_active == True))
+        )
+        return result.scalars().all()
+    
     async def get_branch_employees(self, branch_id: int) -> List[Employee]:
         result = await self.session.execute(
             select(Employee)
@@ -103,7 +206,8 @@ class EmployeeDAO:
             is_admin=is_admin
         )
         self.session.add(employee)
-        await self.session.commit()
+        await self._publish("employee", telegram_id)
+        await self._commit()
         await self.session.refresh(employee)
         return employee
     
@@ -128,7 +232,8 @@ class EmployeeDAO:
         if is_admin is not None:
             employee.is_admin = is_admin
         
-        await self.session.commit()
+        await self._publish("employee", telegram_id)
+        await self._commit()
         await self.session.refresh(employee)
         return employee
     
@@ -139,15 +244,13 @@ class EmployeeDAO:
         employee = await self.get_by_telegram_id(telegram_id)
         if employee:
             await self.session.delete(employee)
-            await self.session.commit()
+            await self._publish("employee", telegram_id)
+            await self._commit()
             return True
         return False
 
 
-class ReportDAO:
-    def __init__(self, session: AsyncSession):
-        self.session = session
-    
+class ReportDAO(BaseDAO):
     async def create(
         self,
         report_date: datetime,
@@ -181,7 +284,9 @@ class ReportDAO:
         )
         
         self.session.add(report)
-        await self.session.commit()
+        await self._publish("report_day", report_date.date())
+        await self._publish("report_submitted", f"{report_date.isoformat()}:{employee_id}")
+        await self._commit()
         await self.session.refresh(report)
         return report
     
@@ -191,11 +296,20 @@ class ReportDAO:
         )
         return result.scalar_one_or_none()
     
+    async def get_by_id_with_archive(self, report_id: int) -> Optional[Report]:
+        """Как get_by_id, но ищет и в архиве (только для чтения)"""
+        report = await self.get_by_id(report_id)
+        if report is None:
+            archived = aliased(Report, _archive_as_report(ReportArchive.id == report_id).subquery())
+            result = await self.session.execute(select(archived))
+            report = result.scalar_one_or_none()
+        return report
+    
     async def get_today_reports(self) -> List[Report]:
         today = datetime.utcnow().date()
         result = await self.session.execute(
             select(Report)
-            .where(func.date(Report.report_date) == today)
+            .where(report_day_filter(today))
             .join(Employee)
             .join(Branch)
             .order_by(Branch.name)
@@ -203,11 +317,11 @@ class ReportDAO:
         return result.scalars().all()
     
     async def get_daily_reports(self, report_date: date) -> List[Report]:
+        reports = reports_for_days(report_date)
         result = await self.session.execute(
-            select(Report)
-            .where(func.date(Report.report_date) == report_date)
-            .join(Employee)
-            .join(Branch)
+            select(reports)
+            .join(Employee, reports.employee_id == Employee.id)
+            .join(Branch, Employee.branch_id == Branch.id)
             .order_by(Branch.name)
         )
         return result.scalars().all()
@@ -218,9 +332,9 @@ class ReportDAO:
             select(Report).where(
                 and_(
                     Report.employee_id == employee_id,
-                    func.date(Report.report_date) == today
+                    report_day_filter(today)
                 )
-            ).order_by(Report.version.desc())
+            ).order_by(Report.version.desc()).limit(1)
         )
         return result.scalar_one_or_none()
     
@@ -229,10 +343,10 @@ class ReportDAO:
         employee_id: int,
         limit: int = 10
     ) -> List[Report]:
+        reports = reports_with_archive(lambda table: (table.c.employee_id == employee_id,))
         result = await self.session.execute(
-            select(Report)
-            .where(Report.employee_id == employee_id)
-            .order_by(Report.report_date.desc(), Report.version.desc())
+            select(reports)
+            .order_by(reports.report_date.desc(), reports.version.desc())
             .limit(limit)
         )
         return result.scalars().all()
@@ -243,13 +357,12 @@ class ReportDAO:
         days: int = 7
     ) -> List[Report]:
         from_date = datetime.utcnow() - timedelta(days=days)
+        reports = reports_with_archive(lambda table: (
+            table.c.branch_id == branch_id,
+            table.c.report_date >= from_date
+        ))
         result = await self.session.execute(
-            select(Report).where(
-                and_(
-                    Report.branch_id == branch_id,
-                    Report.report_date >= from_date
-                )
-            ).order_by(Report.report_date.desc())
+            select(reports).order_by(reports.report_date.desc())
         )
         return result.scalars().all()
     
@@ -258,20 +371,64 @@ class ReportDAO:
         start_date: date,
         end_date: date
     ) -> List[Report]:
+        reports = reports_for_days(start_date, end_date)
         result = await self.session.execute(
-            select(Report)
-            .where(
-                and_(
-                    func.date(Report.report_date) >= start_date,
-                    func.date(Report.report_date) <= end_date
-                )
-            )
-            .join(Employee)
-            .join(Branch)
-            .order_by(Report.report_date.desc(), Branch.name)
+            select(reports)
+            .join(Employee, reports.employee_id == Employee.id)
+            .join(Branch, Employee.branch_id == Branch.id)
+            .order_by(reports.report_date.desc(), Branch.name)
+        )
+        return result.scalars().all()
+    
+    async def get_range_page(
+        self,
+        start_date: date,
+        end_date: date,
+        after_id: int = 0,
+        limit: int = 1000
+    ) -> List[Report]:
+        """Все версии отчетов за дни (с архивом) постранично по id"""
+        reports = reports_for_days(start_date, end_date)
+        result = await self.session.execute(
+            select(reports).where(reports.id > after_id).order_by(reports.id).limit(limit)
         )
         return result.scalars().all()
     
+    async def get_daily_summaries(
+        self,
+        start_date: date,
+        end_date: date,
+        branch_id: Optional[int] = None,
+        after: Optional[tuple] = None,
+        limit: int = 1000
+    ) -> list:
+        """Суммы последних версий отчетов по филиалу и дню, постранично по (день, филиал)"""
+        latest = latest_reports(start_date, end_date)
+        query = select(
+            latest.c.day,
+            latest.c.branch_id,
+            func.count().label("reports"),
+            func.sum(latest.c.total_income).label("total_income"),
+            func.sum(latest.c.cash).label("cash"),
+            func.sum(latest.c.cashless).label("cashless"),
+            func.sum(latest.c.cash_balance).label("cash_balance"),
+            func.sum(latest.c.clients_count).label("clients_count"),
+            func.sum(latest.c.cash_to_suppliers).label("cash_to_suppliers"),
+            func.sum(latest.c.cashless_to_suppliers).label("cashless_to_suppliers")
+        ).group_by(latest.c.day, latest.c.branch_id)
+        if branch_id is not None:
+            query = query.where(latest.c.branch_id == branch_id)
+        if after is not None:
+            day, after_branch = after
+            query = query.where(or_(
+                latest.c.day > day,
+                and_(latest.c.day == day, latest.c.branch_id > after_branch)
+            ))
+        result = await self.session.execute(
+            query.order_by(latest.c.day, latest.c.branch_id).limit(limit)
+        )
+        return result.all()
+    
     async def update(
         self,
         report_id: int,
@@ -305,14 +462,16 @@ class ReportDAO:
         if version is not None:
             report.version = version
         
-        await self.session.commit()
+        await self._publish("report_day", report.report_date.date())
+        await self._commit()
         await self.session.refresh(report)
         return report
     
     async def delete(self, report_id: int) -> bool:
         report = await self.get_by_id(report_id)
         if report:
+            await self._publish("report_day", report.report_date.date())
             await self.session.delete(report)
-            await self.session.commit()
+            await self._commit()
             return True
         return False
\ No newline at end of file
@@ -0,0 +1,146 @@
+import random
+import time
+from typing import Optional
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+from utils.logger import logger
+from utils.metrics import registry
+from utils.tracing import record_span
+
+DB_STATEMENT_SECONDS = registry.histogram(
+    "db_statement_seconds",
+    "Длительность SQL-запросов",
+    ["operation"]
+)
+DB_STATEMENT_ERRORS = registry.counter(
+    "db_statement_errors_total",
+    "Ошибки выполнения SQL-запросов",
+    ["operation"]
+)
+# Метрики пула - по движкам: основная БД, реплики, API отчетности
+DB_POOL_WAIT_SECONDS = registry.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Ожидание соединения из пула",
+    ["engine"]
+)
+DB_POOL_CHECKED_OUT = registry.gauge(
+    "db_pool_checked_out",
+    "Соединения, выданные из пула",
+    ["engine"]
+)
+DB_POOL_CHECKOUTS = registry.counter(
+    "db_pool_checkouts_total",
+    "Выдачи соединений из пула",
+    ["engine"]
+)
+DB_POOL_TIMEOUTS = registry.counter(
+    "db_pool_timeouts_total",
+    "Истечения таймаута ожидания соединения",
+    ["engine"]
+)
+DB_POOL_OVERFLOW = registry.gauge(
+    "db_pool_overflow",
+    "Соединения сверх размера пула",
+    ["engine"]
+)
+DEFAULT_ENGINE_NAME = "primary"
+
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip().split(None, 1)
+    return head[0].upper() if head else "UNKNOWN"
+
+
+def engine_name(engine: AsyncEngine) -> str:
+    """Имя движка в метриках пула (задается в timed_pool_class)"""
+    return getattr(engine.sync_engine.pool, "engine_name", DEFAULT_ENGINE_NAME)
+
+
+def timed_pool_class(db_url: str, base: Optional[type] = None, name: str = DEFAULT_ENGINE_NAME):
+    """Класс пула (по умолчанию - пул диалекта) с замером ожидания выдачи соединения"""
+    if base is None:
+        url = make_url(db_url)
+        base = url.get_dialect().get_pool_class(url)
+
+    class TimedPool(base):
+        engine_name = name
+
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                DB_POOL_TIMEOUTS.inc(engine=name)
+                raise
+            finally:
+                DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start, engine=name)
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+def instrument_engine(engine: AsyncEngine, echo_sample_rate: float = 0.0):
+    """Подписывает метрики на события движка SQLAlchemy.
+
+    echo_sample_rate - доля запросов, которые пишутся в лог вместе с
+    длительностью: дешевая замена echo=True для продакшена.
+    """
+    sync_engine = engine.sync_engine
+    pool = sync_engine.pool
+    name = engine_name(engine)
+
+    # Время старта храним на контексте выполнения: он свой у каждого запроса
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        context.metrics_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context.metrics_started
+        DB_STATEMENT_SECONDS.observe(duration, operation=_operation(statement))
+        record_span("sql", statement, duration)
+        if echo_sample_rate and random.random() < echo_sample_rate:
+            logger.info(f"SQL {duration * 1000:.1f} ms: {statement}")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _on_error(context):
+        DB_STATEMENT_ERRORS.inc(operation=_operation(context.statement or ""))
+
+    # overflow() есть только у очереди соединений (QueuePool и наследники)
+    track_overflow = hasattr(pool, "overflow")
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.inc(engine=name)
+        DB_POOL_CHECKOUTS.inc(engine=name)
+        if track_overflow:
+            DB_POOL_OVERFLOW.set(max(0, pool.overflow()), engine=name)
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec(engine=name)
+        if track_overflow:
+            DB_POOL_OVERFLOW.set(max(0, pool.overflow()), engine=name)
+
+
+def pool_stats(engine: AsyncEngine) -> dict:
+    """Снимок состояния пула и накопленных метрик движка для /dbstats"""
+    pool = engine.sync_engine.pool
+    name = engine_name(engine)
+    waits = DB_POOL_WAIT_SECONDS.count(engine=name)
+    stats = {
+        'engine': name,
+        'backend': engine.url.get_backend_name(),
+        'pool_class': type(pool).__name__,
+        'status': pool.status(),
+        'checked_out': int(DB_POOL_CHECKED_OUT.value(engine=name)),
+        'checkouts': int(DB_POOL_CHECKOUTS.value(engine=name)),
+        'timeouts': int(DB_POOL_TIMEOUTS.value(engine=name)),
+        'waits': waits,
+        'wait_avg_ms': DB_POOL_WAIT_SECONDS.total(engine=name) / waits * 1000 if waits else 0.0,
+    }
+    if hasattr(pool, "overflow"):
+        stats['size'] = pool.size()
+        stats['overflow'] = max(0, pool.overflow())
+    return stats
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import time
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from config import config
+from utils.logger import logger
+from utils.metrics import registry
+from .models import ChangeLog
+from .session import engine
+from .write_queue import run_after_commit, write_queue
+
+INVALIDATION_LATENCY_SECONDS = registry.histogram(
+    "cache_invalidation_latency_seconds",
+    "Задержка доставки инвалидации от другого экземпляра",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+INVALIDATIONS = registry.counter(
+    "cache_invalidations_total",
+    "События инвалидации по источнику",
+    ["entity", "source"]
+)
+
+CHANNEL = "bot_invalidation"
+
+# key=None - сбросить все по сущности (например, после потери событий)
+Subscriber = Callable[[Optional[str]], None]
+
+
+class InvalidationBus:
+    """Шина инвалидации кешей между экземплярами бота.
+
+    Событие - пара (сущность, ключ). Публикуется в транзакции изменения:
+    на Postgres через pg_notify (доставляется при COMMIT), на SQLite строкой
+    в change_log, которую опрашивают остальные экземпляры. Локальные
+    подписчики получают событие сразу после фиксации.
+    """
+
+    def __init__(self, engine: AsyncEngine, enabled: bool = True, poll_interval: float = 0.5):
+        self.engine = engine
+        self.enabled = enabled
+        self.poll_interval = poll_interval
+        self.origin = uuid.uuid4().hex[:12]
+        self.postgres = engine.dialect.name == "postgresql"
+        self._subscribers: Dict[str, List[Subscriber]] = defaultdict(list)
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, entity: str, callback: Subscriber):
+        self._subscribers[entity].append(callback)
+
+    def _deliver(self, entity: str, key: Optional[str], source: str):
+        INVALIDATIONS.inc(entity=entity, source=source)
+        for callback in self._subscribers.get(entity, ()):
+            try:
+                callback(key)
+            except Exception as e:
+                logger.error(f"Invalidation subscriber for {entity} failed: {e}")
+
+    def _reset(self):
+        """События могли потеряться - сбрасываем все"""
+        for entity in list(self._subscribers):
+            self._deliver(entity, None, "reset")
+
+    async def publish(self, session: AsyncSession, entity: str, key=None):
+        """Опубликовать событие в транзакции session (вызывать до COMMIT)"""
+        key = None if key is None else str(key)
+        if self.enabled:
+            if self.postgres:
+                payload = json.dumps(
+                    {'e': entity, 'k': key, 'o': self.origin, 't': time.time()},
+                    separators=(",", ":")
+                )
+                await session.execute(
+                    select(func.pg_notify(CHANNEL, payload))
+                )
+            else:
+                await session.execute(insert(ChangeLog).values(
+                    entity=entity, key=key, origin=self.origin, published_at=time.time()
+                ))
+        run_after_commit(session, lambda: self._deliver(entity, key, "local"))
+
+    def _receive(self, entity: str, key: Optional[str], origin: str, published_at: float):
+        if origin == self.origin:
+            return
+        INVALIDATION_LATENCY_SECONDS.observe(max(0.0, time.time() - published_at))
+        self._deliver(entity, key, "remote")
+
+    async def _listen_postgres(self):
+        def on_notify(connection, pid, channel, payload):
+            try:
+                event = json.loads(payload)
+                self._receive(event['e'], event['k'], event['o'], event['t'])
+            except (ValueError, KeyError) as e:
+                logger.error(f"Bad invalidation payload {payload!r}: {e}")
+
+        while True:
+            try:
+                # Отдельное соединение из пула держим все время работы
+                async with self.engine.connect() as conn:
+                    raw = (await conn.get_raw_connection()).driver_connection
+                    await raw.add_listener(CHANNEL, on_notify)
+                    try:
+                        self._reset()
+                        while not raw.is_closed():
+                            await asyncio.sleep(self.poll_interval)
+                    finally:
+                        # Соединение вернется в пул - слушатель на нем не нужен
+                        if not raw.is_closed():
+                            await raw.remove_listener(CHANNEL, on_notify)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Invalidation listener disconnected: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _poll_change_log(self):
+        async with self.engine.connect() as conn:
+            last_id = (await conn.execute(select(func.max(ChangeLog.id)))).scalar() or 0
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                async with self.engine.connect() as conn:
+                    rows = (await conn.execute(
+                        select(ChangeLog.__table__).where(ChangeLog.id > last_id)
+                        .order_by(ChangeLog.id).limit(1000)
+                    )).all()
+            except Exception as e:
+                logger.error(f"Change log poll failed: {e}")
+                continue
+            for row in rows:
+                last_id = row.id
+                self._receive(row.entity, row.key, row.origin, row.published_at)
+
+    async def prune(self, max_age: float = 3600):
+        """Удалить старые строки change_log (только SQLite)"""
+        if self.postgres or not self.enabled:
+            return
+        stale = delete(ChangeLog).where(ChangeLog.published_at < time.time() - max_age)
+        await write_queue.submit(lambda session: session.execute(stale))
+
+    def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        listener = self._listen_postgres() if self.postgres else self._poll_change_log()
+        self._task = asyncio.create_task(listener)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+invalidation_bus = InvalidationBus(
+    engine,
+    enabled=config.INVALIDATION_BUS,
+    poll_interval=config.INVALIDATION_POLL_MS / 1000
+)
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import socket
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete, exc, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from config import config
+from utils.logger import logger
+from utils.metrics import registry
+from .models import JobRun, LeaderLease
+from .session import engine
+from .write_queue import write_queue
+
+LEADER_TRANSITIONS = registry.counter(
+    "leader_transitions_total",
+    "Смены роли лидера в этом экземпляре",
+    ["role"]
+)
+
+
+class LeaderElection:
+    """Выбор лидера на общей БД: только лидер выполняет фоновые задачи.
+
+    На Postgres лидер держит session-level advisory lock на отдельном
+    соединении. На остальных БД - строка аренды в leader_lease, которую
+    лидер продлевает каждые heartbeat секунд. Экземпляр перестает считать
+    себя лидером за heartbeat секунд до истечения аренды, поэтому двух
+    лидеров одновременно не бывает.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        name: str = "scheduler",
+        lease_seconds: float = 15,
+        heartbeat_seconds: float = 3
+    ):
+        self.engine = engine
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.postgres = engine.dialect.name == "postgresql"
+        self._lock_key = zlib.crc32(f"bot:{name}".encode())
+        self._lock_conn: Optional[AsyncConnection] = None
+        self._leader_until = 0.0
+        self._was_leader = False
+        self._task: Optional[asyncio.Task] = None
+
+    def is_leader(self) -> bool:
+        return time.monotonic() < self._leader_until
+
+    async def _postgres_tick(self) -> bool:
+        if self._lock_conn is not None:
+            # Блокировка живет, пока живо соединение: проверяем его
+            await self._lock_conn.execute(select(1))
+            return True
+        conn = await self.engine.connect()
+        try:
+            # Без транзакции: соединение живет долго и не должно висеть idle in transaction
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            acquired = (await conn.execute(select(func.pg_try_advisory_lock(self._lock_key)))).scalar()
+        except Exception:
+            await conn.close()
+            raise
+        if acquired:
+            self._lock_conn = conn
+        else:
+            await conn.close()
+        return bool(acquired)
+
+    async def _lease_tick(self) -> bool:
+        async def renew(session: AsyncSession) -> bool:
+            now = time.time()
+            result = await session.execute(
+                update(LeaderLease)
+                .where(
+                    LeaderLease.name == self.name,
+                    or_(LeaderLease.holder == self.holder, LeaderLease.expires_at < now)
+                )
+                .values(holder=self.holder, expires_at=now + self.lease_seconds)
+            )
+            if result.rowcount:
+                return True
+            if await session.scalar(select(LeaderLease.name).where(LeaderLease.name == self.name)):
+                return False
+            await session.execute(insert(LeaderLease).values(
+                name=self.name, holder=self.holder, expires_at=now + self.lease_seconds
+            ))
+            return True
+
+        try:
+            return await write_queue.submit(renew)
+        except exc.IntegrityError:
+            # Другой экземпляр вставил строку аренды одновременно с нами
+            return False
+
+    async def _drop_lock_conn(self):
+        if self._lock_conn is not None:
+            try:
+                await self._lock_conn.close()
+            except Exception:
+                pass
+            self._lock_conn = None
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                acquired = await (self._postgres_tick() if self.postgres else self._lease_tick())
+            except Exception as e:
+                logger.error(f"Leader election tick failed: {e}")
+                await self._drop_lock_conn()
+                acquired = False
+
+            if acquired:
+                if self.postgres:
+                    self._leader_until = started + 2 * self.heartbeat_seconds
+                else:
+                    self._leader_until = started + self.lease_seconds - self.heartbeat_seconds
+            else:
+                self._leader_until = 0.0
+
+            if acquired != self._was_leader:
+                self._was_leader = acquired
+                LEADER_TRANSITIONS.inc(role="leader" if acquired else "follower")
+                logger.info(f"{self.holder} is now {'leader' if acquired else 'follower'} for {self.name}")
+            await asyncio.sleep(self.heartbeat_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Освобождаем лидерство сразу, а не по истечении аренды
+        was_leader = self.is_leader()
+        self._leader_until = 0.0
+        if self.postgres:
+            await self._drop_lock_conn()
+        elif was_leader:
+            async def release(session: AsyncSession):
+                await session.execute(
+                    update(LeaderLease)
+                    .where(LeaderLease.name == self.name, LeaderLease.holder == self.holder)
+                    .values(expires_at=0)
+                )
+            try:
+                await write_queue.submit(release)
+            except Exception as e:
+                logger.error(f"Error releasing leader lease: {e}")
+
+
+async def claim_job_run(job: str, slot: str) -> bool:
+    """Отметить запуск задачи в слоте. False - слот уже выполнен (например, прежним лидером)"""
+    async def claim(session: AsyncSession) -> bool:
+        # Время задаем сами (UTC), а не часами БД: по нему удаляются старые отметки
+        await session.execute(
+            insert(JobRun).values(job=job, slot=slot, holder=leader.holder, started_at=datetime.utcnow())
+        )
+        return True
+
+    try:
+        return await write_queue.submit(claim)
+    except exc.IntegrityError:
+        return False
+
+
+async def prune_job_runs(max_age: float) -> int:
+    """Удалить отметки запусков старше max_age секунд: их слоты давно прошли"""
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age)
+    result = await write_queue.submit(
+        lambda session: session.execute(delete(JobRun).where(JobRun.started_at < cutoff))
+    )
+    return result.rowcount
+
+
+leader = LeaderElection(
+    engine,
+    lease_seconds=config.LEADER_LEASE_SECONDS,
+    heartbeat_seconds=config.LEADER_HEARTBEAT_SECONDS
+)
+
+registry.gauge(
+    "leader_is_leader",
+    "1, если этот экземпляр - лидер фоновых задач",
+    callback=lambda: 1 if leader.is_leader() else 0
+)
@@ -1,5 +1,6 @@
-from datetime import datetime
-from sqlalchemy import BigInteger, String, Integer, DateTime, Boolean, ForeignKey, Numeric, func
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import BigInteger, String, Integer, Date, DateTime, Boolean, Float, ForeignKey, Index, Numeric, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .base import Base
 
@@ -9,6 +10,8 @@ class Branch(Base):
     
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(100), unique=True)
+    # Часовой пояс филиала (IANA), NULL - общий TIMEZONE из конфига
+    timezone: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=False), 
         default=func.now()  # Время будет устанавливаться базой данных
@@ -38,6 +41,10 @@ class Employee(Base):
 
 class Report(Base):
     __tablename__ = "report"
+    __table_args__ = (
+        Index("ix_report_report_date", "report_date"),
+        Index("ix_report_employee_id_report_date", "employee_id", "report_date"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True)
     report_date: Mapped[datetime] = mapped_column(DateTime(timezone=False))
@@ -57,4 +64,120 @@ class Report(Base):
     branch_id: Mapped[int] = mapped_column(ForeignKey("branch.id"))
     
     employee: Mapped["Employee"] = relationship(back_populates="reports")
-    branch: Mapped["Branch"] = relationship(back_populates="reports")
\ No newline at end of file
+    branch: Mapped["Branch"] = relationship(back_populates="reports")
+
+class ReportArchive(Base):
+    """Холодный архив: замененные версии отчетов и старая история.
+
+    Колонки повторяют report, id сохраняется исходный.
+    """
+    __tablename__ = "report_archive"
+    __table_args__ = (
+        Index("ix_report_archive_report_date", "report_date"),
+        Index("ix_report_archive_employee_id_report_date", "employee_id", "report_date"),
+    )
+    
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    report_date: Mapped[datetime] = mapped_column(DateTime(timezone=False))
+    total_income: Mapped[float] = mapped_column(Numeric(10, 2))
+    cash: Mapped[float] = mapped_column(Numeric(10, 2))
+    cashless: Mapped[float] = mapped_column(Numeric(10, 2))
+    cash_balance: Mapped[float] = mapped_column(Numeric(10, 2))
+    clients_count: Mapped[int] = mapped_column(Integer)
+    cash_to_suppliers: Mapped[float] = mapped_column(Numeric(10, 2))
+    cashless_to_suppliers: Mapped[float] = mapped_column(Numeric(10, 2))
+    version: Mapped[int] = mapped_column(Integer)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=False))
+    employee_id: Mapped[int] = mapped_column(ForeignKey("employee.id"))
+    branch_id: Mapped[int] = mapped_column(ForeignKey("branch.id"))
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=False),
+        default=func.now()
+    )
+
+
+class ChangeLog(Base):
+    """Журнал событий инвалидации кешей для SQLite (на Postgres - NOTIFY)"""
+    __tablename__ = "change_log"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    entity: Mapped[str] = mapped_column(String(32))
+    key: Mapped[str] = mapped_column(String(64), nullable=True)
+    origin: Mapped[str] = mapped_column(String(16))
+    published_at: Mapped[float] = mapped_column(Float)
+
+
+class LeaderLease(Base):
+    """Аренда лидерства для SQLite (на Postgres - advisory lock)"""
+    __tablename__ = "leader_lease"
+    
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    holder: Mapped[str] = mapped_column(String(128))
+    expires_at: Mapped[float] = mapped_column(Float)
+
+
+class JobRun(Base):
+    """Отметки запусков фоновых задач: один запуск на слот при смене лидера"""
+    __tablename__ = "job_run"
+    
+    job: Mapped[str] = mapped_column(String(64), primary_key=True)
+    slot: Mapped[str] = mapped_column(String(32), primary_key=True)
+    holder: Mapped[str] = mapped_column(String(128))
+    started_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=False),
+        default=func.now()
+    )
+
+
+class CashReconciliation(Base):
+    """Сверка остатка кассы филиала за день: остаток вчера + наличные - поставщикам"""
+    __tablename__ = "cash_reconciliation"
+    
+    branch_id: Mapped[int] = mapped_column(ForeignKey("branch.id"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    cash: Mapped[float] = mapped_column(Numeric(10, 2))
+    cash_to_suppliers: Mapped[float] = mapped_column(Numeric(10, 2))
+    actual_balance: Mapped[float] = mapped_column(Numeric(10, 2))
+    # Нет предыдущего дня в окне сверки - ожидаемый остаток не определен
+    prev_day: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
+    expected_balance: Mapped[Optional[float]] = mapped_column(Numeric(10, 2), nullable=True)
+    difference: Mapped[Optional[float]] = mapped_column(Numeric(10, 2), nullable=True)
+    checked_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=False),
+        default=func.now()
+    )
+    
+    __table_args__ = (
+        Index("ix_cash_reconciliation_day", "day"),
+    )
+
+class ReportFieldStats(Base):
+    """Среднее и дисперсия поля отчета по филиалу и дню недели (алгоритм Уэлфорда)"""
+    __tablename__ = "report_field_stats"
+    
+    branch_id: Mapped[int] = mapped_column(ForeignKey("branch.id"), primary_key=True)
+    # 0 - понедельник, как datetime.weekday()
+    weekday: Mapped[int] = mapped_column(Integer, primary_key=True)
+    field: Mapped[str] = mapped_column(String(32), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+    mean: Mapped[float] = mapped_column(Float, default=0.0)
+    # Сумма квадратов отклонений от среднего: дисперсия = m2 / (count - 1)
+    m2: Mapped[float] = mapped_column(Float, default=0.0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=False),
+        default=func.now(),
+        onupdate=func.now()
+    )
+class SheetDayDigest(Base):
+    """Хеш строк листа Reports за день, ожидаемых по БД (сверка с таблицей)"""
+    __tablename__ = "sheet_day_digest"
+    
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    # Дешевый признак содержимого дня в БД: пока он тот же, хеш не пересчитывается
+    signature: Mapped[str] = mapped_column(String(128))
+    digest: Mapped[str] = mapped_column(String(64))
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=False),
+        default=func.now(),
+        onupdate=func.now()
+    )
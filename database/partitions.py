@@ -0,0 +1,114 @@
+from datetime import date, datetime
+from typing import List, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from utils.logger import logger
+from utils.metrics import registry
+
+DEFAULT_PARTITION = "report_default"
+
+DEFAULT_PARTITION_ROWS = registry.gauge(
+    "report_default_partition_rows",
+    "Строки report в DEFAULT-партиции после обслуживания партиций"
+)
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"report_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_ranges(first: date, months: int) -> List[Tuple[str, date, date]]:
+    """Имя и границы [начало, конец) месячных партиций начиная с first"""
+    start = month_start(first)
+    return [
+        (partition_name(add_months(start, i)), add_months(start, i), add_months(start, i + 1))
+        for i in range(months)
+    ]
+
+
+async def is_report_partitioned(conn) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    result = await conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'report' AND c.relnamespace = current_schema()::regnamespace"
+    ))
+    return result.scalar() is not None
+
+
+async def _default_months(conn) -> List[date]:
+    """Месяцы, строки которых попали в DEFAULT-партицию"""
+    result = await conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', report_date)::date FROM {DEFAULT_PARTITION}"
+    ))
+    return sorted(result.scalars())
+
+
+async def _create_partition(conn, name: str, start: date, end: date, from_default: bool):
+    bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    if not from_default:
+        await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF report {bounds}"))
+        return
+    # CREATE ... PARTITION OF упал бы на строках месяца в DEFAULT: переносим их
+    # в отдельную таблицу и подключаем ее как партицию в той же транзакции
+    await conn.execute(text(
+        f"CREATE TABLE {name} (LIKE report INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    ))
+    await conn.execute(text(
+        f"WITH moved AS ("
+        f"DELETE FROM {DEFAULT_PARTITION} "
+        f"WHERE report_date >= '{start.isoformat()}' AND report_date < '{end.isoformat()}' "
+        f"RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ))
+    await conn.execute(text(f"ALTER TABLE report ATTACH PARTITION {name} {bounds}"))
+
+
+async def ensure_report_partitions(engine: AsyncEngine, months_ahead: int) -> List[str]:
+    """Создать партиции report на текущий и months_ahead следующих месяцев.
+
+    Строки, попавшие в DEFAULT-партицию, переносятся в партиции своих
+    месяцев. Ничего не делает, если таблица не секционирована (SQLite или
+    Postgres без миграции секционирования).
+    """
+    created = []
+    async with engine.begin() as conn:
+        if not await is_report_partitioned(conn):
+            return created
+        existing = set((await conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'report'"
+        ))).scalars())
+        has_default = DEFAULT_PARTITION in existing
+        stray = set(await _default_months(conn)) if has_default else set()
+        today = datetime.utcnow().date()
+        wanted = {start: (name, end) for name, start, end in partition_ranges(today, months_ahead + 1)}
+        for month in stray:
+            wanted[month] = (partition_name(month), add_months(month, 1))
+        for start in sorted(wanted):
+            name, end = wanted[start]
+            if name in existing:
+                continue
+            await _create_partition(conn, name, start, end, from_default=start in stray)
+            created.append(name)
+        left = 0
+        if has_default:
+            left = (await conn.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION}"))).scalar()
+    DEFAULT_PARTITION_ROWS.set(left)
+    if created:
+        logger.info(f"Created report partitions: {', '.join(created)}")
+    if left:
+        logger.warning(f"{left} report rows remain in the {DEFAULT_PARTITION} partition")
+    return created
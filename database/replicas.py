@@ -0,0 +1,131 @@
+import time
+from contextlib import asynccontextmanager
+from itertools import cycle
+from typing import AsyncIterator, Dict, List, Optional
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from config import config
+from utils.logger import logger
+from utils.metrics import registry
+from .invalidation import invalidation_bus
+from .session import async_session_maker, build_engine
+
+DB_READ_ROUTES = registry.counter(
+    "db_read_routes_total",
+    "Сессии чтения по месту назначения",
+    ["target"]
+)
+DB_REPLICA_FAILURES = registry.counter(
+    "db_replica_failures_total",
+    "Ошибки подключения к репликам с переходом на основную БД"
+)
+
+
+class Replica:
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        self.down_until = 0.0
+
+
+class ReplicaRouter:
+    """Маршрутизация чтения: реплики по кругу, запись и свежие данные - основная БД.
+
+    После собственной записи пользователь читает с основной БД sticky_seconds,
+    чтобы не увидеть отстающую реплику. Любая запись (своя или пришедшая
+    через шину инвалидации) открывает такое же окно для чтений с fresh=True:
+    они идут в кешируемые сводки. Упавшая реплика исключается на
+    retry_seconds, ее запросы уходят на основную БД.
+    """
+
+    def __init__(self, replica_urls: List[str], sticky_seconds: float = 10, retry_seconds: float = 30):
+        self.replicas = [
+            Replica(build_engine(url, name=f"replica{index}"))
+            for index, url in enumerate(replica_urls, 1)
+        ]
+        self.sticky_seconds = sticky_seconds
+        self.retry_seconds = retry_seconds
+        self._sticky: Dict[int, float] = {}
+        self._written_at = float("-inf")
+        self._order = cycle(self.replicas) if self.replicas else None
+
+    def mark_written(self, user_id: Optional[int] = None):
+        now = time.monotonic()
+        self._written_at = now
+        if user_id is None:
+            return
+        self._sticky[user_id] = now + self.sticky_seconds
+        # Чистим просроченные отметки, чтобы словарь не рос бесконечно
+        if len(self._sticky) > 1000:
+            self._sticky = {uid: until for uid, until in self._sticky.items() if until > now}
+
+    def _is_sticky(self, user_id: Optional[int]) -> bool:
+        if user_id is None:
+            return False
+        until = self._sticky.get(user_id)
+        return until is not None and until > time.monotonic()
+
+    def recently_written(self) -> bool:
+        """Была ли запись за последние sticky_seconds: реплика может ее еще не видеть"""
+        return time.monotonic() - self._written_at < self.sticky_seconds
+
+    def cacheable(self, session: AsyncSession) -> bool:
+        """Можно ли кешировать прочитанное в сессии: не чтение с реплики в окне отставания"""
+        return not session.info.get("replica") or not self.recently_written()
+
+    def _pick(self) -> Optional[Replica]:
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            replica = next(self._order)
+            if replica.down_until <= now:
+                return replica
+        return None
+
+    @asynccontextmanager
+    async def session(
+        self,
+        user_id: Optional[int] = None,
+        fresh: bool = False
+    ) -> AsyncIterator[AsyncSession]:
+        """Сессия только для чтения: реплика, если можно, иначе основная БД.
+
+        fresh=True - после недавней записи читать с основной БД.
+        """
+        primary_only = self._is_sticky(user_id) or (fresh and self.recently_written())
+        replica = None if not self.replicas or primary_only else self._pick()
+        if replica is not None:
+            session = replica.session_maker()
+            try:
+                # Подключаемся заранее: ошибку реплики видно до выполнения запросов
+                await session.connection()
+            except (exc.SQLAlchemyError, OSError) as e:
+                await session.close()
+                replica.down_until = time.monotonic() + self.retry_seconds
+                DB_REPLICA_FAILURES.inc()
+                logger.warning(f"Read replica {replica.engine.url!r} unavailable, using primary: {e}")
+            else:
+                DB_READ_ROUTES.inc(target="replica")
+                session.info["replica"] = True
+                async with session:
+                    yield session
+                return
+
+        DB_READ_ROUTES.inc(target="primary")
+        async with async_session_maker() as session:
+            yield session
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+replica_router = ReplicaRouter(
+    [url.strip() for url in config.DB_REPLICA_URLS.split(",") if url.strip()],
+    sticky_seconds=config.READ_STICKY_SECONDS,
+    retry_seconds=config.REPLICA_RETRY_SECONDS
+)
+read_session = replica_router.session
+
+# Записи других экземпляров приходят через шину инвалидации
+for _entity in ("report_day", "branch", "employee"):
+    invalidation_bus.subscribe(_entity, lambda key: replica_router.mark_written())
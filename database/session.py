@@ -1,7 +1,67 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from typing import Optional
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 from config import config
+from .instrumentation import instrument_engine, timed_pool_class
+from .sqlite import configure_sqlite, is_sqlite
 
-engine = create_async_engine(config.DB_URL, echo=True)
+
+def _echo_setting():
+    if config.DB_ECHO == "debug":
+        return "debug"
+    return config.DB_ECHO in ("1", "true", "yes")
+
+
+def engine_options(
+    db_url: str,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None,
+    name: str = "primary"
+) -> dict:
+    """Параметры движка и пула из конфигурации (размер пула можно переопределить).
+
+    name - метка движка в метриках пула.
+    """
+    url = make_url(db_url)
+    options = {"echo": _echo_setting()}
+
+    if is_sqlite(db_url) and url.database in (None, "", ":memory:"):
+        # База в памяти живет, пока открыто ее единственное соединение
+        options["poolclass"] = timed_pool_class(db_url, StaticPool, name)
+        return options
+
+    # Файловому SQLite драйвер по умолчанию дает NullPool: каждое соединение
+    # заново открывает файл и применяет прагмы. Держим их в очереди, как и для Postgres
+    options.update(
+        poolclass=timed_pool_class(db_url, AsyncAdaptedQueuePool, name),
+        pool_size=config.DB_POOL_SIZE if pool_size is None else pool_size,
+        max_overflow=config.DB_MAX_OVERFLOW if max_overflow is None else max_overflow,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,
+        pool_pre_ping=config.DB_POOL_PRE_PING
+    )
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            "prepared_statement_cache_size": config.DB_STATEMENT_CACHE_SIZE
+        }
+    return options
+
+
+def build_engine(
+    db_url: str,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None,
+    name: str = "primary"
+) -> AsyncEngine:
+    engine = create_async_engine(db_url, **engine_options(db_url, pool_size, max_overflow, name))
+    instrument_engine(engine, echo_sample_rate=config.DB_ECHO_SAMPLE_RATE)
+    if is_sqlite(db_url):
+        configure_sqlite(engine)
+    return engine
+
+
+engine = build_engine(config.DB_URL)
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 async def get_async_session() -> AsyncSession:
@@ -0,0 +1,181 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from config import config
+from utils.logger import logger
+from utils.metrics import registry
+from .session import engine
+from .sqlite import is_sqlite
+
+WriteWork = Callable[[AsyncSession], Awaitable[Any]]
+
+WRITE_BATCH_SIZE = registry.histogram(
+    "db_write_batch_size",
+    "Количество записей в одной общей транзакции",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+WRITE_QUEUE_WAIT_SECONDS = registry.histogram(
+    "db_write_queue_wait_seconds",
+    "Ожидание записи в очереди единственного писателя"
+)
+
+
+def _pending_callbacks(session: AsyncSession) -> list:
+    """Очередь callback'ов сессии вне пачки: выполняется на COMMIT, сбрасывается на ROLLBACK.
+
+    SAVEPOINT тоже вызывает after_commit/after_rollback, поэтому события
+    вложенных транзакций пропускаются: важна только внешняя.
+    """
+    pending = session.info.get("pending_after_commit")
+    if pending is not None:
+        return pending
+    pending = session.info["pending_after_commit"] = []
+
+    def on_commit(sync_session):
+        if sync_session.in_nested_transaction():
+            return
+        callbacks = list(pending)
+        pending.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"After-commit callback failed: {e}")
+
+    def on_rollback(sync_session):
+        if not sync_session.in_nested_transaction():
+            pending.clear()
+
+    event.listen(session.sync_session, "after_commit", on_commit)
+    event.listen(session.sync_session, "after_rollback", on_rollback)
+    return pending
+
+
+def run_after_commit(session: AsyncSession, callback: Callable[[], None]):
+    """Выполнить callback после фиксации транзакции, в которой работает сессия.
+
+    Если транзакция откатится, callback не выполнится вовсе.
+    """
+    if session.info.get("write_batch"):
+        session.info.setdefault("after_commit", []).append(callback)
+    elif session.in_transaction() or session.new or session.dirty or session.deleted:
+        _pending_callbacks(session).append(callback)
+    else:
+        callback()
+
+
+class WriteQueue:
+    """Единственный писатель: собирает конкурентные записи в общие транзакции.
+
+    Каждая работа выполняется в своем SAVEPOINT, поэтому ошибка одной записи
+    не откатывает остальные в пачке. Результаты отдаются после COMMIT.
+    Чтение идет мимо очереди и выполняется параллельно.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker,
+        enabled: bool = True,
+        max_batch: int = 50,
+        max_delay: float = 0.005
+    ):
+        self.session_maker = session_maker
+        self.enabled = enabled
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def submit(self, work: WriteWork) -> Any:
+        if not self.enabled:
+            async with self.session_maker() as session:
+                result = await work(session)
+                await session.commit()
+                return result
+
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        await self._queue.put((work, future, loop.time()))
+        return await future
+
+    async def _collect(self) -> List[Tuple[WriteWork, asyncio.Future, float]]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                await self._write(batch)
+            except Exception as e:
+                logger.error(f"Write batch failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _write(self, batch):
+        loop = asyncio.get_running_loop()
+        WRITE_BATCH_SIZE.observe(len(batch))
+        results = []
+        async with self.session_maker() as session:
+            session.info["write_batch"] = True
+            callbacks = session.info.setdefault("after_commit", [])
+            for work, future, queued_at in batch:
+                WRITE_QUEUE_WAIT_SECONDS.observe(loop.time() - queued_at)
+                registered = len(callbacks)
+                try:
+                    async with session.begin_nested():
+                        results.append((future, await work(session), None))
+                except Exception as e:
+                    # Откатился только SAVEPOINT этой работы
+                    del callbacks[registered:]
+                    results.append((future, None, e))
+            await session.commit()
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"After-commit callback failed: {e}")
+        for future, result, error in results:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+
+write_queue = WriteQueue(
+    async_sessionmaker(
+        engine.execution_options(sqlite_begin="IMMEDIATE"),
+        class_=AsyncSession,
+        expire_on_commit=False
+    ),
+    enabled=is_sqlite(config.DB_URL) and config.SQLITE_WRITE_QUEUE,
+    max_batch=config.WRITE_QUEUE_MAX_BATCH,
+    max_delay=config.WRITE_QUEUE_MAX_DELAY_MS / 1000
+)
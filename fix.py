@@ -1,12 +1,13 @@
 import asyncio
 from database.models import Base
 from database.session import engine
+from utils.logger import logger
 
 async def main():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
-    print("Tables recreated!")
+    logger.info("Tables recreated!")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
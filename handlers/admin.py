@@ -1,14 +1,29 @@
+import os
+from typing import Optional
+import pytz
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
-from aiogram.filters import Command
+from aiogram.types import (
+    Message, CallbackQuery, InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+)
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from database.session import async_session_maker
+from sqlalchemy import func, select
+from database.session import async_session_maker, engine
+from database.instrumentation import pool_stats
 from database.dao import EmployeeDAO, BranchDAO
+from database.models import Employee, Report, ReportArchive
 from services.google_sheets import GoogleSheetsService
+from services.slowlog import slow_log
+from services.search_index import search_index
+from services.branch_directory import branch_directory
+from services.backup import sqlite_backup
 from keyboards.builder import get_main_menu, get_admin_employees_keyboard
+from utils.logger import logger
 
-router = Router()
+router = Router(name="admin")
+
+SEARCH_RESULTS_LIMIT = 20
 
 class AddEmployeeStates(StatesGroup):
     waiting_for_telegram_id = State()
@@ -57,33 +72,41 @@ async def process_full_name(message: Message, state: FSMContext):
     await state.update_data(full_name=message.text.strip())
     
     # Показываем список филиалов
-    async with async_session_maker() as session:
-        branch_dao = BranchDAO(session)
-        branches = await branch_dao.get_all()
-        
-        if not branches:
-            await message.answer("❌ Нет доступных филиалов. Сначала добавьте филиал.")
-            await state.clear()
-            return
-        
-        response = "Выберите филиал (введите номер):\n\n"
-        for i, branch in enumerate(branches, 1):
-            response += f"{i}. {branch.name}\n"
-        
-        await state.update_data(branches=branches)
-        await state.set_state(AddEmployeeStates.waiting_for_branch)
-        await message.answer(response)
+    await branch_directory.ensure_fresh()
+    branches = branch_directory.all()
+    
+    if not branches:
+        await message.answer("❌ Нет доступных филиалов. Сначала добавьте филиал.")
+        await state.clear()
+        return
+    
+    response = "Выберите филиал (введите номер или часть названия):\n\n"
+    for i, branch in enumerate(branches, 1):
+        response += f"{i}. {branch.name}\n"
+    
+    # В FSM только id: данные состояния должны сериализоваться любым хранилищем
+    await state.update_data(branch_ids=[branch.id for branch in branches])
+    await state.set_state(AddEmployeeStates.waiting_for_branch)
+    await message.answer(response)
+
+def _pick_branch(text: str, branch_ids) -> Optional[int]:
+    """id филиала по номеру из списка или по части названия (если она однозначна)"""
+    if text.strip().isdigit():
+        choice = int(text)
+        return branch_ids[choice - 1] if 1 <= choice <= len(branch_ids) else None
+    hits = search_index.search(text, limit=2, kind="branch")
+    if len(hits) != 1 or hits[0].id not in branch_ids:
+        return None
+    return hits[0].id
 
 @router.message(AddEmployeeStates.waiting_for_branch)
 async def process_branch(message: Message, state: FSMContext):
     try:
-        choice = int(message.text)
         data = await state.get_data()
-        branches = data['branches']
+        await search_index.ensure_fresh()
+        branch_id = _pick_branch(message.text, data['branch_ids'])
         
-        if 1 <= choice <= len(branches):
-            selected_branch = branches[choice - 1]
-            
+        if branch_id is not None:
             # Создаем сотрудника
             async with async_session_maker() as session:
                 employee_dao = EmployeeDAO(session)
@@ -99,11 +122,12 @@ async def process_branch(message: Message, state: FSMContext):
                 new_employee = await employee_dao.create(
                     telegram_id=data['telegram_id'],
                     full_name=data['full_name'],
-                    branch_id=selected_branch.id
+                    branch_id=branch_id
                 )
                 
                 # Синхронизируем с Google Sheets
                 sheets_service = GoogleSheetsService()
+                await branch_directory.ensure_fresh()
                 employees_list = await employee_dao.get_all()
                 employees_data = []
                 for emp in employees_list:
@@ -111,7 +135,7 @@ async def process_branch(message: Message, state: FSMContext):
                         'id': emp.id,
                         'telegram_id': emp.telegram_id,
                         'full_name': emp.full_name,
-                        'branch_name': emp.branch.name,
+                        'branch_name': branch_directory.name(emp.branch_id),
                         'is_active': emp.is_active,
                         'is_admin': emp.is_admin,
                         'created_at': emp.created_at
@@ -123,19 +147,38 @@ async def process_branch(message: Message, state: FSMContext):
                 f"✅ Сотрудник добавлен:\n"
                 f"👤 {new_employee.full_name}\n"
                 f"🆔 Telegram ID: {new_employee.telegram_id}\n"
-                f"🏢 Филиал: {selected_branch.name}"
+                f"🏢 Филиал: {branch_directory.name(branch_id)}"
             )
         else:
-            await message.answer("❌ Неверный номер филиала. Попробуйте снова:")
+            await message.answer("❌ Филиал не найден или не однозначен. Введите номер или название:")
     except ValueError:
-        await message.answer("❌ Введите номер филиала (число):")
+        await message.answer("❌ Введите номер или название филиала:")
+
+async def _answer_search(message: Message, query: str, kind=None):
+    await search_index.ensure_fresh()
+    hits = search_index.search(query, limit=SEARCH_RESULTS_LIMIT, kind=kind)
+    if not hits:
+        await message.answer("🔍 Ничего не найдено.")
+        return
+    
+    response = f"🔍 Найдено по запросу «{query}»:\n\n"
+    for hit in hits:
+        icon = "🏢" if hit.kind == "branch" else "👤"
+        response += f"{icon} {hit.title}\n   {hit.subtitle}\n"
+    await message.answer(response)
 
 @router.message(Command("remove_employee"))
-async def cmd_remove_employee(message: Message, employee):
+async def cmd_remove_employee(message: Message, employee, command: CommandObject):
     if not employee.is_admin:
         await message.answer("❌ Только для администраторов.")
         return
     
+    # С аргументом - только найденные сотрудники, а не весь список
+    if command.args:
+        await _answer_search(message, command.args, kind="employee")
+        return
+    
+    await branch_directory.ensure_fresh()
     async with async_session_maker() as session:
         employee_dao = EmployeeDAO(session)
         employees = await employee_dao.get_all()
@@ -147,16 +190,21 @@ async def cmd_remove_employee(message: Message, employee):
         response = "Список сотрудников (введите номер для деактивации):\n\n"
         for i, emp in enumerate(employees, 1):
             status = "✅" if emp.is_active else "❌"
-            response += f"{i}. {status} {emp.full_name} (@{emp.telegram_id}) - {emp.branch.name}\n"
+            response += f"{i}. {status} {emp.full_name} (@{emp.telegram_id}) - {branch_directory.name(emp.branch_id)}\n"
         
         await message.answer(response)
 
 @router.message(Command("list_employees"))
-async def cmd_list_employees(message: Message, employee):
+async def cmd_list_employees(message: Message, employee, command: CommandObject):
     if not employee.is_admin:
         await message.answer("❌ Только для администраторов.")
         return
     
+    if command.args:
+        await _answer_search(message, command.args, kind="employee")
+        return
+    
+    await branch_directory.ensure_fresh()
     async with async_session_maker() as session:
         employee_dao = EmployeeDAO(session)
         employees = await employee_dao.get_all()
@@ -172,7 +220,7 @@ async def cmd_list_employees(message: Message, employee):
             response += (
                 f"👤 {emp.full_name}\n"
                 f"   🆔 ID: {emp.telegram_id}\n"
-                f"   🏢 Филиал: {emp.branch.name}\n"
+                f"   🏢 Филиал: {branch_directory.name(emp.branch_id)}\n"
                 f"   {status} | {role}\n"
                 f"   📅 Создан: {emp.created_at.strftime('%d.%m.%Y')}\n\n"
             )
@@ -211,9 +259,9 @@ async def process_branch_name(message: Message, state: FSMContext):
         
         # Синхронизируем с Google Sheets
         #sheets_service = GoogleSheetsService()
-        branches_list = await branch_dao.get_all()
+        await branch_directory.ensure_fresh()
         branches_data = []
-        for branch in branches_list:
+        for branch in branch_directory.all():
             branches_data.append({
                 'id': branch.id,
                 'name': branch.name,
@@ -230,23 +278,192 @@ async def cmd_list_branches(message: Message, employee):
         await message.answer("❌ Только для администраторов.")
         return
     
+    await branch_directory.ensure_fresh()
+    branches = branch_directory.all()
+    if not branches:
+        await message.answer("🏢 Филиалы не добавлены.")
+        return
+    
+    # Счетчики по всем филиалам - двумя агрегирующими запросами
     async with async_session_maker() as session:
-        branch_dao = BranchDAO(session)
-        branches = await branch_dao.get_all()
-        
-        if not branches:
-            await message.answer("🏢 Филиалы не добавлены.")
-            return
-        
-        response = "🏢 Список филиалов:\n\n"
-        for branch in branches:
-            active_employees = sum(1 for e in branch.employees if e.is_active)
-            response += (
-                f"📍 {branch.name}\n"
-                f"   🆔 ID: {branch.id}\n"
-                f"   👥 Сотрудников: {active_employees}/{len(branch.employees)}\n"
-                f"   📅 Создан: {branch.created_at.strftime('%d.%m.%Y')}\n"
-                f"   📊 Отчетов: {len(branch.reports)}\n\n"
+        employee_counts = {
+            row.branch_id: row for row in (await session.execute(
+                select(
+                    Employee.branch_id,
+                    func.count().label("total"),
+                    func.count().filter(Employee.is_active == True).label("active")
+                ).group_by(Employee.branch_id)
+            )).all()
+        }
+        # Отчеты считаются вместе с архивом версий
+        report_counts = {}
+        for table in (Report, ReportArchive):
+            for branch_id, count in (await session.execute(
+                select(table.branch_id, func.count()).group_by(table.branch_id)
+            )).all():
+                report_counts[branch_id] = report_counts.get(branch_id, 0) + count
+    
+    response = "🏢 Список филиалов:\n\n"
+    for branch in branches:
+        counts = employee_counts.get(branch.id)
+        response += (
+            f"📍 {branch.name}\n"
+            f"   🆔 ID: {branch.id}\n"
+            f"   🕒 Часовой пояс: {branch.timezone}\n"
+            f"   👥 Сотрудников: {counts.active if counts else 0}/{counts.total if counts else 0}\n"
+            f"   📅 Создан: {branch.created_at.strftime('%d.%m.%Y')}\n"
+            f"   📊 Отчетов: {report_counts.get(branch.id, 0)}\n\n"
+        )
+    
+    await message.answer(response)
+
+@router.message(Command("branch_tz"))
+async def cmd_branch_tz(message: Message, employee, command: CommandObject):
+    if not employee.is_admin:
+        await message.answer("❌ Только для администраторов.")
+        return
+    
+    parts = (command.args or "").split()
+    if len(parts) not in (1, 2) or not parts[0].isdigit():
+        await message.answer(
+            "🕒 Использование: /branch_tz <ID филиала> [часовой пояс, например Asia/Yekaterinburg]\n"
+            "Без часового пояса - общий из настроек."
+        )
+        return
+    
+    branch_id = int(parts[0])
+    timezone = parts[1] if len(parts) == 2 else ""
+    if timezone and timezone not in pytz.all_timezones_set:
+        await message.answer(f"❌ Неизвестный часовой пояс: {timezone}")
+        return
+    
+    async with async_session_maker() as session:
+        branch = await BranchDAO(session).update(branch_id, timezone=timezone)
+    if branch is None:
+        await message.answer("❌ Филиал не найден.")
+        return
+    
+    await message.answer(
+        f"✅ Часовой пояс филиала '{branch.name}': {branch.timezone or 'общий из настроек'}\n"
+        "Напоминания сотрудникам филиала приходят по этому времени."
+    )
+
+@router.message(Command("slowlog"))
+async def cmd_slowlog(message: Message, employee):
+    if not employee.is_admin:
+        await message.answer("❌ Только для администраторов.")
+        return
+    
+    entries = slow_log.worst(10)
+    if not entries:
+        await message.answer("🐢 Медленных апдейтов не зафиксировано.")
+        return
+    
+    response = "🐢 Самые медленные апдейты:\n\n"
+    for entry in entries:
+        sql_spans = [s for s in entry['spans'] if s['kind'] == 'sql']
+        outbound_spans = [s for s in entry['spans'] if s['kind'] in ('telegram', 'sheets')]
+        response += (
+            f"⏱ {entry['duration_ms']:.0f} мс | {entry['handler'] or 'без обработчика'}\n"
+            f"   📅 {entry['at']} | 🆔 update {entry['update_id']} | 👤 {entry['user_id']}\n"
+            f"   ⚙️ middleware: {entry['middleware_ms']:.0f} мс, обработчик: {entry['handler_ms']:.0f} мс\n"
+            f"   🗄 SQL: {len(sql_spans)} запр., {sum(s['duration_ms'] for s in sql_spans):.0f} мс\n"
+            f"   🌐 Внешние вызовы: {len(outbound_spans)}, "
+            f"{sum(s['duration_ms'] for s in outbound_spans):.0f} мс\n\n"
+        )
+    
+    await message.answer(response)
+
+@router.message(Command("dbstats"))
+async def cmd_dbstats(message: Message, employee):
+    if not employee.is_admin:
+        await message.answer("❌ Только для администраторов.")
+        return
+    
+    stats = pool_stats(engine)
+    response = (
+        f"🗄 База данных: {stats['backend']} ({stats['engine']})\n"
+        f"🔌 Пул: {stats['pool_class']}\n"
+        f"   {stats['status']}\n\n"
+        f"📤 Выдано сейчас: {stats['checked_out']}\n"
+    )
+    if 'size' in stats:
+        response += (
+            f"📦 Размер пула: {stats['size']}\n"
+            f"➕ Сверх размера (overflow): {stats['overflow']}\n"
+        )
+    response += (
+        f"🔁 Всего выдач: {stats['checkouts']}\n"
+        f"⏳ Среднее ожидание соединения: {stats['wait_avg_ms']:.2f} мс "
+        f"({stats['waits']} ожид.)\n"
+        f"⛔ Таймауты ожидания: {stats['timeouts']}"
+    )
+    
+    await message.answer(response)
+
+@router.message(Command("backup"))
+async def cmd_backup(message: Message, employee):
+    if not employee.is_admin:
+        await message.answer("❌ Только для администраторов.")
+        return
+    
+    if not sqlite_backup.supported:
+        await message.answer("❌ Резервные копии делаются только для БД SQLite в файле.")
+        return
+    if sqlite_backup.running:
+        await message.answer("⏳ Копия уже делается, новая начнется сразу после нее.")
+    else:
+        await message.answer("⏳ Делаю резервную копию БД...")
+    
+    try:
+        result, check = await sqlite_backup.run()
+    except Exception as e:
+        logger.error(f"SQLite backup failed: {e}")
+        await message.answer(f"❌ Резервная копия не удалась: {e}")
+        return
+    
+    await message.answer(
+        f"✅ Резервная копия готова и проверена\n\n"
+        f"Файл: {os.path.basename(result.path)}\n"
+        f"Размер: {result.size / 1024 / 1024:.1f} МБ (БД {result.db_size / 1024 / 1024:.1f} МБ)\n"
+        f"Время: {result.seconds:.1f} с\n"
+        f"Таблиц: {len(check.tables)}, строк: {sum(check.tables.values())} "
+        f"({'совпадает с БД' if result.source_counts else 'проверена только целость архива'})"
+    )
+
+@router.message(Command("find"))
+async def cmd_find(message: Message, employee, command: CommandObject):
+    if not employee.is_admin:
+        await message.answer("❌ Только для администраторов.")
+        return
+    
+    if not command.args:
+        await message.answer(
+            "🔍 Использование: /find <часть ФИО, Telegram ID или названия филиала>\n"
+            "Также можно искать в любом чате: @имя_бота <запрос>"
+        )
+        return
+    
+    await _answer_search(message, command.args)
+
+@router.inline_query()
+async def inline_find(inline_query: InlineQuery, employee):
+    if not employee.is_admin:
+        await inline_query.answer([], cache_time=60, is_personal=True)
+        return
+    
+    await search_index.ensure_fresh()
+    hits = search_index.search(inline_query.query, limit=SEARCH_RESULTS_LIMIT)
+    results = [
+        InlineQueryResultArticle(
+            id=f"{hit.kind}:{hit.id}",
+            title=f"{'🏢' if hit.kind == 'branch' else '👤'} {hit.title}",
+            description=hit.subtitle,
+            input_message_content=InputTextMessageContent(
+                message_text=f"{hit.title}\n{hit.subtitle}"
             )
-        
-        await message.answer(response)
\ No newline at end of file
+        )
+        for hit in hits
+    ]
+    # Индекс меняется вместе с БД - кеш Telegram держим коротким
+    await inline_query.answer(results, cache_time=5, is_personal=True)
\ No newline at end of file
@@ -3,7 +3,7 @@ from aiogram.types import Message
 from aiogram.filters import CommandStart
 from keyboards.builder import get_main_menu
 
-router = Router()
+router = Router(name="common")
 
 @router.message(CommandStart())
 async def cmd_start(message: Message, employee):
@@ -2,19 +2,25 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from datetime import datetime
-from database.session import async_session_maker
+from database.replicas import read_session, replica_router
 from database.dao import ReportDAO, EmployeeDAO
+from database.write_queue import write_queue
 from states.report import ReportStates
 from services.validators import ReportValidator
 from services.google_sheets import GoogleSheetsService
+from services.branch_directory import branch_directory
+from services.outbound import bulk_sends, edit_and_answer
+from services.anomalies import anomaly_detector, format_anomalies
+from config import config
+from utils.logger import logger
 from keyboards.builder import get_main_menu, get_cancel_keyboard, get_confirmation_keyboard
 
-router = Router()
+router = Router(name="employee")
 
 
 @router.message(F.text == "📊 Заполнить отчет за сегодня")
 async def start_report(message: Message, employee, state: FSMContext):
-    async with async_session_maker() as session:
+    async with read_session(message.from_user.id) as session:
         report_dao = ReportDAO(session)
         existing_report = await report_dao.get_employee_today_report(employee.id)
         
@@ -111,7 +117,7 @@ async def process_cash_to_suppliers(message: Message, state: FSMContext):
 
 
 @router.message(ReportStates.waiting_for_cashless_to_suppliers)
-async def process_cashless_to_suppliers(message: Message, state: FSMContext):
+async def process_cashless_to_suppliers(message: Message, employee, state: FSMContext):
     is_valid, amount = ReportValidator.validate_amount(message.text)
     if not is_valid:
         await message.answer("❌ Неверный формат суммы. Введите положительное число:")
@@ -139,9 +145,20 @@ async def process_cashless_to_suppliers(message: Message, state: FSMContext):
         f"👥 Клиентов: {data['clients_count']}\n"
         f"📤 Наличные поставщикам: {data['cash_to_suppliers']}\n"
         f"📥 Безнал поставщикам: {data['cashless_to_suppliers']}\n\n"
-        f"Проверьте данные и подтвердите отправку."
     )
     
+    # Сравнение с обычными значениями филиала за этот день недели
+    async with read_session(message.from_user.id) as session:
+        anomalies = await anomaly_detector.check(
+            session, employee.branch_id, datetime.utcnow().weekday(), data
+        )
+    if anomalies:
+        summary += (
+            "⚠️ Необычные значения - проверьте, нет ли опечатки:\n"
+            f"{format_anomalies(anomalies)}\n"
+        )
+    summary += "Проверьте данные и подтвердите отправку."
+    
     await state.set_state(ReportStates.summary)
     await message.answer(summary, reply_markup=get_confirmation_keyboard())
 
@@ -150,20 +167,19 @@ async def process_cashless_to_suppliers(message: Message, state: FSMContext):
 async def confirm_send(callback: CallbackQuery, employee, state: FSMContext):
     data = await state.get_data()
     
-    async with async_session_maker() as session:
+    # Создаем datetime без часового пояса
+    report_date = datetime.utcnow()
+    
+    async def save_report(session):
         report_dao = ReportDAO(session)
         employee_dao = EmployeeDAO(session)
         
-        # Получаем текущего сотрудника с branch
         current_employee = await employee_dao.get_by_telegram_id(employee.telegram_id)
         
-        # Определяем версию
+        # Определяем версию в той же транзакции, что и запись
         existing_report = await report_dao.get_employee_today_report(current_employee.id)
         version = existing_report.version + 1 if existing_report else 1
         
-        # Создаем datetime без часового пояса
-        report_date = datetime.utcnow()
-        
         # Создаем отчет
         report = await report_dao.create(
             report_date=report_date,
@@ -178,40 +194,69 @@ async def confirm_send(callback: CallbackQuery, employee, state: FSMContext):
             employee_id=current_employee.id,
             branch_id=current_employee.branch_id
         )
-        
-        # Синхронизируем с Google Sheets
-        try:
-            sheets_service = GoogleSheetsService()
-            await sheets_service.append_report({
-                'report_date': report.report_date,
-                'branch_name': current_employee.branch.name,
-                'employee_name': current_employee.full_name,
-                'total_income': report.total_income,
-                'cash': report.cash,
-                'cashless': report.cashless,
-                'cash_balance': report.cash_balance,
-                'clients_count': report.clients_count,
-                'cash_to_suppliers': report.cash_to_suppliers,
-                'cashless_to_suppliers': report.cashless_to_suppliers,
-                'version': report.version,
-                'created_at': report.created_at
-            })
-        except Exception as e:
-            # Если ошибка с Google Sheets, всё равно сохраняем отчет в БД
-            await callback.message.answer(
-                f"⚠️ Отчет сохранен в базу данных, но не синхронизирован с Google Sheets: {e}"
-            )
+        # Статистика полей обновляется в той же транзакции
+        anomalies = await anomaly_detector.record(session, report, previous=existing_report)
+        return current_employee, report, anomalies
+    
+    # Запись идет через очередь единственного писателя (SQLite)
+    current_employee, report, anomalies = await write_queue.submit(save_report)
+    # Пока реплики догоняют, пользователь читает свои отчеты с основной БД
+    replica_router.mark_written(callback.from_user.id)
+    version = report.version
+    
+    # Синхронизируем с Google Sheets (название филиала - из справочника, без запроса)
+    await branch_directory.ensure_fresh()
+    try:
+        sheets_service = GoogleSheetsService()
+        await sheets_service.append_report({
+            'report_date': report.report_date,
+            'branch_name': branch_directory.name(current_employee.branch_id),
+            'employee_name': current_employee.full_name,
+            'total_income': report.total_income,
+            'cash': report.cash,
+            'cashless': report.cashless,
+            'cash_balance': report.cash_balance,
+            'clients_count': report.clients_count,
+            'cash_to_suppliers': report.cash_to_suppliers,
+            'cashless_to_suppliers': report.cashless_to_suppliers,
+            'version': report.version,
+            'created_at': report.created_at
+        })
+    except Exception as e:
+        # Если ошибка с Google Sheets, всё равно сохраняем отчет в БД
+        await callback.message.answer(
+            f"⚠️ Отчет сохранен в базу данных, но не синхронизирован с Google Sheets: {e}"
+        )
     
     await state.clear()
-    await callback.message.edit_text(
+    await edit_and_answer(
+        callback.message,
         f"✅ Отчет успешно сохранен!\n"
         f"Версия: {version}\n"
-        f"Дата: {report_date.strftime('%Y-%m-%d %H:%M')}"
-    )
-    await callback.message.answer(
-        "Главное меню:", 
+        f"Дата: {report_date.strftime('%Y-%m-%d %H:%M')}",
+        "Главное меню:",
         reply_markup=get_main_menu("employee")
     )
+    
+    if anomalies:
+        await _notify_admins(
+            callback.bot,
+            f"⚠️ Необычный отчет: {current_employee.full_name} "
+            f"({branch_directory.name(current_employee.branch_id)}), версия {version}\n"
+            f"{format_anomalies(anomalies)}"
+        )
+
+
+async def _notify_admins(bot, text: str):
+    async with read_session() as session:
+        admin_ids = set(config.ADMIN_IDS) | set(await EmployeeDAO(session).get_admin_telegram_ids())
+    # Уведомления уступают очередь ответам пользователям
+    with bulk_sends():
+        for telegram_id in admin_ids:
+            try:
+                await bot.send_message(telegram_id, text)
+            except Exception as e:
+                logger.error(f"Error notifying admin {telegram_id}: {e}")
 
 
 @router.callback_query(ReportStates.summary, F.data == "confirm_edit")
@@ -233,7 +278,7 @@ async def confirm_restart(callback: CallbackQuery, state: FSMContext):
 
 @router.message(F.text == "✏️ Исправить отчет за сегодня")
 async def edit_today_report(message: Message, employee, state: FSMContext):
-    async with async_session_maker() as session:
+    async with read_session(message.from_user.id) as session:
         report_dao = ReportDAO(session)
         existing_report = await report_dao.get_employee_today_report(employee.id)
         
@@ -272,7 +317,7 @@ async def edit_today_report(message: Message, employee, state: FSMContext):
 
 @router.message(F.text == "📋 Мои последние отчеты")
 async def show_my_reports(message: Message, employee):
-    async with async_session_maker() as session:
+    async with read_session(message.from_user.id) as session:
         report_dao = ReportDAO(session)
         reports = await report_dao.get_employee_reports(employee.id, limit=5)
         
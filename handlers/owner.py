@@ -1,15 +1,58 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
-from aiogram.filters import Command
-from datetime import datetime, timedelta
+from aiogram.types import BufferedInputFile, Message, CallbackQuery
+from aiogram.filters import Command, CommandObject
+from datetime import date, datetime, timedelta
 from sqlalchemy.orm import selectinload, joinedload
-from sqlalchemy import select, func
-from database.session import async_session_maker
-from database.dao import ReportDAO, BranchDAO
+from sqlalchemy import select
+from database.replicas import read_session, replica_router
+from database.dao import ReportDAO, BranchDAO, reports_for_days
 from database.models import Report, Employee, Branch
 from keyboards.builder import get_main_menu
+from services.report_cache import report_cache
+from services.submission_tracker import submission_tracker
+from services.branch_directory import branch_directory
+from services.reconciliation import cash_reconciler, format_discrepancies
+from services.search_index import search_index
+from services.charts import chart_service
+from config import config
+from utils.logger import logger
 
-router = Router()
+router = Router(name="owner")
+
+
+def daily_reports_query(day: date):
+    """Отчеты за день (с архивом для прошлых дней) с сотрудником и филиалом"""
+    reports = reports_for_days(day)
+    return (
+        select(reports)
+        .options(
+            joinedload(reports.employee).joinedload(Employee.branch)
+        )
+        .join(Employee, reports.employee_id == Employee.id)
+        .join(Branch, Employee.branch_id == Branch.id)
+        .order_by(Branch.name, Employee.full_name)
+    )
+
+
+def _cache_view(session, kind: str, day: date, response: str, generation):
+    """Положить сводку в кеш, если она прочитана не с отстающей реплики"""
+    if replica_router.cacheable(session):
+        report_cache.set(kind, day, response, generation=generation)
+
+
+def recent_reports_query(since: datetime, limit: int = 10):
+    """Последние отчеты начиная с указанного момента"""
+    return (
+        select(Report)
+        .options(
+            joinedload(Report.employee).joinedload(Employee.branch)
+        )
+        .join(Employee)
+        .join(Branch)
+        .where(Report.report_date >= since)
+        .order_by(Report.report_date.desc())
+        .limit(limit)
+    )
 
 
 @router.message(F.text == "📊 Отчет за сегодня")
@@ -19,25 +62,22 @@ async def cmd_today(message: Message, employee):
         await message.answer("❌ Только для администраторов.")
         return
     
-    async with async_session_maker() as session:
+    today = datetime.utcnow().date()
+    cached = report_cache.get("today", today)
+    if cached is not None:
+        await message.answer(cached)
+        return
+    generation = report_cache.generation(today)
+    
+    async with read_session(fresh=True) as session:
         # Получаем отчеты с явной загрузкой связей
-        today = datetime.utcnow().date()
-        
-        # Вариант 1: Используем SQLAlchemy напрямую с явной загрузкой
-        result = await session.execute(
-            select(Report)
-            .options(
-                joinedload(Report.employee).joinedload(Employee.branch)
-            )
-            .join(Employee)
-            .join(Branch)
-            .where(func.date(Report.report_date) == today)
-            .order_by(Branch.name, Employee.full_name)
-        )
+        result = await session.execute(daily_reports_query(today))
         reports = result.unique().scalars().all()
         
         if not reports:
-            await message.answer("📭 На сегодня отчетов еще нет.")
+            response = "📭 На сегодня отчетов еще нет."
+            _cache_view(session, "today", today, response, generation)
+            await message.answer(response)
             return
         
         total_income = sum(r.total_income for r in reports)
@@ -70,6 +110,7 @@ async def cmd_today(message: Message, employee):
                 f"    💰 {report.total_income:.2f} | 👥 {report.clients_count}\n"
             )
         
+        _cache_view(session, "today", today, response, generation)
         await message.answer(response)
 
 
@@ -94,22 +135,22 @@ async def process_date(message: Message, employee):
     try:
         date_obj = datetime.strptime(message.text, '%Y-%m-%d').date()
         
-        async with async_session_maker() as session:
+        # Прошлые дни почти не меняются - отдаем готовый текст из кеша
+        cached = report_cache.get("daily", date_obj)
+        if cached is not None:
+            await message.answer(cached)
+            return
+        generation = report_cache.generation(date_obj)
+        
+        async with read_session(fresh=True) as session:
             # Используем явную загрузку связей
-            result = await session.execute(
-                select(Report)
-                .options(
-                    joinedload(Report.employee).joinedload(Employee.branch)
-                )
-                .join(Employee)
-                .join(Branch)
-                .where(func.date(Report.report_date) == date_obj)
-                .order_by(Branch.name, Employee.full_name)
-            )
+            result = await session.execute(daily_reports_query(date_obj))
             reports = result.unique().scalars().all()
             
             if not reports:
-                await message.answer(f"📭 На {message.text} отчетов нет.")
+                response = f"📭 На {message.text} отчетов нет."
+                _cache_view(session, "daily", date_obj, response, generation)
+                await message.answer(response)
                 return
             
             response = f"📊 Отчет за {message.text}:\n\n"
@@ -131,6 +172,7 @@ async def process_date(message: Message, employee):
                     f"    📝 Версия: {report.version}\n"
                 )
             
+            _cache_view(session, "daily", date_obj, response, generation)
             await message.answer(response)
     except ValueError:
         await message.answer("❌ Неверный формат даты. Используйте ГГГГ-ММ-ДД")
@@ -143,7 +185,7 @@ async def cmd_branches(message: Message, employee):
         await message.answer("❌ Только для администраторов.")
         return
     
-    async with async_session_maker() as session:
+    async with read_session() as session:
         branch_dao = BranchDAO(session)
         branches = await branch_dao.get_all()
         
@@ -169,21 +211,11 @@ async def cmd_reports_last(message: Message, employee):
         await message.answer("❌ Только для администраторов.")
         return
     
-    async with async_session_maker() as session:
+    async with read_session() as session:
         # Получаем отчеты за последние 3 дня с явной загрузкой связей
         three_days_ago = datetime.utcnow() - timedelta(days=3)
         
-        result = await session.execute(
-            select(Report)
-            .options(
-                joinedload(Report.employee).joinedload(Employee.branch)
-            )
-            .join(Employee)
-            .join(Branch)
-            .where(Report.report_date >= three_days_ago)
-            .order_by(Report.report_date.desc())
-            .limit(10)
-        )
+        result = await session.execute(recent_reports_query(three_days_ago))
         reports = result.unique().scalars().all()
         
         if not reports:
@@ -200,4 +232,102 @@ async def cmd_reports_last(message: Message, employee):
                 f"---\n"
             )
         
-        await message.answer(response)
\ No newline at end of file
+        await message.answer(response)
+
+
+@router.message(Command("missing"))
+async def cmd_missing(message: Message, employee):
+    if not employee.is_admin:
+        await message.answer("❌ Только для администраторов.")
+        return
+    
+    await submission_tracker.ensure_fresh()
+    await branch_directory.ensure_fresh()
+    missing = submission_tracker.missing()
+    completion = submission_tracker.branch_completion()
+    
+    response = (
+        f"📝 Отчеты за {submission_tracker.business_day().strftime('%d.%m.%Y')}: "
+        f"{submission_tracker.submitted_count()}/{len(submission_tracker.employees)}\n\n"
+    )
+    for branch_id, (done, total) in completion.items():
+        mark = "✅" if done == total else "⏳"
+        response += f"{mark} {branch_directory.name(branch_id)}: {done}/{total}\n"
+    
+    if missing:
+        response += "\n❌ Не сдали:\n"
+        for tracked in missing:
+            response += f"• {tracked.full_name} ({branch_directory.name(tracked.branch_id)})\n"
+    else:
+        response += "\n🎉 Все сотрудники сдали отчет."
+    
+    await message.answer(response)
+
+
+@router.message(Command("reconcile"))
+async def cmd_reconcile(message: Message, employee, command: CommandObject):
+    if not employee.is_admin:
+        await message.answer("❌ Только для администраторов.")
+        return
+    
+    days = 7
+    if command.args:
+        if not command.args.strip().isdigit():
+            await message.answer("Использование: /reconcile [дней], например /reconcile 14")
+            return
+        days = min(int(command.args.strip()), cash_reconciler.horizon_days)
+    
+    # Досчитываем дни, затронутые после последнего фонового пересчета
+    await cash_reconciler.run()
+    await branch_directory.ensure_fresh()
+    first_day = datetime.utcnow().date() - timedelta(days=days)
+    discrepancies = await cash_reconciler.discrepancies(first_day)
+    
+    if not discrepancies:
+        await message.answer(f"✅ Остаток кассы сходится за последние {days} дн.")
+        return
+    await message.answer(
+        f"⚠️ Расхождения остатка кассы за последние {days} дн.:\n\n"
+        + format_discrepancies(discrepancies, branch_directory.name)
+    )
+
+
+@router.message(Command("chart"))
+async def cmd_chart(message: Message, employee, command: CommandObject):
+    if not employee.is_admin:
+        await message.answer("❌ Только для администраторов.")
+        return
+    
+    # /chart [филиал] [дней]: без филиала - вся сеть, по умолчанию 30 дней
+    words = (command.args or "").split()
+    days = 30
+    if words and words[-1].isdigit():
+        days = min(max(int(words.pop()), 1), config.CHART_MAX_DAYS)
+    branch_id, label = None, "Вся сеть"
+    if words:
+        await search_index.ensure_fresh()
+        hits = search_index.search(" ".join(words), limit=2, kind="branch")
+        if len(hits) != 1:
+            await message.answer(
+                "❌ Филиал не найден или найдено несколько.\n"
+                "Использование: /chart [филиал] [дней], например /chart Центральный 90"
+            )
+            return
+        branch_id, label = hits[0].id, hits[0].title
+    
+    last_day = datetime.utcnow().date()
+    try:
+        chart = await chart_service.income_chart(last_day - timedelta(days=days - 1), last_day, branch_id, label)
+    except Exception as e:
+        logger.error(f"Chart rendering failed: {e}")
+        await message.answer("❌ Не удалось построить график.")
+        return
+    if chart is None:
+        await message.answer("📊 Нет отчетов за этот период.")
+        return
+    
+    sent = await message.answer_photo(
+        chart.file_id or BufferedInputFile(chart.png, filename="chart.png")
+    )
+    if chart.file_id is None and sent.photo:
+        chart_service.remember_file_id(chart.key, sent.photo[-1].file_id)
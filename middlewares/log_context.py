@@ -0,0 +1,24 @@
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from typing import Dict, Any, Callable, Awaitable
+from utils.logger import log_context
+
+
+class LogContextMiddleware(BaseMiddleware):
+    """Внешний middleware: update_id и пользователь в контексте всех записей лога апдейта"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        event_user = data.get("event_from_user")
+        token = log_context.set({
+            'update_id': event.update_id if isinstance(event, Update) else None,
+            'user_id': event_user.id if event_user else None
+        })
+        try:
+            return await handler(event, data)
+        finally:
+            log_context.reset(token)
@@ -0,0 +1,79 @@
+import time
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject
+from typing import Dict, Any, Callable, Awaitable
+from utils.metrics import registry
+from utils.logger import bind_log_context
+from utils.tracing import record_span
+
+HANDLER_SECONDS = registry.histogram(
+    "handler_seconds",
+    "Время выполнения обработчиков",
+    ["router", "handler"]
+)
+HANDLER_ERRORS = registry.counter(
+    "handler_errors_total",
+    "Исключения в обработчиках",
+    ["router", "handler"]
+)
+TELEGRAM_API_SECONDS = registry.histogram(
+    "telegram_api_seconds",
+    "Длительность вызовов Telegram Bot API",
+    ["method"]
+)
+TELEGRAM_API_ERRORS = registry.counter(
+    "telegram_api_errors_total",
+    "Ошибки вызовов Telegram Bot API",
+    ["method", "error"]
+)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Внутренний middleware: замеряет время конкретного обработчика"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        router = data.get("event_router")
+        handler_object = data.get("handler")
+        router_name = router.name if router is not None else ""
+        handler_name = handler_object.callback.__name__ if handler_object is not None else ""
+        bind_log_context(handler=f"{router_name}.{handler_name}")
+
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(router=router_name, handler=handler_name)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            HANDLER_SECONDS.observe(duration, router=router_name, handler=handler_name)
+            record_span("handler", f"{router_name}.{handler_name}", duration)
+
+
+class TelegramApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: замеряет исходящие вызовы Bot API"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod
+    ):
+        method_name = method.__api_method__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            TELEGRAM_API_ERRORS.inc(method=method_name, error=type(e).__name__)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            TELEGRAM_API_SECONDS.observe(duration, method=method_name)
+            record_span("telegram", method_name, duration)
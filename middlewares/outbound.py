@@ -0,0 +1,51 @@
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from services.outbound import OutboundGate, outbound_priority
+from utils.logger import logger
+
+# Через очередь идут только методы, которые отправляют или меняют сообщения:
+# getUpdates и answerCallbackQuery не должны ждать массовую рассылку
+GATED_PREFIXES = ("send", "edit", "copy", "forward")
+
+
+class OutboundMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: исходящие сообщения через общую очередь с приоритетами.
+
+    Приоритет берется из контекста (services/outbound.py: bulk_sends), поэтому
+    обработчики продолжают вызывать message.answer как обычно. На 429 очередь
+    приостанавливается, запрос повторяется до max_retries раз.
+    """
+
+    def __init__(self, gate: OutboundGate, max_retries: int = 3):
+        self.gate = gate
+        self.max_retries = max_retries
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod
+    ):
+        if not method.__api_method__.startswith(GATED_PREFIXES):
+            return await make_request(bot, method)
+
+        priority = outbound_priority.get()
+        chat_id = getattr(method, "chat_id", None)
+        attempt = 0
+        while True:
+            await self.gate.acquire(priority, chat_id if isinstance(chat_id, int) else None)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                self.gate.pause(e.retry_after)
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(
+                    f"Flood control on {method.__api_method__}: retry in {e.retry_after}s "
+                    f"(attempt {attempt}/{self.max_retries})"
+                )
+            finally:
+                self.gate.release()
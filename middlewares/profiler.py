@@ -0,0 +1,53 @@
+import asyncio
+import cProfile
+import random
+import time
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from typing import Dict, Any, Callable, Awaitable
+from services.slowlog import slow_log
+from utils.tracing import UpdateTrace, current_trace
+
+
+class ProfilerMiddleware(BaseMiddleware):
+    """Внешний middleware: трассирует долю апдейтов и сохраняет медленные"""
+
+    def __init__(self, sample_rate: float, slow_threshold_ms: float, use_cprofile: bool = False):
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.use_cprofile = use_cprofile
+        self._profiling = False
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return await handler(event, data)
+
+        event_user = data.get("event_from_user")
+        trace = UpdateTrace(
+            update_id=event.update_id if isinstance(event, Update) else 0,
+            user_id=event_user.id if event_user else None
+        )
+        token = current_trace.set(trace)
+        # cProfile видит все, что выполняется в потоке, пока апдейт ждет IO,
+        # и в потоке может быть активен только один профилировщик
+        profile = None
+        if self.use_cprofile and not self._profiling:
+            profile = cProfile.Profile()
+            self._profiling = True
+            profile.enable()
+        try:
+            return await handler(event, data)
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._profiling = False
+            current_trace.reset(token)
+            trace.duration = time.perf_counter() - trace.started
+            if trace.duration >= self.slow_threshold:
+                entry = slow_log.add(trace)
+                asyncio.get_running_loop().run_in_executor(None, slow_log.dump, entry, profile)
@@ -0,0 +1,123 @@
+import time
+from collections import OrderedDict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from typing import Dict, Any, Callable, Awaitable, FrozenSet, List, Optional, Tuple
+from utils.logger import logger
+from utils.metrics import registry
+
+THROTTLED_UPDATES = registry.counter(
+    "throttled_updates_total",
+    "Апдейты, отброшенные ограничением частоты",
+    ["kind", "scope"]
+)
+
+
+class TokenBucket:
+    """Ведро токенов: rate в секунду, не больше burst подряд"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> bool:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+def update_kind(event: Update) -> Optional[str]:
+    if event.callback_query is not None:
+        return "callback"
+    if event.message is not None or event.edited_message is not None or event.inline_query is not None:
+        return "message"
+    return None
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Внешний middleware до авторизации: ограничение частоты апдейтов.
+
+    Для каждого пользователя - отдельные ведра для сообщений и нажатий
+    кнопок, плюс общее ведро на весь бот. Ведра хранятся в LRU на
+    max_users записей. Отброшенный апдейт не доходит до AuthMiddleware и БД;
+    пользователь один раз за серию получает предупреждение.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[float, float]],
+        global_limit: Tuple[float, float],
+        max_users: int = 10000,
+        exempt_ids: FrozenSet[int] = frozenset()
+    ):
+        self.limits = limits
+        self.global_bucket = TokenBucket(*global_limit) if global_limit[0] > 0 else None
+        self.max_users = max_users
+        self.exempt_ids = exempt_ids
+        # (user_id, вид апдейта) -> [ведро, предупрежден ли в текущей серии]
+        self._buckets: "OrderedDict[Tuple[int, str], List]" = OrderedDict()
+
+    def _user_allowed(self, user_id: int, kind: str, now: float) -> Tuple[bool, bool]:
+        """(пропустить, нужно ли предупредить)"""
+        key = (user_id, kind)
+        entry = self._buckets.get(key)
+        if entry is None:
+            entry = [TokenBucket(*self.limits[kind]), False]
+            self._buckets[key] = entry
+            if len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        if entry[0].take(now):
+            entry[1] = False
+            return True, False
+        warn = not entry[1]
+        entry[1] = True
+        return False, warn
+
+    async def _warn(self, event: Update, data: Dict[str, Any]):
+        bot = data.get("bot")
+        try:
+            if event.callback_query is not None:
+                await event.callback_query.answer("⏳ Слишком часто, подождите немного.")
+            elif event.message is not None and bot is not None:
+                await bot.send_message(event.message.chat.id, "⏳ Слишком много сообщений, подождите немного.")
+        except Exception as e:
+            logger.warning(f"Throttle notice failed: {e}")
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+        kind = update_kind(event) or "other"
+        now = time.monotonic()
+
+        event_user = data.get("event_from_user")
+        user_id = event_user.id if event_user else None
+        if user_id is not None and user_id not in self.exempt_ids and kind in self.limits:
+            allowed, warn = self._user_allowed(user_id, kind, now)
+            if not allowed:
+                THROTTLED_UPDATES.inc(kind=kind, scope="user")
+                if warn:
+                    await self._warn(event, data)
+                return None
+
+        if self.global_bucket is not None and not self.global_bucket.take(now):
+            THROTTLED_UPDATES.inc(kind=kind, scope="global")
+            return None
+
+        return await handler(event, data)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
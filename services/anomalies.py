@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import math
+from datetime import date, datetime
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import config
+from database.dao import latest_reports
+from database.models import Report, ReportFieldStats
+from database.session import async_session_maker
+from database.write_queue import write_queue
+from utils.logger import logger
+from utils.metrics import registry
+
+# Поля отчета, для которых ведется статистика, и их названия в сообщениях
+FIELD_LABELS = {
+    'total_income': "Общий приход",
+    'cash': "Наличные",
+    'cashless': "Безналичные",
+    'cash_balance': "Остаток в кассе",
+    'clients_count': "Клиентов",
+    'cash_to_suppliers': "Наличные поставщикам",
+    'cashless_to_suppliers': "Безнал поставщикам"
+}
+
+REPORT_ANOMALIES = registry.counter(
+    "report_anomalies_total",
+    "Поля отчетов, отмеченные как необычные",
+    ["field"]
+)
+
+
+class Anomaly(NamedTuple):
+    field: str
+    value: float
+    mean: float
+    spread: float
+
+    @property
+    def score(self) -> float:
+        return abs(self.value - self.mean) / self.spread
+
+
+class Welford(NamedTuple):
+    """Состояние алгоритма Уэлфорда: число значений, среднее, сумма квадратов отклонений"""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def add(self, value: float) -> "Welford":
+        count = self.count + 1
+        delta = value - self.mean
+        mean = self.mean + delta / count
+        return Welford(count, mean, self.m2 + delta * (value - mean))
+
+    def remove(self, value: float) -> "Welford":
+        """Обратный шаг: убрать значение, учтенное раньше (замененная версия отчета)"""
+        if self.count <= 1:
+            return Welford()
+        count = self.count - 1
+        mean = (self.mean * self.count - value) / count
+        return Welford(count, mean, max(0.0, self.m2 - (value - self.mean) * (value - mean)))
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class AnomalyDetector:
+    """Необычные значения отчета относительно истории филиала в тот же день недели.
+
+    Статистика (среднее и дисперсия по Уэлфорду) хранится в report_field_stats
+    и обновляется в транзакции сохранения отчета, поэтому проверка читает
+    7 строк по первичному ключу, а не историю отчетов. Значение необычно,
+    если оно дальше z_threshold разбросов от среднего; разброс не меньше
+    min_relative_spread от среднего и не меньше 1, чтобы поля с почти
+    постоянным значением не давали ложных срабатываний. Пока значений меньше
+    min_samples, поле не оценивается.
+    """
+
+    def __init__(self, z_threshold: float, min_samples: int, min_relative_spread: float = 0.1):
+        self.z_threshold = z_threshold
+        self.min_samples = min_samples
+        self.min_relative_spread = min_relative_spread
+
+    async def _load(
+        self, session: AsyncSession, branch_id: int, weekday: int, lock: bool = False
+    ) -> Dict[str, ReportFieldStats]:
+        query = select(ReportFieldStats).where(
+            ReportFieldStats.branch_id == branch_id,
+            ReportFieldStats.weekday == weekday
+        )
+        # На Postgres другие экземпляры могут обновлять те же строки
+        result = await session.execute(query.with_for_update() if lock else query)
+        return {row.field: row for row in result.scalars().all()}
+
+    async def _create_missing(self, session: AsyncSession, branch_id: int, weekday: int, fields: List[str]):
+        """INSERT ... ON CONFLICT DO NOTHING для недостающих строк статистики.
+
+        SELECT ... FOR UPDATE не блокирует строки, которых еще нет: два первых
+        отчета нового филиала и дня недели иначе оба вставили бы строку, и
+        один упал бы на первичном ключе.
+        """
+        dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+        await session.execute(
+            dialect.insert(ReportFieldStats)
+            .values([
+                {'branch_id': branch_id, 'weekday': weekday, 'field': field, 'count': 0, 'mean': 0.0, 'm2': 0.0}
+                for field in fields
+            ])
+            .on_conflict_do_nothing(index_elements=["branch_id", "weekday", "field"])
+        )
+
+    def _score(self, stats: Mapping[str, Welford], values: Mapping) -> List[Anomaly]:
+        anomalies = []
+        for field in FIELD_LABELS:
+            state = stats.get(field)
+            if state is None or state.count < self.min_samples or values.get(field) is None:
+                continue
+            spread = max(state.std, abs(state.mean) * self.min_relative_spread, 1.0)
+            anomaly = Anomaly(field, float(values[field]), state.mean, spread)
+            if anomaly.score > self.z_threshold:
+                anomalies.append(anomaly)
+        return anomalies
+
+    async def check(self, session: AsyncSession, branch_id: int, weekday: int, values: Mapping) -> List[Anomaly]:
+        """Необычные поля еще не сохраненного отчета (шаг сводки)"""
+        stats = await self._load(session, branch_id, weekday)
+        return self._score({field: Welford(row.count, row.mean, row.m2) for field, row in stats.items()}, values)
+
+    async def record(self, session: AsyncSession, report: Report, previous: Optional[Report] = None) -> List[Anomaly]:
+        """Учесть сохраненный отчет в статистике; вызывается в его транзакции.
+
+        Замененная версия за тот же день вычитается, чтобы статистика
+        отражала только последние версии. Возвращает необычные поля отчета
+        относительно статистики без него.
+        """
+        try:
+            # Статистика вторична: ее ошибка откатывает только свой SAVEPOINT,
+            # а не сохранение отчета
+            async with session.begin_nested():
+                return await self._record(session, report, previous)
+        except Exception as e:
+            logger.error(f"Report field stats update failed for branch {report.branch_id}: {e}")
+            return []
+
+    async def _record(self, session: AsyncSession, report: Report, previous: Optional[Report]) -> List[Anomaly]:
+        weekday = report.report_date.weekday()
+        rows = await self._load(session, report.branch_id, weekday, lock=True)
+        missing = [field for field in FIELD_LABELS if field not in rows]
+        if missing:
+            await self._create_missing(session, report.branch_id, weekday, missing)
+            rows = await self._load(session, report.branch_id, weekday, lock=True)
+        # Только что созданные строки - пустая статистика
+        stats = {field: Welford(row.count, row.mean, row.m2) for field, row in rows.items() if row.count}
+        same_slot = (
+            previous is not None
+            and previous.branch_id == report.branch_id
+            and previous.report_date.weekday() == weekday
+        )
+        if same_slot:
+            for field in FIELD_LABELS:
+                if field in stats:
+                    stats[field] = stats[field].remove(float(getattr(previous, field)))
+
+        anomalies = self._score(stats, {field: getattr(report, field) for field in FIELD_LABELS})
+        for anomaly in anomalies:
+            REPORT_ANOMALIES.inc(field=anomaly.field)
+
+        for field in FIELD_LABELS:
+            state = stats.get(field, Welford()).add(float(getattr(report, field)))
+            rows[field].count, rows[field].mean, rows[field].m2 = state
+        return anomalies
+
+    async def rebuild(self) -> int:
+        """Пересчитать статистику по всей истории (последние версии отчетов)"""
+        latest = latest_reports(date(2000, 1, 1), datetime.utcnow().date())
+        stats: Dict[Tuple[int, int, str], Welford] = {}
+        async with async_session_maker() as session:
+            result = await session.stream(select(latest))
+            async for row in result:
+                weekday = row.report_date.weekday()
+                for field in FIELD_LABELS:
+                    key = (row.branch_id, weekday, field)
+                    stats[key] = stats.get(key, Welford()).add(float(getattr(row, field)))
+
+        async def store(session: AsyncSession):
+            await session.execute(delete(ReportFieldStats))
+            session.add_all(
+                ReportFieldStats(branch_id=branch_id, weekday=weekday, field=field,
+                                 count=state.count, mean=state.mean, m2=state.m2)
+                for (branch_id, weekday, field), state in stats.items()
+            )
+            return len(stats)
+
+        stored = await write_queue.submit(store)
+        logger.info(f"Report field stats rebuilt: {stored} rows")
+        return stored
+
+
+def format_anomalies(anomalies: List[Anomaly]) -> str:
+    return "".join(
+        f"• {FIELD_LABELS[anomaly.field]}: {anomaly.value:g} (обычно около {anomaly.mean:.0f})\n"
+        for anomaly in anomalies
+    )
+
+
+anomaly_detector = AnomalyDetector(
+    z_threshold=config.ANOMALY_Z_THRESHOLD,
+    min_samples=config.ANOMALY_MIN_SAMPLES
+)
+
+
+async def _cli(args):
+    if args.command == "rebuild":
+        await anomaly_detector.rebuild()
+    await write_queue.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Статистика полей отчетов для поиска опечаток")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="пересчитать статистику по всей истории отчетов")
+    asyncio.run(_cli(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
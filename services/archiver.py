@@ -0,0 +1,231 @@
+import argparse
+import asyncio
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import config
+from database.models import Report, ReportArchive
+from database.session import async_session_maker
+from database.invalidation import invalidation_bus
+from database.write_queue import write_queue
+from utils.logger import logger
+from utils.metrics import registry
+
+ARCHIVED_ROWS = registry.counter(
+    "report_archived_rows_total",
+    "Строки report, перенесенные в архив"
+)
+
+REPORT_COLUMNS = [column.name for column in Report.__table__.c]
+
+
+def _move(source, target, rows):
+    """INSERT ... SELECT из source в target и DELETE из source по строкам (id, report_date).
+
+    Границы по report_date дают Postgres отсечь лишние месячные партиции report.
+    """
+    ids = [row.id for row in rows]
+    criteria = (
+        source.c.id.in_(ids),
+        source.c.report_date >= min(row.report_date for row in rows),
+        source.c.report_date <= max(row.report_date for row in rows)
+    )
+    columns = [source.c[name] for name in REPORT_COLUMNS]
+    return (
+        insert(target).from_select(REPORT_COLUMNS, select(*columns).where(*criteria)),
+        delete(source).where(*criteria)
+    )
+
+
+class ReportArchiver:
+    """Перенос замененных версий и старой истории из report в report_archive.
+
+    Замененная версия - любая, кроме последней, у сотрудника за день.
+    Текущий день не трогаем: сотрудник еще может править отчет.
+    """
+
+    def __init__(self, max_age_days: int, batch_size: int = 5000):
+        self.max_age_days = max_age_days
+        self.batch_size = batch_size
+
+    def _candidates(self, start: datetime, end: datetime, today: date):
+        """Строки к переносу среди отчетов за дни [start, end).
+
+        Версии нумеруются внутри дня сотрудника, поэтому окно по целым дням
+        дает тот же результат, что и по всей истории.
+        """
+        ranked = select(
+            Report.id,
+            Report.report_date,
+            func.row_number().over(
+                partition_by=(Report.employee_id, func.date(Report.report_date)),
+                order_by=(Report.version.desc(), Report.id.desc())
+            ).label("rank")
+        ).where(Report.report_date >= start, Report.report_date < end).subquery()
+        cutoff = datetime.combine(today - timedelta(days=self.max_age_days), time.min)
+        return (
+            select(ranked.c.id, ranked.c.report_date)
+            .where(or_(ranked.c.rank > 1, ranked.c.report_date < cutoff))
+        )
+
+    async def _window_end(self, session: AsyncSession, start: datetime, limit: datetime) -> datetime:
+        """Конец окна: полночь после дня, на который приходится batch_size-я строка от start"""
+        edge = await session.scalar(
+            select(Report.report_date)
+            .where(Report.report_date >= start, Report.report_date < limit)
+            .order_by(Report.report_date)
+            .offset(self.batch_size)
+            .limit(1)
+        )
+        if edge is None:
+            return limit
+        return min(datetime.combine(edge.date() + timedelta(days=1), time.min), limit)
+
+    async def _archive_batch(self, session: AsyncSession, start: datetime, today: date) -> Tuple[int, datetime]:
+        end = await self._window_end(session, start, datetime.combine(today, time.min))
+        rows = (await session.execute(self._candidates(start, end, today))).all()
+        if rows:
+            copy, remove = _move(Report.__table__, ReportArchive.__table__, rows)
+            await session.execute(copy)
+            await session.execute(remove)
+            for day in {row.report_date.date() for row in rows}:
+                await invalidation_bus.publish(session, "report_day", day)
+        return len(rows), end
+
+    async def run(self) -> int:
+        """Пройти историю до сегодняшнего дня окнами по целым дням.
+
+        Окно держит около batch_size строк, а следующее начинается там, где
+        закончилось предыдущее, поэтому первый прогон по большой таблице
+        линеен по ее размеру, а не пересчитывает всю историю на каждой пачке.
+        """
+        today = datetime.utcnow().date()
+        limit = datetime.combine(today, time.min)
+        async with async_session_maker() as session:
+            first = await session.scalar(
+                select(func.min(Report.report_date)).where(Report.report_date < limit)
+            )
+        total = 0
+        start = datetime.combine(first.date(), time.min) if first else limit
+        while start < limit:
+            # Пачки идут через очередь записи, как и остальные изменения
+            moved, start = await write_queue.submit(
+                lambda session, start=start: self._archive_batch(session, start, today)
+            )
+            total += moved
+            ARCHIVED_ROWS.inc(moved)
+        if total:
+            logger.info(f"Archived {total} report rows")
+        return total
+
+    async def restore(self, first_day: date, last_day: date) -> int:
+        """Вернуть строки архива за дни [first_day, last_day] обратно в report"""
+        start = datetime.combine(first_day, time.min)
+        end = datetime.combine(last_day, time.min) + timedelta(days=1)
+        archive = ReportArchive.__table__
+        total = 0
+        while True:
+            async def work(session: AsyncSession) -> int:
+                rows = (await session.execute(
+                    select(archive.c.id, archive.c.report_date)
+                    .where(archive.c.report_date >= start, archive.c.report_date < end)
+                    .limit(self.batch_size)
+                )).all()
+                if rows:
+                    copy, remove = _move(archive, Report.__table__, rows)
+                    await session.execute(copy)
+                    await session.execute(remove)
+                    await invalidation_bus.publish(session, "report_day")
+                return len(rows)
+            moved = await write_queue.submit(work)
+            total += moved
+            if moved < self.batch_size:
+                break
+        return total
+
+    async def verify(self, first_day: Optional[date] = None, last_day: Optional[date] = None) -> Dict:
+        """Проверка архива: нет дублей id и у каждого дня с архивом осталась последняя версия"""
+        archive = ReportArchive.__table__
+        hot = Report.__table__
+        criteria = []
+        if first_day is not None:
+            criteria.append(archive.c.report_date >= datetime.combine(first_day, time.min))
+        if last_day is not None:
+            criteria.append(
+                archive.c.report_date < datetime.combine(last_day, time.min) + timedelta(days=1)
+            )
+        cutoff = datetime.combine(
+            datetime.utcnow().date() - timedelta(days=self.max_age_days), time.min
+        )
+        async with async_session_maker() as session:
+            archived = await session.scalar(
+                select(func.count()).select_from(archive).where(*criteria)
+            )
+            duplicates = await session.scalar(
+                select(func.count())
+                .select_from(archive.join(hot, archive.c.id == hot.c.id))
+                .where(*criteria)
+            )
+            # Последняя версия дня должна остаться в report, если день моложе порога:
+            # ищем дни из архива без единой строки в report
+            archived_days = select(
+                archive.c.employee_id,
+                func.date(archive.c.report_date).label("day")
+            ).where(archive.c.report_date >= cutoff, *criteria).distinct().subquery()
+            hot_days = select(
+                hot.c.employee_id,
+                func.date(hot.c.report_date).label("day")
+            ).where(hot.c.report_date >= cutoff).distinct().subquery()
+            orphaned = await session.scalar(
+                select(func.count())
+                .select_from(archived_days.outerjoin(
+                    hot_days,
+                    (hot_days.c.employee_id == archived_days.c.employee_id)
+                    & (hot_days.c.day == archived_days.c.day)
+                ))
+                .where(hot_days.c.employee_id.is_(None))
+            )
+        return {
+            'archived': archived,
+            'duplicates': duplicates,
+            'orphaned_days': orphaned,
+            'ok': not duplicates and not orphaned
+        }
+
+
+report_archiver = ReportArchiver(config.REPORT_ARCHIVE_DAYS, config.REPORT_ARCHIVE_BATCH)
+
+
+def _parse_day(value: str) -> date:
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+async def _cli(args):
+    if args.command == "run":
+        logger.info(f"archived: {await report_archiver.run()}")
+    elif args.command == "restore":
+        logger.info(f"restored: {await report_archiver.restore(args.first_day, args.last_day)}")
+    else:
+        result = await report_archiver.verify(args.first_day, args.last_day)
+        logger.info(f"verify: {result}")
+        if not result['ok']:
+            raise SystemExit(1)
+    await write_queue.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Архив версий отчетов")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="перенести подходящие строки в архив")
+    restore = sub.add_parser("restore", help="вернуть строки архива в report")
+    restore.add_argument("first_day", type=_parse_day, help="ГГГГ-ММ-ДД")
+    restore.add_argument("last_day", type=_parse_day, help="ГГГГ-ММ-ДД")
+    verify = sub.add_parser("verify", help="проверить целостность архива")
+    verify.add_argument("--from", dest="first_day", type=_parse_day)
+    verify.add_argument("--to", dest="last_day", type=_parse_day)
+    asyncio.run(_cli(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
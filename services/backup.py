@@ -0,0 +1,348 @@
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy.engine import make_url
+from config import config
+from database.sqlite import is_sqlite
+from utils.logger import logger
+from utils.metrics import registry
+
+BACKUP_SECONDS = registry.histogram(
+    "sqlite_backup_seconds",
+    "Длительность резервного копирования SQLite (копия, сжатие, проверка)"
+)
+BACKUP_RESTARTS = registry.counter(
+    "sqlite_backup_restarts_total",
+    "Перезапуски онлайн-копии из-за записи в БД во время копирования"
+)
+BACKUP_BYTES = registry.gauge(
+    "sqlite_backup_bytes",
+    "Размер последней сжатой копии БД"
+)
+BACKUP_LAST_SUCCESS = registry.gauge(
+    "sqlite_backup_last_success_timestamp",
+    "Время последней проверенной копии БД (unix)"
+)
+
+SNAPSHOT_PREFIX = "finance-"
+SNAPSHOT_SUFFIX = ".db.gz"
+COPY_CHUNK = 1024 * 1024
+
+
+class BackupRestarted(Exception):
+    pass
+
+
+class BackupResult(NamedTuple):
+    path: str
+    size: int
+    db_size: int
+    seconds: float
+    restarts: int
+    tables: Dict[str, int]
+    # Число строк посчитано по исходной БД в том же снимке, что и копия
+    # (режим WAL); иначе - по самой копии
+    source_counts: bool
+
+
+class VerifyResult(NamedTuple):
+    path: str
+    problems: List[str]
+    tables: Dict[str, int]
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+
+def sqlite_path(db_url: str) -> Optional[str]:
+    """Путь к файлу БД; None - не SQLite или БД в памяти"""
+    if not is_sqlite(db_url):
+        return None
+    database = make_url(db_url).database
+    if not database or database == ":memory:" or database.startswith("file::memory:"):
+        return None
+    return database
+
+
+def table_counts(connection: sqlite3.Connection) -> Dict[str, int]:
+    names = [
+        row[0] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )
+    ]
+    return {
+        name: connection.execute(f'SELECT count(*) FROM "{name.replace(chr(34), chr(34) * 2)}"').fetchone()[0]
+        for name in names
+    }
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(COPY_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _remove(*paths: str):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _remove_db(path: str):
+    """Файл БД вместе с журналами, которые SQLite создает рядом"""
+    _remove(path, f"{path}-wal", f"{path}-shm", f"{path}-journal")
+
+
+class SqliteBackup:
+    """Онлайн-копия SQLite без остановки бота.
+
+    Копирует встроенный backup API SQLite в отдельном потоке небольшими
+    порциями страниц с паузой между ними. В режиме WAL (рабочий режим
+    бота) копия идет внутри одной читающей транзакции: писателей она не
+    блокирует, копия не перезапускается от их записей, а число строк в
+    таблицах считается по исходной БД в том же снимке. В других режимах
+    журнала читающая транзакция держала бы писателей все время копии,
+    поэтому блокировка отпускается между порциями; если БД изменилась,
+    SQLite начинает копию заново, а после max_restarts перезапусков
+    оставшееся копируется за один шаг. Число строк тогда берется из самой
+    копии, и проверка подтверждает только целость архива.
+
+    Копия сжимается gzip рядом с манифестом (sha256 и число строк в
+    таблицах), затем проверяется восстановлением во временный файл:
+    integrity_check и сравнение числа строк с манифестом. Ротация - только
+    после успешной проверки, чтобы плохая копия не вытеснила хорошие.
+    """
+
+    def __init__(self, db_path: Optional[str], directory: str, keep: int,
+                 pages_per_step: int, step_pause: float, max_restarts: int):
+        self.db_path = db_path
+        self.directory = directory
+        self.keep = keep
+        self.pages_per_step = pages_per_step
+        self.step_pause = step_pause
+        self.max_restarts = max_restarts
+        self._lock = asyncio.Lock()
+
+    @property
+    def supported(self) -> bool:
+        return self.db_path is not None
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def _copy(self, target_path: str) -> Tuple[int, Optional[Dict[str, int]]]:
+        """Копия БД в target_path: число перезапусков и строки таблиц исходной БД
+        в снимке копии (None, если БД не в режиме WAL)"""
+        # Только чтение: неверный путь не создаст пустую БД
+        source = sqlite3.connect(
+            f"file:{os.path.abspath(self.db_path)}?mode=ro", uri=True,
+            timeout=config.SQLITE_BUSY_TIMEOUT_MS / 1000, isolation_level=None
+        )
+        restarts = 0
+        source_tables = None
+        try:
+            if source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+                # Снимок закрепляется первым чтением и держится до конца копии
+                source.execute("BEGIN")
+                source_tables = table_counts(source)
+            while True:
+                target = sqlite3.connect(target_path)
+                remaining_before = None
+
+                def progress(status, remaining, total):
+                    nonlocal remaining_before, restarts
+                    # Остаток вырос - SQLite начал копию заново после записи в БД
+                    if remaining_before is not None and remaining > remaining_before:
+                        restarts += 1
+                        BACKUP_RESTARTS.inc()
+                        if restarts >= self.max_restarts:
+                            raise BackupRestarted()
+                    remaining_before = remaining
+
+                try:
+                    if restarts >= self.max_restarts:
+                        source.backup(target)
+                    else:
+                        source.backup(target, pages=self.pages_per_step, progress=progress, sleep=self.step_pause)
+                    return restarts, source_tables
+                except BackupRestarted:
+                    logger.warning(f"SQLite backup restarted {restarts} times, copying the rest in one step")
+                finally:
+                    target.close()
+        finally:
+            if source.in_transaction:
+                source.execute("ROLLBACK")
+            source.close()
+
+    def _snapshot(self) -> BackupResult:
+        start = time.perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{SNAPSHOT_PREFIX}{datetime.now().strftime('%Y%m%d-%H%M%S')}{SNAPSHOT_SUFFIX}"
+        path = os.path.join(self.directory, name)
+        raw = os.path.join(self.directory, f".{name}.db.tmp")
+        packed = f"{path}.tmp"
+        try:
+            restarts, source_tables = self._copy(raw)
+            with closing(sqlite3.connect(raw)) as connection:
+                # Копия наследует режим WAL; восстановленной копии он не нужен,
+                # а при открытии рядом появлялись бы файлы -wal и -shm
+                connection.execute("PRAGMA journal_mode=DELETE")
+                tables = table_counts(connection)
+            if source_tables is not None and tables != source_tables:
+                raise RuntimeError(f"SQLite backup copy differs from the source: {tables} != {source_tables}")
+            db_size = os.path.getsize(raw)
+            with open(raw, "rb") as source, gzip.open(packed, "wb", compresslevel=6) as target:
+                shutil.copyfileobj(source, target, COPY_CHUNK)
+            manifest = {
+                'created_at': datetime.now().isoformat(timespec="seconds"),
+                'db_size': db_size,
+                'sha256': _sha256(packed),
+                'tables': tables,
+                'source_counts': source_tables is not None
+            }
+            with open(f"{path}.json.tmp", "w", encoding="utf-8") as file:
+                json.dump(manifest, file, ensure_ascii=False, indent=1)
+            # Сначала манифест: копия в списке всегда с ним
+            os.replace(f"{path}.json.tmp", f"{path}.json")
+            os.replace(packed, path)
+        finally:
+            _remove_db(raw)
+            _remove(packed, f"{path}.json.tmp")
+        return BackupResult(
+            path, os.path.getsize(path), db_size, time.perf_counter() - start,
+            restarts, tables, source_tables is not None
+        )
+
+    def verify(self, path: str) -> VerifyResult:
+        """Восстановить копию во временный файл и проверить ее"""
+        problems: List[str] = []
+        try:
+            with open(f"{path}.json", encoding="utf-8") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError) as e:
+            manifest = None
+            problems.append(f"manifest unreadable: {e}")
+
+        tables: Dict[str, int] = {}
+        handle, restored = tempfile.mkstemp(suffix=".db", dir=os.path.dirname(os.path.abspath(path)))
+        os.close(handle)
+        try:
+            if manifest and _sha256(path) != manifest['sha256']:
+                problems.append("checksum mismatch")
+            with gzip.open(path, "rb") as source, open(restored, "wb") as target:
+                shutil.copyfileobj(source, target, COPY_CHUNK)
+            with closing(sqlite3.connect(f"file:{restored}?mode=ro", uri=True)) as connection:
+                integrity = [row[0] for row in connection.execute("PRAGMA integrity_check")]
+                if integrity != ["ok"]:
+                    problems.append("integrity_check: " + "; ".join(integrity[:5]))
+                tables = table_counts(connection)
+        except (OSError, EOFError, sqlite3.Error) as e:
+            problems.append(f"restore failed: {e}")
+        finally:
+            _remove_db(restored)
+
+        if manifest and tables:
+            for table, expected in manifest['tables'].items():
+                if tables.get(table) != expected:
+                    problems.append(f"{table}: {tables.get(table)} rows, expected {expected}")
+        return VerifyResult(path, problems, tables)
+
+    def snapshots(self) -> List[str]:
+        """Копии от старых к новым (имя содержит время создания)"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [
+            os.path.join(self.directory, name) for name in sorted(names)
+            if name.startswith(SNAPSHOT_PREFIX) and name.endswith(SNAPSHOT_SUFFIX)
+        ]
+
+    def rotate(self) -> int:
+        stale = self.snapshots()[:-self.keep] if self.keep > 0 else []
+        for path in stale:
+            _remove(path, f"{path}.json")
+        return len(stale)
+
+    def _backup(self) -> Tuple[BackupResult, VerifyResult]:
+        result = self._snapshot()
+        check = self.verify(result.path)
+        if not check.ok:
+            # Непроверенная копия не должна вытеснить проверенные при ротации
+            _remove(result.path, f"{result.path}.json")
+            return result, check
+        self.rotate()
+        return result, check
+
+    async def run(self) -> Optional[Tuple[BackupResult, VerifyResult]]:
+        """Копия, проверка и ротация; None - БД не в файле SQLite"""
+        if not self.supported:
+            logger.info("SQLite backup skipped: DB_URL is not a SQLite file")
+            return None
+        async with self._lock:
+            start = time.perf_counter()
+            result, check = await asyncio.to_thread(self._backup)
+            BACKUP_SECONDS.observe(time.perf_counter() - start)
+        if not check.ok:
+            raise RuntimeError(f"SQLite backup failed verification: {'; '.join(check.problems)}")
+        BACKUP_BYTES.set(result.size)
+        BACKUP_LAST_SUCCESS.set(time.time())
+        logger.info(
+            f"SQLite backup {result.path}: {result.db_size} -> {result.size} bytes "
+            f"in {result.seconds:.1f}s, {result.restarts} restarts, {sum(result.tables.values())} rows "
+            f"verified against the {'source' if result.source_counts else 'copy (round trip only)'}"
+        )
+        return result, check
+
+
+sqlite_backup = SqliteBackup(
+    db_path=sqlite_path(config.DB_URL),
+    directory=config.BACKUP_DIR,
+    keep=config.BACKUP_KEEP,
+    pages_per_step=config.BACKUP_PAGES_PER_STEP,
+    step_pause=config.BACKUP_STEP_PAUSE_MS / 1000,
+    max_restarts=config.BACKUP_MAX_RESTARTS
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Резервные копии SQLite")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="сделать копию, проверить ее и удалить старые")
+    verify = sub.add_parser("verify", help="проверить копию восстановлением во временный файл")
+    verify.add_argument("path", nargs="?", help="файл копии (по умолчанию - последняя)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        asyncio.run(sqlite_backup.run())
+        return
+    snapshots = sqlite_backup.snapshots()
+    path = args.path or (snapshots[-1] if snapshots else None)
+    if path is None:
+        logger.error(f"No backups in {sqlite_backup.directory}")
+        raise SystemExit(1)
+    check = sqlite_backup.verify(path)
+    logger.info(f"verify {path}: {check.tables}")
+    if not check.ok:
+        logger.error(f"verify {path} failed: {'; '.join(check.problems)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
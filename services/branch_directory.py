@@ -0,0 +1,104 @@
+from datetime import datetime, tzinfo
+from typing import Dict, List, NamedTuple, Optional, Set
+import pytz
+from sqlalchemy import select
+from config import config
+from database.invalidation import invalidation_bus
+from database.models import Branch
+from database.replicas import read_session
+
+
+class BranchInfo(NamedTuple):
+    id: int
+    name: str
+    timezone: str
+    created_at: datetime
+
+
+class BranchDirectory:
+    """Справочник филиалов процесса: id -> название и часовой пояс.
+
+    Загружается одним запросом, изменения приходят событиями "branch" из
+    шины инвалидации и перечитываются по id перед следующим обращением.
+    Вместо ORM-объектов в FSM и в строках для Sheets хранятся только id.
+    """
+
+    def __init__(self, default_timezone: str):
+        self.default_timezone = default_timezone
+        self._branches: Dict[int, BranchInfo] = {}
+        self._stale = True
+        self._dirty: Set[int] = set()
+
+    def _info(self, row) -> BranchInfo:
+        return BranchInfo(row.id, row.name, row.timezone or self.default_timezone, row.created_at)
+
+    async def load(self):
+        self._stale = False
+        self._dirty.clear()
+        async with read_session() as session:
+            rows = (await session.execute(
+                select(Branch.id, Branch.name, Branch.timezone, Branch.created_at)
+            )).all()
+        self._branches = {row.id: self._info(row) for row in rows}
+
+    async def _apply_dirty(self):
+        branch_ids, self._dirty = self._dirty, set()
+        async with read_session() as session:
+            rows = (await session.execute(
+                select(Branch.id, Branch.name, Branch.timezone, Branch.created_at)
+                .where(Branch.id.in_(branch_ids))
+            )).all()
+        for branch_id in branch_ids:
+            self._branches.pop(branch_id, None)
+        for row in rows:
+            self._branches[row.id] = self._info(row)
+
+    async def ensure_fresh(self):
+        if self._stale:
+            await self.load()
+        elif self._dirty:
+            await self._apply_dirty()
+
+    def mark_stale(self):
+        self._stale = True
+
+    def branch_changed(self, branch_id: int):
+        self._dirty.add(branch_id)
+
+    def get(self, branch_id: int) -> Optional[BranchInfo]:
+        return self._branches.get(branch_id)
+
+    def name(self, branch_id: int) -> str:
+        branch = self._branches.get(branch_id)
+        return branch.name if branch is not None else f"Филиал #{branch_id}"
+
+    def timezone_name(self, branch_id: int) -> str:
+        branch = self._branches.get(branch_id)
+        return branch.timezone if branch is not None else self.default_timezone
+
+    def timezone(self, branch_id: int) -> tzinfo:
+        return pytz.timezone(self.timezone_name(branch_id))
+
+    def timezones(self) -> Set[str]:
+        """Часовые пояса филиалов; общий есть всегда"""
+        return {self.default_timezone} | {branch.timezone for branch in self._branches.values()}
+
+    def all(self) -> List[BranchInfo]:
+        """Филиалы по названию - порядок как у BranchDAO.get_all"""
+        return sorted(self._branches.values(), key=lambda branch: branch.name)
+
+    def __len__(self) -> int:
+        return len(self._branches)
+
+
+branch_directory = BranchDirectory(config.TIMEZONE)
+
+
+def _on_branch(key: Optional[str]):
+    if key is None:
+        branch_directory.mark_stale()
+    else:
+        branch_directory.branch_changed(int(key))
+
+
+invalidation_bus.subscribe("branch", _on_branch)
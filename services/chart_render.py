@@ -0,0 +1,50 @@
+"""Отрисовка графиков в процессе пула (ProcessPoolExecutor).
+
+Модуль импортируется в рабочих процессах, поэтому не зависит от config,
+БД и логгера бота: на входе только простые данные, на выходе - байты PNG.
+"""
+import io
+from datetime import date
+from typing import Sequence, Tuple
+
+# Меняется при изменении вида графиков - старые картинки в кеше не подойдут
+RENDER_VERSION = 1
+
+# (подпись линии, ((дата ISO, значение), ...))
+Series = Tuple[str, Tuple[Tuple[str, float], ...]]
+
+
+def warm_up():
+    """Инициализатор процесса: импорт matplotlib и шрифтов заранее"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+
+
+def render_line_chart(title: str, y_label: str, series: Sequence[Series]) -> bytes:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+    from matplotlib.ticker import FuncFormatter
+
+    fig, ax = plt.subplots(figsize=(9, 4.5), dpi=100)
+    try:
+        for label, points in series:
+            days = [date.fromisoformat(day) for day, _ in points]
+            values = [value for _, value in points]
+            ax.plot(days, values, marker="o", markersize=3, linewidth=1.8, label=label)
+        ax.set_title(title)
+        ax.set_ylabel(y_label)
+        ax.grid(True, alpha=0.3)
+        ax.yaxis.set_major_formatter(FuncFormatter(lambda value, _: f"{value:,.0f}".replace(",", " ")))
+        ax.xaxis.set_major_formatter(mdates.DateFormatter("%d.%m"))
+        fig.autofmt_xdate()
+        if len(series) > 1:
+            ax.legend(loc="upper left", fontsize="small")
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png")
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, timedelta
+from typing import Dict, NamedTuple, Optional, Sequence
+from sqlalchemy import func, select
+from config import config
+from database.dao import latest_reports
+from database.replicas import read_session
+from services.chart_render import RENDER_VERSION, Series, render_line_chart, warm_up
+from utils.logger import logger
+from utils.metrics import registry
+
+CHART_RENDER_SECONDS = registry.histogram(
+    "chart_render_seconds",
+    "Отрисовка графика в пуле процессов"
+)
+CHART_CACHE_REQUESTS = registry.counter(
+    "chart_cache_requests_total",
+    "Обращения к кешу картинок графиков",
+    ["result"]
+)
+
+# Дольше этого периода точки графика - недели, а не дни
+DAILY_POINTS_MAX_DAYS = 62
+
+
+def income_rollup_query(first_day: date, last_day: date, branch_id: Optional[int] = None):
+    """Приход по дням (последние версии отчетов), по филиалу или по всей сети"""
+    latest = latest_reports(first_day, last_day)
+    query = (
+        select(
+            latest.c.day,
+            func.sum(latest.c.total_income).label("total_income")
+        )
+        .group_by(latest.c.day)
+        .order_by(latest.c.day)
+    )
+    if branch_id is not None:
+        query = query.where(latest.c.branch_id == branch_id)
+    return query
+
+
+def weekly(points: Sequence) -> tuple:
+    """Средний приход за день по неделям (точка - понедельник недели).
+
+    Среднее, а не сумма: крайние недели периода обычно неполные.
+    """
+    weeks: Dict[date, list] = {}
+    for day, value in points:
+        weeks.setdefault(day - timedelta(days=day.weekday()), []).append(value)
+    return tuple((week, sum(values) / len(values)) for week, values in sorted(weeks.items()))
+
+
+class RenderedChart(NamedTuple):
+    key: str
+    # Картинка уже загружена в Telegram - ее можно отправить по file_id без файла
+    file_id: Optional[str]
+    png: Optional[bytes]
+
+
+class ChartService:
+    """Графики: данные из агрегирующего запроса, отрисовка в пуле процессов.
+
+    PNG кешируется на диске под sha256 от описания графика и его точек:
+    тот же период без новых отчетов не рисуется заново. Одинаковые запросы,
+    пришедшие одновременно, ждут одну отрисовку. Для уже отправленных
+    картинок запоминается file_id Telegram, чтобы не загружать файл повторно.
+    """
+
+    def __init__(self, cache_dir: str, workers: int, cache_days: int, max_file_ids: int = 256):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.cache_days = cache_days
+        self.max_file_ids = max_file_ids
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._file_ids: "OrderedDict[str, str]" = OrderedDict()
+        self._pruned_at = 0.0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: процесс бота многопоточный (логгер, aiosqlite), fork небезопасен.
+            # Рабочий процесс заново выполняет main.py - там только точка входа,
+            # приложение импортируется внутри main()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=warm_up
+            )
+        return self._executor
+
+    def _reset_pool(self, pool: ProcessPoolExecutor):
+        """Закрыть сломанный пул; следующий _pool() создаст новый"""
+        if self._executor is pool:
+            self._executor = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _run_render(self, title: str, y_label: str, series: list) -> bytes:
+        # Упавший рабочий процесс ломает весь пул: без пересоздания /chart
+        # не работал бы до перезапуска бота. Повторяем один раз на новом пуле
+        loop = asyncio.get_running_loop()
+        for attempt in (1, 2):
+            pool = self._pool()
+            try:
+                return await loop.run_in_executor(pool, render_line_chart, title, y_label, series)
+            except BrokenProcessPool:
+                self._reset_pool(pool)
+                if attempt == 2:
+                    raise
+                logger.warning("Chart process pool broken, restarting it")
+
+    @staticmethod
+    def cache_key(title: str, y_label: str, series: Sequence[Series]) -> str:
+        spec = json.dumps([RENDER_VERSION, title, y_label, series], ensure_ascii=False, default=str)
+        return hashlib.sha256(spec.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def _read_cached(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                png = file.read()
+        except FileNotFoundError:
+            return None
+        # Время доступа - для удаления давно не нужных картинок
+        os.utime(path)
+        return png
+
+    def _write_cached(self, key: str, png: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "wb") as file:
+            file.write(png)
+        os.replace(temp, path)
+
+    def prune(self) -> int:
+        """Удалить картинки, не запрашиваемые дольше cache_days"""
+        cutoff = time.time() - self.cache_days * 86400
+        removed = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    async def _render(self, key: str, title: str, y_label: str, series: Sequence[Series]) -> bytes:
+        start = time.perf_counter()
+        png = await self._run_render(title, y_label, list(series))
+        CHART_RENDER_SECONDS.observe(time.perf_counter() - start)
+        await asyncio.to_thread(self._write_cached, key, png)
+        if time.monotonic() - self._pruned_at > 3600:
+            self._pruned_at = time.monotonic()
+            removed = await asyncio.to_thread(self.prune)
+            if removed:
+                logger.info(f"Chart cache: removed {removed} stale images")
+        return png
+
+    async def render(self, title: str, y_label: str, series: Sequence[Series]) -> RenderedChart:
+        key = self.cache_key(title, y_label, series)
+        file_id = self._file_ids.get(key)
+        if file_id is not None:
+            CHART_CACHE_REQUESTS.inc(result="file_id")
+            return RenderedChart(key, file_id, None)
+
+        png = await asyncio.to_thread(self._read_cached, key)
+        if png is not None:
+            CHART_CACHE_REQUESTS.inc(result="hit")
+            return RenderedChart(key, None, png)
+
+        CHART_CACHE_REQUESTS.inc(result="miss")
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._render(key, title, y_label, series))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return RenderedChart(key, None, await asyncio.shield(future))
+
+    def remember_file_id(self, key: str, file_id: str):
+        self._file_ids[key] = file_id
+        self._file_ids.move_to_end(key)
+        if len(self._file_ids) > self.max_file_ids:
+            self._file_ids.popitem(last=False)
+
+    async def income_chart(self, first_day: date, last_day: date, branch_id: Optional[int], label: str) -> Optional[RenderedChart]:
+        """График прихода по дням (по неделям для длинных периодов); None - нет отчетов"""
+        async with read_session() as session:
+            rows = (await session.execute(income_rollup_query(first_day, last_day, branch_id))).all()
+        if not rows:
+            return None
+        points = tuple((row.day, float(row.total_income)) for row in rows)
+        if (last_day - first_day).days > DAILY_POINTS_MAX_DAYS:
+            points, step = weekly(points), "в среднем за день по неделям"
+        else:
+            step = "по дням"
+        series = [(label, tuple((day.isoformat(), value) for day, value in points))]
+        title = f"{label}: приход {step}, {first_day.strftime('%d.%m.%Y')} - {last_day.strftime('%d.%m.%Y')}"
+        return await self.render(title, "Приход", series)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+chart_service = ChartService(
+    cache_dir=config.CHART_CACHE_DIR,
+    workers=config.CHART_WORKERS,
+    cache_days=config.CHART_CACHE_DAYS
+)
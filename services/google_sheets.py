@@ -1,55 +1,105 @@
+import time
 import gspread
+from contextlib import contextmanager
 from google.oauth2.service_account import Credentials
 from datetime import datetime
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
 import pytz
 from config import config
+from utils.logger import logger
+from utils.metrics import registry
+from utils.tracing import record_span
+
+SHEETS_CALL_SECONDS = registry.histogram(
+    "sheets_call_seconds",
+    "Длительность вызовов Google Sheets API",
+    ["operation"]
+)
+SHEETS_CALL_ERRORS = registry.counter(
+    "sheets_call_errors_total",
+    "Ошибки вызовов Google Sheets API",
+    ["operation", "error"]
+)
+
+
+@contextmanager
+def sheets_call(operation: str):
+    """Замер длительности и ошибок обращения к Google Sheets"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        SHEETS_CALL_ERRORS.inc(operation=operation, error=type(e).__name__)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        SHEETS_CALL_SECONDS.observe(duration, operation=operation)
+        record_span("sheets", operation, duration)
+
+REPORTS_WORKSHEET = "Reports"
+
+
+def report_row(report_data: Dict) -> list:
+    """Строка листа Reports для версии отчета"""
+    return [
+        report_data['report_date'].strftime('%Y-%m-%d'),
+        report_data['branch_name'],
+        report_data['employee_name'],
+        float(report_data['total_income']),
+        float(report_data['cash']),
+        float(report_data['cashless']),
+        float(report_data['cash_balance']),
+        int(report_data['clients_count']),
+        float(report_data['cash_to_suppliers']),
+        float(report_data['cashless_to_suppliers']),
+        int(report_data['version']),
+        report_data['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+    ]
 
 class GoogleSheetsService:
+    # Подмена клиента gspread (нагрузочные тесты с фейковым бэкендом)
+    client_factory: Optional[Callable[[], gspread.Client]] = None
+    
     def __init__(self):
         self.scope = [
             "https://www.googleapis.com/auth/spreadsheets",
             "https://www.googleapis.com/auth/drive"
         ]
-        self.credentials = Credentials.from_service_account_file(
-            config.GOOGLE_SHEETS_CREDENTIALS_PATH, 
-            scopes=self.scope
-        )
-        self.client = gspread.authorize(self.credentials)
-        self.sheet = self.client.open_by_key(config.REPORT_SHEET_ID)
+        with sheets_call("authorize"):
+            factory = GoogleSheetsService.client_factory
+            if factory is not None:
+                self.client = factory()
+            else:
+                self.credentials = Credentials.from_service_account_file(
+                    config.GOOGLE_SHEETS_CREDENTIALS_PATH, 
+                    scopes=self.scope
+                )
+                self.client = gspread.authorize(self.credentials)
+        with sheets_call("open_by_key"):
+            self.sheet = self.client.open_by_key(config.REPORT_SHEET_ID)
     
     async def append_report(self, report_data: Dict) -> bool:
         try:
-            worksheet = self.sheet.worksheet("Reports")
-            
-            row = [
-                report_data['report_date'].strftime('%Y-%m-%d'),
-                report_data['branch_name'],
-                report_data['employee_name'],
-                float(report_data['total_income']),
-                float(report_data['cash']),
-                float(report_data['cashless']),
-                float(report_data['cash_balance']),
-                int(report_data['clients_count']),
-                float(report_data['cash_to_suppliers']),
-                float(report_data['cashless_to_suppliers']),
-                int(report_data['version']),
-                report_data['created_at'].strftime('%Y-%m-%d %H:%M:%S')
-            ]
+            with sheets_call("worksheet"):
+                worksheet = self.sheet.worksheet(REPORTS_WORKSHEET)
             
-            worksheet.append_row(row)
+            with sheets_call("append_row"):
+                worksheet.append_row(report_row(report_data))
             return True
         except Exception as e:
-            print(f"Error appending to Google Sheets: {e}")
+            logger.error(f"Error appending to Google Sheets: {e}")
             return False
     
     async def sync_branches(self, branches: List[Dict]):
         try:
-            worksheet = self.sheet.worksheet("Филиалы")
-            worksheet.clear()
+            with sheets_call("worksheet"):
+                worksheet = self.sheet.worksheet("Филиалы")
+            with sheets_call("clear"):
+                worksheet.clear()
             
             headers = ["ID", "Название", "Дата создания"]
-            worksheet.append_row(headers)
+            with sheets_call("append_row"):
+                worksheet.append_row(headers)
             
             for branch in branches:
                 row = [
@@ -57,17 +107,21 @@ class GoogleSheetsService:
                     branch['name'],
                     branch['created_at'].strftime('%Y-%m-%d %H:%M:%S')
                 ]
-                worksheet.append_row(row)
+                with sheets_call("append_row"):
+                    worksheet.append_row(row)
         except Exception as e:
-            print(f"Error syncing branches: {e}")
+            logger.error(f"Error syncing branches: {e}")
     
     async def sync_employees(self, employees: List[Dict]):
         try:
-            worksheet = self.sheet.worksheet("Сотрудники")
-            worksheet.clear()
+            with sheets_call("worksheet"):
+                worksheet = self.sheet.worksheet("Сотрудники")
+            with sheets_call("clear"):
+                worksheet.clear()
             
             headers = ["ID", "Telegram ID", "ФИО", "Филиал", "Активен", "Админ", "Дата создания"]
-            worksheet.append_row(headers)
+            with sheets_call("append_row"):
+                worksheet.append_row(headers)
             
             for employee in employees:
                 row = [
@@ -79,6 +133,7 @@ class GoogleSheetsService:
                     "Да" if employee['is_admin'] else "Нет",
                     employee['created_at'].strftime('%Y-%m-%d %H:%M:%S')
                 ]
-                worksheet.append_row(row)
+                with sheets_call("append_row"):
+                    worksheet.append_row(row)
         except Exception as e:
-            print(f"Error syncing employees: {e}")  
\ No newline at end of file
+            logger.error(f"Error syncing employees: {e}")
\ No newline at end of file
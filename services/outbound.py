@@ -0,0 +1,178 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.types import Message
+from config import config
+from middlewares.throttling import TokenBucket
+from utils.metrics import registry
+
+# Чем меньше, тем раньше уходит запрос
+INTERACTIVE = 0
+BULK = 10
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+OUTBOUND_WAIT_SECONDS = registry.histogram(
+    "outbound_wait_seconds",
+    "Ожидание очереди исходящих сообщений перед отправкой",
+    ["priority"]
+)
+OUTBOUND_RETRY_AFTER = registry.counter(
+    "outbound_retry_after_total",
+    "Ответы Telegram 429 (RetryAfter) на исходящие сообщения"
+)
+
+outbound_priority: ContextVar[int] = ContextVar("outbound_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def bulk_sends():
+    """Отправки внутри блока - массовые: уступают ответам пользователям"""
+    token = outbound_priority.set(BULK)
+    try:
+        yield
+    finally:
+        outbound_priority.reset(token)
+
+
+class OutboundGate:
+    """Очередь исходящих сообщений бота с приоритетами.
+
+    Одновременно выполняется не больше concurrency отправок, общий темп -
+    rate сообщений в секунду; свободный слот получает запрос с наименьшим
+    приоритетом, при равенстве - первый пришедший. Слот выдается только
+    вместе с токеном темпа: ожидание токена или паузы после 429 не держит
+    слот, который могли бы занять другие отправки. Массовые отправки в один
+    чат разносятся на chat_interval. После 429 от Telegram отправки
+    приостанавливаются на retry_after для всего бота.
+    """
+
+    def __init__(self, concurrency: int, rate: float, chat_interval: float, max_chats: int = 10000):
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, max(rate, 1)) if rate > 0 else None
+        self.chat_interval = chat_interval
+        self.max_chats = max_chats
+        self.paused_until = 0.0
+        self._active = 0
+        self._seq = itertools.count()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._chat_next: "OrderedDict[int, float]" = OrderedDict()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def waiting(self) -> Dict[str, int]:
+        counts = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, future in self._waiters:
+            if not future.done():
+                counts[PRIORITY_NAMES.get(priority, str(priority))] += 1
+        return counts
+
+    async def _pace_chat(self, chat_id: int):
+        now = time.monotonic()
+        next_at = max(now, self._chat_next.get(chat_id, 0.0))
+        self._chat_next[chat_id] = next_at + self.chat_interval
+        self._chat_next.move_to_end(chat_id)
+        if len(self._chat_next) > self.max_chats:
+            self._chat_next.popitem(last=False)
+        if next_at > now:
+            await asyncio.sleep(next_at - now)
+
+    async def acquire(self, priority: int, chat_id: Optional[int] = None):
+        start = time.monotonic()
+        if priority >= BULK and chat_id is not None and self.chat_interval > 0:
+            await self._pace_chat(chat_id)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Слот мог быть отдан в момент отмены - возвращаем его
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        OUTBOUND_WAIT_SECONDS.observe(
+            time.monotonic() - start, priority=PRIORITY_NAMES.get(priority, str(priority))
+        )
+
+    def _wake_later(self, delay: float):
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._wake()
+
+    def _wake(self):
+        while self._active < self.concurrency and self._waiters:
+            _, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            now = time.monotonic()
+            if now < self.paused_until:
+                self._wake_later(self.paused_until - now)
+                return
+            if self.bucket is not None and not self.bucket.take(now):
+                self._wake_later(1 / self.bucket.rate)
+                return
+            heapq.heappop(self._waiters)
+            self._active += 1
+            future.set_result(None)
+
+    def release(self):
+        self._active -= 1
+        self._wake()
+
+    def pause(self, seconds: float):
+        OUTBOUND_RETRY_AFTER.inc()
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class TunedAiohttpSession(AiohttpSession):
+    """Сессия Bot API с постоянными соединениями и кешем DNS"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("limit", config.BOT_API_CONNECTIONS)
+        super().__init__(**kwargs)
+        # Параметры TCPConnector: держим соединения к api.telegram.org открытыми,
+        # чтобы не платить за TLS-рукопожатие на каждый ответ
+        self._connector_init.update(
+            keepalive_timeout=config.BOT_API_KEEPALIVE_SECONDS,
+            ttl_dns_cache=300
+        )
+
+
+async def edit_and_answer(message: Message, edit_text: str, answer_text: str, **answer_kwargs):
+    """Правка старого сообщения и новое сообщение (меню) одним конвейером.
+
+    Объединить их в один вызов Bot API нельзя - у правленого сообщения не
+    бывает обычной клавиатуры. Оба запроса уходят параллельно, и ответ
+    приходит за один сетевой круг вместо двух. Методы aiogram - не корутины,
+    поэтому в gather идут корутины bot(method); они запускаются в порядке
+    вызовов, и правка встает в очередь исходящих раньше меню. Ошибка любого
+    запроса пробрасывается.
+    """
+    await asyncio.gather(
+        message.bot(message.edit_text(edit_text)),
+        message.bot(message.answer(answer_text, **answer_kwargs))
+    )
+
+
+outbound_gate = OutboundGate(
+    concurrency=config.OUTBOUND_CONCURRENCY,
+    rate=config.OUTBOUND_RATE,
+    chat_interval=config.OUTBOUND_CHAT_INTERVAL
+)
+
+registry.gauge(
+    "outbound_waiting",
+    "Исходящие сообщения в очереди по приоритету",
+    ["priority"],
+    callback=lambda: {(name,): count for name, count in outbound_gate.waiting().items()}
+)
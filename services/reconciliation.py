@@ -0,0 +1,197 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import List, Optional, Set
+from sqlalchemy import Date, and_, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import config
+from database.dao import latest_reports
+from database.invalidation import invalidation_bus
+from database.models import CashReconciliation
+from database.session import async_session_maker
+from database.write_queue import write_queue
+from utils.logger import logger
+from utils.metrics import registry
+
+RECONCILED_DAYS = registry.counter(
+    "cash_reconciled_rows_total",
+    "Пересчитанные строки сверки остатка (филиал-день)"
+)
+RECONCILE_DISCREPANCIES = registry.gauge(
+    "cash_reconcile_discrepancies",
+    "Неразрешенные расхождения остатка кассы за горизонт сверки (без сегодня)"
+)
+
+
+def reconciliation_query(first_day: date, last_day: date):
+    """Остаток по филиалам и дням с ожидаемым значением из предыдущего дня.
+
+    Наличные и оплаты поставщикам - движение денег, они суммируются по
+    последним версиям отчетов филиала. Остаток - снимок кассы, поэтому
+    берется из последнего за день отчета филиала, а не суммируется по
+    сотрудникам. Затем LAG по дню внутри филиала дает остаток предыдущего дня.
+    """
+    latest = latest_reports(first_day, last_day)
+    branch_day = dict(partition_by=(latest.c.branch_id, latest.c.day))
+    closing = select(
+        latest.c.branch_id,
+        latest.c.day,
+        latest.c.cash,
+        latest.c.cash_to_suppliers,
+        func.first_value(latest.c.cash_balance).over(
+            **branch_day,
+            order_by=(latest.c.report_date.desc(), latest.c.id.desc())
+        ).label("closing_balance")
+    ).subquery()
+    daily = (
+        select(
+            closing.c.branch_id,
+            closing.c.day,
+            func.sum(closing.c.cash).label("cash"),
+            func.sum(closing.c.cash_to_suppliers).label("cash_to_suppliers"),
+            func.max(closing.c.closing_balance).label("actual_balance")
+        )
+        .group_by(closing.c.branch_id, closing.c.day)
+        .subquery()
+    )
+    previous = dict(partition_by=daily.c.branch_id, order_by=daily.c.day)
+    chained = select(
+        daily,
+        func.lag(daily.c.day, type_=Date).over(**previous).label("prev_day"),
+        func.lag(daily.c.actual_balance).over(**previous).label("prev_balance")
+    ).subquery()
+    expected = chained.c.prev_balance + chained.c.cash - chained.c.cash_to_suppliers
+    return select(
+        chained.c.branch_id,
+        chained.c.day,
+        chained.c.cash,
+        chained.c.cash_to_suppliers,
+        chained.c.actual_balance,
+        chained.c.prev_day,
+        expected.label("expected_balance"),
+        (chained.c.actual_balance - expected).label("difference")
+    ).order_by(chained.c.branch_id, chained.c.day)
+
+
+class CashReconciler:
+    """Сверка непрерывности остатка кассы: остаток = вчера + наличные - поставщикам.
+
+    Пересчитываются только дни, затронутые с прошлого запуска (события
+    report_day шины). Первый запуск после старта и сброс шины пересчитывают
+    последние horizon_days. Для LAG окно запроса захватывает еще
+    lookback_days до первого затронутого дня.
+    """
+
+    def __init__(self, horizon_days: int, lookback_days: int, tolerance: float):
+        self.horizon_days = horizon_days
+        self.lookback_days = lookback_days
+        self.tolerance = Decimal(str(tolerance))
+        self._touched: Set[date] = set()
+        self._full = True
+
+    def touch(self, day: Optional[date]):
+        if day is None:
+            self._full = True
+        else:
+            self._touched.add(day)
+
+    def _first_dirty_day(self, today: date) -> Optional[date]:
+        horizon = today - timedelta(days=self.horizon_days)
+        if self._full:
+            return horizon
+        # Старые дни трогает архивация; сверяем только горизонт
+        touched = [day for day in self._touched if day >= horizon]
+        return min(touched) if touched else None
+
+    async def _store(self, session: AsyncSession, first_day: date, last_day: date, rows) -> int:
+        await session.execute(delete(CashReconciliation).where(and_(
+            CashReconciliation.day >= first_day, CashReconciliation.day <= last_day
+        )))
+        values = [
+            {
+                'branch_id': row.branch_id,
+                'day': row.day,
+                'cash': row.cash,
+                'cash_to_suppliers': row.cash_to_suppliers,
+                'actual_balance': row.actual_balance,
+                'prev_day': row.prev_day,
+                'expected_balance': row.expected_balance,
+                'difference': row.difference,
+                'checked_at': datetime.utcnow()
+            }
+            for row in rows
+        ]
+        if values:
+            await session.execute(insert(CashReconciliation), values)
+        return len(values)
+
+    async def run(self) -> int:
+        """Пересчитать затронутые дни; возвращает число строк филиал-день"""
+        today = datetime.utcnow().date()
+        first_day = self._first_dirty_day(today)
+        touched, full = self._touched, self._full
+        self._touched, self._full = set(), False
+        if first_day is None:
+            return 0
+        try:
+            async with async_session_maker() as session:
+                rows = (await session.execute(
+                    reconciliation_query(first_day - timedelta(days=self.lookback_days), today)
+                )).all()
+            rows = [row for row in rows if row.day >= first_day]
+            stored = await write_queue.submit(
+                lambda session: self._store(session, first_day, today, rows)
+            )
+        except Exception:
+            # Не потерять затронутые дни: пересчитаем их в следующий раз
+            self._touched |= touched
+            self._full = self._full or full
+            raise
+        RECONCILED_DAYS.inc(stored)
+        # Все неразрешенные расхождения горизонта, а не только пересчитанного окна
+        RECONCILE_DISCREPANCIES.set(len(await self.discrepancies(today - timedelta(days=self.horizon_days))))
+        logger.info(f"Cash reconciliation: {stored} branch-days from {first_day}")
+        return stored
+
+    async def discrepancies(self, first_day: date, last_day: Optional[date] = None) -> List[CashReconciliation]:
+        """Дни с расхождением больше допуска, по дате и филиалу.
+
+        По умолчанию до вчера: сегодняшние отчеты сданы еще не все, и
+        неполный день дал бы ложные расхождения.
+        """
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(CashReconciliation)
+                .where(
+                    CashReconciliation.day >= first_day,
+                    CashReconciliation.day <= (last_day or datetime.utcnow().date() - timedelta(days=1)),
+                    func.abs(CashReconciliation.difference) > self.tolerance
+                )
+                .order_by(CashReconciliation.day.desc(), CashReconciliation.branch_id)
+            )
+            return result.scalars().all()
+
+
+def format_discrepancies(rows: List[CashReconciliation], branch_name, limit: int = 30) -> str:
+    """Строки расхождений для сообщения: дата, филиал, ожидалось и факт"""
+    text = "".join(
+        f"• {row.day.strftime('%d.%m.%Y')} {branch_name(row.branch_id)}: "
+        f"ожидалось {row.expected_balance:.2f}, факт {row.actual_balance:.2f} "
+        f"({row.difference:+.2f})\n"
+        for row in rows[:limit]
+    )
+    if len(rows) > limit:
+        text += f"... и еще {len(rows) - limit}\n"
+    return text
+
+
+cash_reconciler = CashReconciler(
+    horizon_days=config.RECONCILE_DAYS,
+    lookback_days=config.RECONCILE_LOOKBACK_DAYS,
+    tolerance=config.RECONCILE_TOLERANCE
+)
+
+
+invalidation_bus.subscribe(
+    "report_day",
+    lambda key: cash_reconciler.touch(None if key is None else date.fromisoformat(key))
+)
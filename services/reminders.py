@@ -1,57 +1,129 @@
 import asyncio
-from datetime import datetime, time
+from datetime import datetime, time, timedelta
+from typing import Optional
 import pytz
 from aiogram import Bot
-from database.session import async_session_maker
-from database.dao import ReportDAO, EmployeeDAO
+from database.dao import EmployeeDAO
+from database.replicas import read_session
+from database.leader import claim_job_run, leader
+from services.submission_tracker import submission_tracker
+from services.outbound import bulk_sends
+from services.branch_directory import branch_directory
+from services.reconciliation import cash_reconciler, format_discrepancies
 from config import config
+from utils.logger import logger
 
 class ReminderService:
     def __init__(self, bot: Bot):
         self.bot = bot
         self.timezone = pytz.timezone(config.TIMEZONE)
+        self._done = set()
     
-    async def send_daily_reminders(self):
-        """Отправка напоминаний сотрудникам в 19:00"""
-        async with async_session_maker() as session:
-            employee_dao = EmployeeDAO(session)
-            report_dao = ReportDAO(session)
-            
-            # Получаем активных сотрудников
-            employees = await employee_dao.get_active_employees()
-            
-            for employee in employees:
-                # Проверяем, сдал ли сотрудник отчет сегодня
-                today_report = await report_dao.get_employee_today_report(employee.id)
-                
-                if not today_report:
-                    # Отправляем напоминание
-                    try:
-                        await self.bot.send_message(
-                            chat_id=employee.telegram_id,
-                            text="⏰ Напоминание: не забудьте сдать ежедневный финансовый отчет!"
-                        )
-                    except Exception as e:
-                        print(f"Error sending reminder to {employee.telegram_id}: {e}")
+    async def _send_one(self, telegram_id: int, text: str):
+        try:
+            await self.bot.send_message(chat_id=telegram_id, text=text)
+        except Exception as e:
+            logger.error(f"Error sending reminder to {telegram_id}: {e}")
+    
+    async def _send_to_missing(self, text: str, zone: Optional[str] = None):
+        await submission_tracker.ensure_fresh()
+        # Рассылка - массовая: темп и порядок задает очередь исходящих,
+        # ответы пользователям уходят раньше нее
+        with bulk_sends():
+            await asyncio.gather(*(
+                self._send_one(employee.telegram_id, text)
+                for employee in submission_tracker.missing(zone)
+            ))
+    
+    async def send_daily_reminders(self, zone: Optional[str] = None):
+        """Отправка напоминаний сотрудникам в 19:00 (по времени филиала)"""
+        # Кто не сдал отчет - из битовой маски, без запроса на каждого сотрудника
+        await self._send_to_missing(
+            "⏰ Напоминание: не забудьте сдать ежедневный финансовый отчет!",
+            zone
+        )
+    
+    async def send_nudges(self, zone: Optional[str] = None):
+        """Ежечасное повторное напоминание тем, кто так и не сдал отчет"""
+        await self._send_to_missing(
+            "⏰ Отчет за сегодня все еще не сдан. Пожалуйста, заполните его.",
+            zone
+        )
+    
+    async def _owner_ids(self) -> set:
+        async with read_session() as session:
+            return set(config.ADMIN_IDS) | set(await EmployeeDAO(session).get_admin_telegram_ids())
     
     async def send_owner_notification(self):
         """Отправка уведомления владельцу в 20:00"""
-        # Здесь можно добавить логику отправки сводки владельцу
-        pass
+        await submission_tracker.ensure_fresh()
+        await branch_directory.ensure_fresh()
+        # Правки прошлых дней могли прийти после последнего пересчета
+        await cash_reconciler.run()
+        today = submission_tracker.business_day()
+        # Сверка - по дням хранения (UTC) и только до вчера: сегодня еще не закрыто
+        discrepancies = await cash_reconciler.discrepancies(
+            datetime.utcnow().date() - timedelta(days=config.RECONCILE_DIGEST_DAYS)
+        )
+        
+        text = (
+            f"📊 Сводка за {today.strftime('%d.%m.%Y')}\n"
+            f"Отчеты сдали: {submission_tracker.submitted_count()}/{len(submission_tracker.employees)}\n"
+        )
+        if discrepancies:
+            text += "\n⚠️ Расхождения остатка кассы:\n"
+            text += format_discrepancies(discrepancies, branch_directory.name)
+        else:
+            text += "\n✅ Остаток кассы сходится."
+        
+        with bulk_sends():
+            await asyncio.gather(*(
+                self._send_one(telegram_id, text) for telegram_id in await self._owner_ids()
+            ))
+    
+    async def _run_once(self, job: str, slot: str, send) -> None:
+        """Выполнить рассылку один раз за слот на все экземпляры"""
+        if (job, slot) in self._done:
+            return
+        if await claim_job_run(job, slot):
+            await send()
+        self._done.add((job, slot))
+    
+    async def _remind_zone(self, zone: str):
+        """Напоминания сотрудникам филиалов одного часового пояса по их местному времени"""
+        now = datetime.now(pytz.timezone(zone))
+        day = now.date().isoformat()
+        # Общий пояс - под прежними именами задач в job_run
+        suffix = "" if zone == config.TIMEZONE else f":{zone}"
+        if now.hour == 19:
+            await self._run_once(
+                f"daily_reminders{suffix}", day,
+                lambda: self.send_daily_reminders(zone)
+            )
+        elif config.NUDGE_FROM_HOUR <= now.hour < config.NUDGE_TO_HOUR:
+            await self._run_once(
+                f"nudge{suffix}", f"{day}T{now.hour:02d}",
+                lambda: self.send_nudges(zone)
+            )
     
     async def start_scheduler(self):
         """Запуск планировщика напоминаний"""
         while True:
             now = datetime.now(self.timezone)
+            day = now.date().isoformat()
             
-            # Проверяем, 19:00 ли сейчас
-            if now.hour == 19 and now.minute == 0:
-                await self.send_daily_reminders()
-                await asyncio.sleep(60)  # Ждем минуту, чтобы не запускать несколько раз
-            
-            # Проверяем, 20:00 ли сейчас
-            elif now.hour == 20 and now.minute == 0:
-                await self.send_owner_notification()
-                await asyncio.sleep(60)
+            # Рассылает только лидер. Весь час считается окном запуска: если
+            # лидер сменился в 19:00:10, новый все равно отправит напоминания,
+            # а отметка в job_run не даст отправить их второй раз
+            if leader.is_leader():
+                try:
+                    await branch_directory.ensure_fresh()
+                    for zone in sorted(branch_directory.timezones()):
+                        await self._remind_zone(zone)
+                    # Сводка владельцу - одна на сеть, по общему часовому поясу
+                    if now.hour == 20:
+                        await self._run_once("owner_notification", day, self.send_owner_notification)
+                except Exception as e:
+                    logger.error(f"Reminder scheduler error: {e}")
             
             await asyncio.sleep(30)  # Проверяем каждые 30 секунд
\ No newline at end of file
@@ -0,0 +1,149 @@
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, Hashable, Optional, Set, Tuple
+from config import config
+from database.invalidation import invalidation_bus
+from utils.metrics import registry
+
+CacheKey = Tuple[str, date, Optional[Hashable]]
+
+
+class ReportCache:
+    """LRU-кеш отрендеренных сводок для админских представлений"""
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        today_ttl: float = 60,
+        past_ttl: float = 86400
+    ):
+        self.max_entries = max_entries
+        self.today_ttl = today_ttl
+        self.past_ttl = past_ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[float, str]]" = OrderedDict()
+        self._by_day: Dict[date, Set[CacheKey]] = {}
+        # Счетчики сбросов: по дню и общий (clear)
+        self._generations: Dict[date, int] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _ttl_for(self, business_date: date) -> float:
+        # Прошлые дни почти не меняются, сегодняшний - постоянно
+        if business_date < datetime.utcnow().date():
+            return self.past_ttl
+        return self.today_ttl
+
+    def _drop(self, key: CacheKey):
+        self._entries.pop(key, None)
+        keys = self._by_day.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_day[key[1]]
+
+    def get(self, view: str, business_date: date, branch: Optional[Hashable] = None) -> Optional[str]:
+        key = (view, business_date, branch)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, text = entry
+        if expires_at < time.monotonic():
+            self._drop(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return text
+
+    def generation(self, business_date: date) -> Tuple[int, int]:
+        """Снимок счетчика сбросов дня; берется до чтения из БД и передается в set"""
+        return self._epoch, self._generations.get(business_date, 0)
+
+    def set(
+        self,
+        view: str,
+        business_date: date,
+        text: str,
+        branch: Optional[Hashable] = None,
+        generation: Optional[Tuple[int, int]] = None
+    ):
+        # День сброшен, пока шло чтение: текст мог устареть, не кешируем
+        if generation is not None and generation != self.generation(business_date):
+            return
+        key = (view, business_date, branch)
+        self._entries[key] = (time.monotonic() + self._ttl_for(business_date), text)
+        self._entries.move_to_end(key)
+        self._by_day.setdefault(business_date, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def invalidate_day(self, business_date: date):
+        """Сбросить все представления, построенные по указанному дню"""
+        self._generations[business_date] = self._generations.get(business_date, 0) + 1
+        for key in list(self._by_day.get(business_date, ())):
+            self._drop(key)
+            self.invalidations += 1
+
+    def clear(self):
+        self._epoch += 1
+        self._generations.clear()
+        self._entries.clear()
+        self._by_day.clear()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+
+report_cache = ReportCache(
+    max_entries=config.REPORT_CACHE_SIZE,
+    today_ttl=config.REPORT_CACHE_TODAY_TTL,
+    past_ttl=config.REPORT_CACHE_PAST_TTL
+)
+
+registry.gauge(
+    "report_cache_entries",
+    "Записи в кеше админских сводок",
+    callback=lambda: report_cache.stats()['size']
+)
+registry.gauge(
+    "report_cache_hit_rate",
+    "Доля попаданий в кеш админских сводок",
+    callback=lambda: report_cache.stats()['hit_rate']
+)
+registry.gauge(
+    "report_cache_requests",
+    "Обращения к кешу админских сводок",
+    ["result"],
+    callback=lambda: {("hit",): report_cache.hits, ("miss",): report_cache.misses}
+)
+
+
+def _on_report_day(key: Optional[str]):
+    if key is None:
+        report_cache.clear()
+    else:
+        report_cache.invalidate_day(date.fromisoformat(key))
+
+
+invalidation_bus.subscribe("report_day", _on_report_day)
+# В сводках есть имена филиалов и сотрудников
+invalidation_bus.subscribe("branch", lambda key: report_cache.clear())
+invalidation_bus.subscribe("employee", lambda key: report_cache.clear())
@@ -0,0 +1,402 @@
+"""Локальный HTTP API только для чтения: филиалы, сотрудники, дневные сводки, отчеты.
+
+Запускается в процессе бота (REPORTING_API_PORT) или отдельно:
+    python -m services.reporting_api
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+from aiohttp import web
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from config import config
+from database.dao import BranchDAO, EmployeeDAO, ReportDAO
+from database.invalidation import invalidation_bus
+from database.session import build_engine
+from utils.logger import logger
+from utils.metrics import registry
+
+API_REQUESTS = registry.counter(
+    "reporting_api_requests_total",
+    "Запросы к API отчетности",
+    ["endpoint", "status"]
+)
+API_SECONDS = registry.histogram(
+    "reporting_api_seconds",
+    "Длительность запросов к API отчетности",
+    ["endpoint"]
+)
+
+MONEY_FIELDS = (
+    "total_income", "cash", "cashless", "cash_balance",
+    "cash_to_suppliers", "cashless_to_suppliers"
+)
+# Столько записей сериализуется перед каждой записью в сокет
+WRITE_BATCH = 500
+
+
+class DataVersions:
+    """Версии данных для ETag по событиям шины инвалидации.
+
+    Счетчики только растут; эпоха меняется при старте процесса и при сбросе
+    шины, поэтому после пропуска событий все ETag становятся недействительными.
+    Версия диапазона дней - версии тех дней, которые менялись.
+    """
+
+    def __init__(self):
+        self.epoch = os.urandom(4).hex()
+        self.entities: Dict[str, int] = {"branch": 0, "employee": 0}
+        self.days: Dict[date, int] = {}
+
+    def bump(self, entity: str, key: Optional[str]):
+        self.entities[entity] = self.entities.get(entity, 0) + 1
+        if key is None:
+            self.epoch = os.urandom(4).hex()
+
+    def bump_day(self, key: Optional[str]):
+        if key is None:
+            self.epoch = os.urandom(4).hex()
+            self.days.clear()
+            return
+        day = date.fromisoformat(key)
+        self.days[day] = self.days.get(day, 0) + 1
+
+    def days_version(self, first_day: date, last_day: date) -> List[Tuple[str, int]]:
+        return sorted(
+            (day.isoformat(), version) for day, version in self.days.items()
+            if first_day <= day <= last_day
+        )
+
+    def etag(self, request: web.Request, *parts) -> str:
+        state = json.dumps([self.epoch, request.path, request.query_string, *parts], default=str)
+        return f'"{hashlib.sha1(state.encode("utf-8")).hexdigest()[:20]}"'
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _dumps(item: Dict[str, Any]) -> str:
+    return json.dumps(item, ensure_ascii=False, default=_json_default, separators=(",", ":"))
+
+
+def _day_param(request: web.Request, name: str, default: date) -> date:
+    value = request.query.get(name)
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"{name}: expected YYYY-MM-DD")
+
+
+def _int_param(request: web.Request, name: str, default: int) -> int:
+    value = request.query.get(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"{name}: expected integer")
+
+
+class ReportingApi:
+    """aiohttp-приложение API отчетности со своим бюджетом соединений.
+
+    У API отдельный пул соединений к БД (pool_size, без переполнения) и
+    не больше max_concurrency запросов одновременно - лишние сразу получают
+    503, а не ждут в очереди. Так выгрузка в BI не отнимает соединения у
+    обработчиков бота. Данные отдаются страницами по ключу (after_id /
+    after), следующая страница - в заголовке Link. Страница (не больше
+    max_page_size записей) читается из БД целиком, а в ответ (JSON-массив
+    или NDJSON) сериализуется и пишется частями. ETag строится из версий
+    данных без обращения к БД: неизменившиеся данные отдают 304.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        db_url: str,
+        pool_size: int,
+        max_concurrency: int,
+        page_size: int,
+        max_page_size: int,
+        token: str = ""
+    ):
+        self.host = host
+        self.port = port
+        self.db_url = db_url
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.token = token
+        self.versions = DataVersions()
+        self._active = 0
+        self._engine = None
+        self._session_maker: Optional[async_sessionmaker] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    def _limit(self, request: web.Request) -> int:
+        return min(max(_int_param(request, "limit", self.page_size), 1), self.max_page_size)
+
+    def _range(self, request: web.Request) -> Tuple[date, date]:
+        last_day = _day_param(request, "to", datetime.utcnow().date())
+        first_day = _day_param(request, "from", last_day - timedelta(days=30))
+        if first_day > last_day:
+            raise web.HTTPBadRequest(text="from is after to")
+        return first_day, last_day
+
+    def _range_parts(self, first_day: date, last_day: date) -> tuple:
+        """Части ETag для выборок по дням.
+
+        Границы - уже вычисленные: диапазон по умолчанию сдвигается в полночь
+        при той же строке запроса. Счетчики филиалов и сотрудников - потому что
+        выборки зависят и от этих таблиц.
+        """
+        return (
+            first_day,
+            last_day,
+            self.versions.entities["branch"],
+            self.versions.entities["employee"],
+            self.versions.days_version(first_day, last_day)
+        )
+
+    @web.middleware
+    async def _guard(self, request: web.Request, handler):
+        endpoint = request.match_info.route.resource.canonical if request.match_info.route.resource else "unknown"
+        if self.token:
+            supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+            if not hmac.compare_digest(supplied, self.token):
+                API_REQUESTS.inc(endpoint=endpoint, status="401")
+                raise web.HTTPUnauthorized(text="bad token")
+        if self._active >= self.max_concurrency:
+            API_REQUESTS.inc(endpoint=endpoint, status="503")
+            raise web.HTTPServiceUnavailable(text="busy", headers={"Retry-After": "1"})
+        self._active += 1
+        start = time.perf_counter()
+        status = "500"
+        try:
+            response = await handler(request)
+            status = str(response.status)
+            return response
+        except web.HTTPException as e:
+            status = str(e.status)
+            raise
+        finally:
+            self._active -= 1
+            API_REQUESTS.inc(endpoint=endpoint, status=status)
+            API_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+
+    def _session(self) -> AsyncSession:
+        return self._session_maker()
+
+    @staticmethod
+    def _not_modified(request: web.Request, etag: str) -> Optional[web.Response]:
+        if etag in [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]:
+            return web.Response(status=304, headers={"ETag": etag})
+        return None
+
+    @staticmethod
+    def _next_link(request: web.Request, **params) -> str:
+        query = dict(request.query)
+        query.update({name: str(value) for name, value in params.items()})
+        return f'<{request.path}?{urlencode(query)}>; rel="next"'
+
+    async def _stream(self, request: web.Request, items: List[Dict], etag: str, next_link: Optional[str] = None):
+        """Записать уже прочитанную страницу частями по WRITE_BATCH.
+
+        Это не потоковое чтение из БД: страница уже в памяти, частями идет
+        только сериализация и запись, чтобы не собирать весь ответ одной строкой.
+        """
+        ndjson = (
+            request.query.get("format") == "ndjson"
+            or "application/x-ndjson" in request.headers.get("Accept", "")
+        )
+        response = web.StreamResponse(headers={
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            "Content-Type": "application/x-ndjson; charset=utf-8" if ndjson else "application/json; charset=utf-8"
+        })
+        if next_link:
+            response.headers["Link"] = next_link
+        await response.prepare(request)
+        if not ndjson:
+            await response.write(b"[")
+        for first in range(0, len(items), WRITE_BATCH):
+            batch = items[first:first + WRITE_BATCH]
+            if ndjson:
+                chunk = "".join(_dumps(item) + "\n" for item in batch)
+            else:
+                chunk = ("," if first else "") + ",".join(_dumps(item) for item in batch)
+            await response.write(chunk.encode("utf-8"))
+        if not ndjson:
+            await response.write(b"]\n")
+        await response.write_eof()
+        return response
+
+    async def handle_branches(self, request: web.Request):
+        etag = self.versions.etag(request, self.versions.entities["branch"])
+        cached = self._not_modified(request, etag)
+        if cached is not None:
+            return cached
+        async with self._session() as session:
+            branches = await BranchDAO(session).get_all()
+        items = [
+            {'id': branch.id, 'name': branch.name, 'timezone': branch.timezone, 'created_at': branch.created_at}
+            for branch in branches
+        ]
+        return await self._stream(request, items, etag)
+
+    async def handle_employees(self, request: web.Request):
+        after_id, limit = _int_param(request, "after_id", 0), self._limit(request)
+        etag = self.versions.etag(request, self.versions.entities["employee"])
+        cached = self._not_modified(request, etag)
+        if cached is not None:
+            return cached
+        async with self._session() as session:
+            employees = await EmployeeDAO(session).get_page(after_id, limit)
+        items = [
+            {
+                'id': employee.id,
+                'telegram_id': employee.telegram_id,
+                'full_name': employee.full_name,
+                'branch_id': employee.branch_id,
+                'is_active': employee.is_active,
+                'is_admin': employee.is_admin,
+                'created_at': employee.created_at
+            }
+            for employee in employees
+        ]
+        next_link = self._next_link(request, after_id=items[-1]['id']) if len(items) == limit else None
+        return await self._stream(request, items, etag, next_link)
+
+    async def handle_daily(self, request: web.Request):
+        first_day, last_day = self._range(request)
+        branch_id = _int_param(request, "branch_id", 0) or None
+        after = None
+        if request.query.get("after"):
+            try:
+                day, after_branch = request.query["after"].split(":")
+                after = (date.fromisoformat(day), int(after_branch))
+            except ValueError:
+                raise web.HTTPBadRequest(text="after: expected YYYY-MM-DD:branch_id")
+        limit = self._limit(request)
+        etag = self.versions.etag(request, *self._range_parts(first_day, last_day))
+        cached = self._not_modified(request, etag)
+        if cached is not None:
+            return cached
+        async with self._session() as session:
+            rows = await ReportDAO(session).get_daily_summaries(first_day, last_day, branch_id, after, limit)
+        items = [
+            {
+                'day': row.day,
+                'branch_id': row.branch_id,
+                'reports': row.reports,
+                'clients_count': row.clients_count,
+                **{field: getattr(row, field) for field in MONEY_FIELDS}
+            }
+            for row in rows
+        ]
+        next_link = None
+        if len(items) == limit:
+            next_link = self._next_link(request, after=f"{items[-1]['day'].isoformat()}:{items[-1]['branch_id']}")
+        return await self._stream(request, items, etag, next_link)
+
+    async def handle_reports(self, request: web.Request):
+        first_day, last_day = self._range(request)
+        after_id, limit = _int_param(request, "after_id", 0), self._limit(request)
+        etag = self.versions.etag(request, *self._range_parts(first_day, last_day))
+        cached = self._not_modified(request, etag)
+        if cached is not None:
+            return cached
+        async with self._session() as session:
+            reports = await ReportDAO(session).get_range_page(first_day, last_day, after_id, limit)
+        items = [
+            {
+                'id': report.id,
+                'report_date': report.report_date,
+                'branch_id': report.branch_id,
+                'employee_id': report.employee_id,
+                'version': report.version,
+                'clients_count': report.clients_count,
+                **{field: getattr(report, field) for field in MONEY_FIELDS},
+                'created_at': report.created_at
+            }
+            for report in reports
+        ]
+        next_link = self._next_link(request, after_id=items[-1]['id']) if len(items) == limit else None
+        return await self._stream(request, items, etag, next_link)
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._guard])
+        app.router.add_get("/api/branches", self.handle_branches)
+        app.router.add_get("/api/employees", self.handle_employees)
+        app.router.add_get("/api/summaries/daily", self.handle_daily)
+        app.router.add_get("/api/reports", self.handle_reports)
+        return app
+
+    async def start(self):
+        if not self.port:
+            return
+        self._engine = build_engine(self.db_url, pool_size=self.pool_size, max_overflow=0, name="reporting_api")
+        self._session_maker = async_sessionmaker(self._engine, class_=AsyncSession, expire_on_commit=False)
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Reporting API listening on http://{self.host}:{self.port}/api/")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+
+reporting_api = ReportingApi(
+    host=config.REPORTING_API_HOST,
+    port=config.REPORTING_API_PORT,
+    db_url=config.REPORTING_API_DB_URL or config.DB_URL,
+    pool_size=config.REPORTING_API_POOL_SIZE,
+    max_concurrency=config.REPORTING_API_MAX_CONCURRENCY,
+    page_size=config.REPORTING_API_PAGE_SIZE,
+    max_page_size=config.REPORTING_API_MAX_PAGE_SIZE,
+    token=config.REPORTING_API_TOKEN
+)
+
+invalidation_bus.subscribe("branch", lambda key: reporting_api.versions.bump("branch", key))
+invalidation_bus.subscribe("employee", lambda key: reporting_api.versions.bump("employee", key))
+invalidation_bus.subscribe("report_day", reporting_api.versions.bump_day)
+
+
+async def _serve():
+    # Отдельный процесс узнает об изменениях из шины инвалидации
+    invalidation_bus.start()
+    await reporting_api.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await reporting_api.stop()
+        await invalidation_bus.stop()
+
+
+if __name__ == "__main__":
+    if not reporting_api.port:
+        raise SystemExit("REPORTING_API_PORT is not set")
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
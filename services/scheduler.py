@@ -0,0 +1,108 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from database.leader import claim_job_run, leader, prune_job_runs
+from utils.logger import logger
+from utils.metrics import registry
+
+JOB_SECONDS = registry.histogram(
+    "scheduler_job_seconds",
+    "Длительность фоновых задач планировщика",
+    ["job"]
+)
+JOB_ERRORS = registry.counter(
+    "scheduler_job_errors_total",
+    "Ошибки фоновых задач планировщика",
+    ["job"]
+)
+
+Job = Callable[[], Awaitable[None]]
+
+
+class ScheduledJob:
+    def __init__(self, name: str, func: Job, interval: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.last_slot: Optional[str] = None
+        self.last_run: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def current_slot(self) -> str:
+        # Слоты выровнены по эпохе: суточная задача - один раз за сутки UTC
+        return str(int(time.time() // self.interval))
+
+
+class Scheduler:
+    """Периодические фоновые задачи: одна asyncio-задача на каждую работу.
+
+    Задачи выполняет только лидер (см. database/leader.py). Каждый слот
+    интервала занимается в job_run, поэтому после смены лидера или
+    перезапуска слот не выполняется второй раз.
+    """
+
+    def __init__(self, tick: float = 30):
+        self.tick = tick
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(self, name: str, func: Job, interval: float):
+        self.jobs[name] = ScheduledJob(name, func, interval)
+
+    async def run_job(self, job: ScheduledJob):
+        start = time.perf_counter()
+        try:
+            await job.func()
+            job.last_error = None
+        except Exception as e:
+            JOB_ERRORS.inc(job=job.name)
+            job.last_error = str(e)
+            logger.error(f"Scheduled job {job.name} failed: {e}")
+        finally:
+            job.last_run = time.time()
+            JOB_SECONDS.observe(time.perf_counter() - start, job=job.name)
+
+    async def _maybe_run(self, job: ScheduledJob):
+        slot = job.current_slot()
+        if slot == job.last_slot or not leader.is_leader():
+            return
+        try:
+            claimed = await claim_job_run(job.name, slot)
+        except Exception as e:
+            logger.error(f"Error claiming job {job.name}: {e}")
+            return
+        job.last_slot = slot
+        if claimed:
+            await self.run_job(job)
+
+    async def _loop(self, job: ScheduledJob):
+        while True:
+            await self._maybe_run(job)
+            await asyncio.sleep(min(job.interval, self.tick))
+
+    async def prune_runs(self):
+        """Чистка job_run: хранятся отметки за несколько интервалов самой редкой задачи
+        (не меньше нескольких суток - там же отметки рассылок напоминаний)"""
+        longest = max([job.interval for job in self.jobs.values()] + [24 * 3600])
+        removed = await prune_job_runs(3 * longest)
+        if removed:
+            logger.info(f"Job runs pruned: {removed}")
+
+    def start(self):
+        if self._tasks:
+            return
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._loop(job), name=f"job:{job.name}"))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+
+scheduler = Scheduler()
@@ -0,0 +1,259 @@
+import bisect
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy import select
+from database.invalidation import invalidation_bus
+from database.models import Branch, Employee
+from database.replicas import read_session
+from utils.metrics import registry
+
+# Документ индекса: ("e", telegram_id) или ("b", branch_id)
+DocKey = Tuple[str, int]
+
+# Больше стольких кандидатов не сортируем, а идем по заранее отсортированному списку
+SORT_CANDIDATES_LIMIT = 256
+
+
+class EmployeeEntry(NamedTuple):
+    telegram_id: int
+    full_name: str
+    branch_id: int
+    is_active: bool
+
+
+class SearchHit(NamedTuple):
+    kind: str
+    id: int
+    title: str
+    subtitle: str
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().replace("ё", "е").split())
+
+
+def trigrams(text: str) -> Set[str]:
+    """Триграммы слов текста; слово дополняется двумя пробелами слева,
+    поэтому префиксы из одной-двух букв тоже ищутся по индексу"""
+    result = set()
+    for word in text.split():
+        padded = "  " + word + " "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def _query_trigrams(word: str) -> Set[str]:
+    # Короткое слово - префикс (с левыми пробелами), длинное - подстрока
+    padded = "  " + word if len(word) < 3 else word
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Триграммный индекс по ФИО, Telegram ID сотрудников и названиям филиалов.
+
+    Строится одним запросом, дальше обновляется по событиям шины инвалидации:
+    измененные ключи копятся и перечитываются одним запросом при следующем
+    поиске. Поиск - пересечение списков триграмм и проверка кандидатов.
+    """
+
+    def __init__(self):
+        self.employees: Dict[int, EmployeeEntry] = {}
+        self.branches: Dict[int, str] = {}
+        self._texts: Dict[DocKey, str] = {}
+        self._postings: Dict[str, Set[DocKey]] = {}
+        # (текст, ключ) по алфавиту - порядок выдачи без сортировки на запрос
+        self._sorted: List[Tuple[str, DocKey]] = []
+        self._stale = True
+        self._dirty_employees: Set[int] = set()
+        self._dirty_branches: Set[int] = set()
+
+    def _add(self, key: DocKey, text: str, keep_sorted: bool = True):
+        self._remove(key)
+        text = normalize(text)
+        self._texts[key] = text
+        if keep_sorted:
+            bisect.insort(self._sorted, (text, key))
+        for gram in trigrams(text):
+            self._postings.setdefault(gram, set()).add(key)
+
+    def _remove(self, key: DocKey):
+        text = self._texts.pop(key, None)
+        if text is None:
+            return
+        del self._sorted[bisect.bisect_left(self._sorted, (text, key))]
+        for gram in trigrams(text):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def _put_employee(self, entry: EmployeeEntry, keep_sorted: bool = True):
+        self.employees[entry.telegram_id] = entry
+        self._add(("e", entry.telegram_id), f"{entry.full_name} {entry.telegram_id}", keep_sorted)
+
+    def _put_branch(self, branch_id: int, name: str, keep_sorted: bool = True):
+        self.branches[branch_id] = name
+        self._add(("b", branch_id), name, keep_sorted)
+
+    async def rebuild(self):
+        """Перечитать всех сотрудников и филиалы"""
+        self._stale = False
+        self._dirty_employees.clear()
+        self._dirty_branches.clear()
+        async with read_session() as session:
+            branches = (await session.execute(select(Branch.id, Branch.name))).all()
+            employees = (await session.execute(select(
+                Employee.telegram_id, Employee.full_name, Employee.branch_id, Employee.is_active
+            ))).all()
+
+        self.load(branches, employees)
+
+    def load(self, branches: Iterable[Tuple[int, str]], employees: Iterable[Tuple]):
+        """Заполнить индекс заново: филиалы (id, название), сотрудники - поля EmployeeEntry"""
+        self.employees, self.branches = {}, {}
+        self._texts, self._postings = {}, {}
+        # Список по алфавиту сортируем один раз, а не вставкой на каждую запись
+        for branch_id, name in branches:
+            self._put_branch(branch_id, name, keep_sorted=False)
+        for row in employees:
+            self._put_employee(EmployeeEntry(*row), keep_sorted=False)
+        self._sorted = sorted((text, key) for key, text in self._texts.items())
+
+    async def _apply_dirty(self):
+        employee_ids, self._dirty_employees = self._dirty_employees, set()
+        branch_ids, self._dirty_branches = self._dirty_branches, set()
+        async with read_session() as session:
+            if branch_ids:
+                rows = (await session.execute(
+                    select(Branch.id, Branch.name).where(Branch.id.in_(branch_ids))
+                )).all()
+                found = set()
+                for branch_id, name in rows:
+                    self._put_branch(branch_id, name)
+                    found.add(branch_id)
+                for branch_id in branch_ids - found:
+                    self.branches.pop(branch_id, None)
+                    self._remove(("b", branch_id))
+            if employee_ids:
+                rows = (await session.execute(
+                    select(
+                        Employee.telegram_id, Employee.full_name, Employee.branch_id, Employee.is_active
+                    ).where(Employee.telegram_id.in_(employee_ids))
+                )).all()
+                found = set()
+                for row in rows:
+                    self._put_employee(EmployeeEntry(*row))
+                    found.add(row.telegram_id)
+                for telegram_id in employee_ids - found:
+                    self.employees.pop(telegram_id, None)
+                    self._remove(("e", telegram_id))
+
+    async def ensure_fresh(self):
+        if self._stale:
+            await self.rebuild()
+        elif self._dirty_employees or self._dirty_branches:
+            await self._apply_dirty()
+
+    def mark_stale(self):
+        self._stale = True
+
+    def employee_changed(self, telegram_id: int):
+        self._dirty_employees.add(telegram_id)
+
+    def branch_changed(self, branch_id: int):
+        self._dirty_branches.add(branch_id)
+
+    def _candidates(self, words: List[str]) -> Set[DocKey]:
+        postings = []
+        for gram in set().union(*map(_query_trigrams, words)):
+            keys = self._postings.get(gram)
+            if not keys:
+                return set()
+            postings.append(keys)
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:])
+
+    @staticmethod
+    def _matches(text: str, words: List[str]) -> bool:
+        # Триграммы дают кандидатов, точное совпадение проверяем по тексту:
+        # короткое слово - префикс слова, длинное - подстрока
+        padded = " " + text
+        return all((word if len(word) >= 3 else " " + word) in padded for word in words)
+
+    def _hit(self, key: DocKey) -> SearchHit:
+        kind, doc_id = key
+        if kind == "b":
+            return SearchHit("branch", doc_id, self.branches[doc_id], f"Филиал, ID {doc_id}")
+        entry = self.employees[doc_id]
+        status = "" if entry.is_active else ", неактивен"
+        branch = self.branches.get(entry.branch_id, "без филиала")
+        return SearchHit("employee", doc_id, entry.full_name, f"{branch} | ID {doc_id}{status}")
+
+    def search(self, query: str, limit: int = 20, kind: Optional[str] = None) -> List[SearchHit]:
+        """Поиск по индексу (без обращения к БД; перед ним - ensure_fresh).
+
+        Сначала строки, начинающиеся с запроса, затем остальные по алфавиту.
+        """
+        words = normalize(query).split()
+        if not words:
+            return []
+        prefix = " ".join(words)
+        candidates = self._candidates(words)
+        if kind is not None:
+            candidates = {key for key in candidates if key[0] == kind[0]}
+
+        def accept(text: str, key: DocKey) -> bool:
+            return key in candidates and self._matches(text, words)
+
+        if len(candidates) <= SORT_CANDIDATES_LIMIT:
+            ranked = sorted(
+                (not self._texts[key].startswith(prefix), self._texts[key], key)
+                for key in candidates
+            )
+            keys = [key for _, text, key in ranked if self._matches(text, words)][:limit]
+            return [self._hit(key) for key in keys]
+
+        # Кандидатов много - проходим отсортированный список до первых limit
+        keys = []
+        start = bisect.bisect_left(self._sorted, (prefix,))
+        for text, key in self._sorted[start:]:
+            if len(keys) >= limit or not text.startswith(prefix):
+                break
+            if accept(text, key):
+                keys.append(key)
+        for text, key in self._sorted:
+            if len(keys) >= limit:
+                break
+            if not text.startswith(prefix) and accept(text, key):
+                keys.append(key)
+        return [self._hit(key) for key in keys]
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+
+search_index = SearchIndex()
+
+
+def _on_employee(key: Optional[str]):
+    if key is None:
+        search_index.mark_stale()
+    else:
+        search_index.employee_changed(int(key))
+
+
+def _on_branch(key: Optional[str]):
+    if key is None:
+        search_index.mark_stale()
+    else:
+        search_index.branch_changed(int(key))
+
+
+invalidation_bus.subscribe("employee", _on_employee)
+invalidation_bus.subscribe("branch", _on_branch)
+
+registry.gauge(
+    "search_index_documents",
+    "Документы в поисковом индексе сотрудников и филиалов",
+    callback=lambda: len(search_index)
+)
@@ -0,0 +1,439 @@
+import argparse
+import asyncio
+import hashlib
+import re
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy import Date, and_, delete, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import config
+from database.dao import reports_with_archive
+from database.models import Branch, Employee, SheetDayDigest
+from database.session import async_session_maker
+from database.write_queue import write_queue
+from services.google_sheets import REPORTS_WORKSHEET, GoogleSheetsService, report_row, sheets_call
+from utils.logger import logger
+from utils.metrics import registry
+
+SHEETS_RECONCILED_ROWS = registry.counter(
+    "sheets_reconciled_rows_total",
+    "Строки листа Reports, исправленные сверкой с БД",
+    ["action"]
+)
+
+# Вид каждой колонки report_row: как приводить значение из таблицы к сравнимой строке
+COLUMN_KINDS = (
+    "day", "text", "text", "money", "money", "money", "money",
+    "int", "money", "money", "int", "datetime"
+)
+# Даты, введенные в таблицу вручную, приходят числом дней от 30.12.1899
+SHEETS_EPOCH = datetime(1899, 12, 30)
+LAST_COLUMN = "L"
+DAY_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _normalize(value, kind: str) -> str:
+    if kind in ("day", "datetime") and isinstance(value, (int, float)):
+        moment = SHEETS_EPOCH + timedelta(seconds=round(value * 86400))
+        return moment.strftime('%Y-%m-%d') if kind == "day" else moment.strftime('%Y-%m-%d %H:%M:%S')
+    text = str(value).strip()
+    if kind in ("text", "day", "datetime") or text == "":
+        return text
+    try:
+        number = float(text.replace("\u00a0", "").replace(" ", "").replace(",", "."))
+    except ValueError:
+        return text
+    return f"{number:.2f}" if kind == "money" else str(int(number))
+
+
+def normalize_row(cells: Sequence) -> Tuple[str, ...]:
+    cells = list(cells)[:len(COLUMN_KINDS)]
+    cells += [""] * (len(COLUMN_KINDS) - len(cells))
+    return tuple(_normalize(cell, kind) for cell, kind in zip(cells, COLUMN_KINDS))
+
+
+def row_hash(row: Tuple[str, ...]) -> str:
+    return hashlib.sha256("\x1f".join(row).encode("utf-8")).hexdigest()
+
+
+def block_hash(hashes: Sequence[str]) -> str:
+    """Хеш блока не зависит от порядка строк: в листе они идут в порядке добавления"""
+    return hashlib.sha256("".join(sorted(hashes)).encode("ascii")).hexdigest()
+
+
+class SheetRow(NamedTuple):
+    number: int
+    row: Tuple[str, ...]
+    hash: str
+
+
+class RepairPlan(NamedTuple):
+    # (номер строки листа, новые значения)
+    updates: List[Tuple[int, list]]
+    appends: List[list]
+    deletes: List[int]
+    changed_days: int
+
+    @property
+    def size(self) -> int:
+        return len(self.updates) + len(self.appends) + len(self.deletes)
+
+
+def _row_key(row: Tuple[str, ...]) -> Tuple[str, str, str]:
+    # День, время создания и версия: не меняются при переименовании филиала
+    # или сотрудника, поэтому такие строки правятся на месте
+    return row[0], row[11], row[10]
+
+
+def _diff_day(sheet_rows: List[SheetRow], expected: List[Tuple[list, Tuple[str, ...], str]], plan: RepairPlan):
+    unmatched: Dict[str, List[SheetRow]] = {}
+    for sheet_row in sheet_rows:
+        unmatched.setdefault(sheet_row.hash, []).append(sheet_row)
+    missing = []
+    for values, row, digest in expected:
+        same = unmatched.get(digest)
+        if same:
+            same.pop()
+        else:
+            missing.append((values, row))
+
+    by_key: Dict[Tuple[str, str, str], List[SheetRow]] = {}
+    for rows in unmatched.values():
+        for sheet_row in rows:
+            by_key.setdefault(_row_key(sheet_row.row), []).append(sheet_row)
+    for values, row in missing:
+        candidates = by_key.get(_row_key(row))
+        if candidates:
+            plan.updates.append((candidates.pop().number, values))
+        else:
+            plan.appends.append(values)
+    plan.deletes.extend(sheet_row.number for rows in by_key.values() for sheet_row in rows)
+
+
+ExpectedRow = Tuple[list, Tuple[str, ...], str]
+
+
+def group_sheet(sheet: List[SheetRow]) -> Dict[str, List[SheetRow]]:
+    days: Dict[str, List[SheetRow]] = {}
+    for sheet_row in sheet:
+        days.setdefault(sheet_row.row[0], []).append(sheet_row)
+    return days
+
+
+def group_expected(expected_rows: Iterable[list]) -> Dict[str, List[ExpectedRow]]:
+    days: Dict[str, List[ExpectedRow]] = {}
+    for values in expected_rows:
+        row = normalize_row(values)
+        days.setdefault(row[0], []).append((values, row, row_hash(row)))
+    return days
+
+
+def changed_days(sheet_blocks: Dict[str, str], expected_blocks: Dict[str, str]) -> Tuple[List[str], bool]:
+    """Дни с разными блоками и признак совпадения корней (тогда список пуст)"""
+    if block_hash([f"{d}{h}" for d, h in sheet_blocks.items()]) == block_hash(
+        [f"{d}{h}" for d, h in expected_blocks.items()]
+    ):
+        return [], True
+    return sorted(
+        day for day in sheet_blocks.keys() | expected_blocks.keys()
+        if sheet_blocks.get(day) != expected_blocks.get(day)
+    ), False
+
+
+def plan_days(
+    days: List[str],
+    sheet_days: Dict[str, List[SheetRow]],
+    expected_days: Dict[str, List[ExpectedRow]]
+) -> RepairPlan:
+    plan = RepairPlan([], [], [], 0)
+    for day in days:
+        _diff_day(sheet_days.get(day, []), expected_days.get(day, []), plan)
+    return plan._replace(changed_days=len(days))
+
+
+def build_plan(sheet: List[SheetRow], expected_rows: List[list]) -> Tuple[RepairPlan, bool]:
+    """Сравнение по дереву хешей: корень, затем блоки дней, затем строки.
+
+    Возвращает план исправлений и признак, совпали ли корни (тогда план пуст).
+    """
+    sheet_days = group_sheet(sheet)
+    expected_days = group_expected(expected_rows)
+    days, in_sync = changed_days(
+        {day: block_hash([r.hash for r in rows]) for day, rows in sheet_days.items()},
+        {day: block_hash([r[2] for r in rows]) for day, rows in expected_days.items()}
+    )
+    return plan_days(days, sheet_days, expected_days), in_sync
+
+
+class ExpectedState(NamedTuple):
+    # Хеш блока каждого дня, где в БД есть строки старше cutoff
+    blocks: Dict[str, str]
+    # Строки дней, прочитанных из БД в этом запуске
+    rows: Dict[str, List[list]]
+    cutoff: str
+
+
+def _day_ranges(days: Iterable[date]) -> List[Tuple[date, date]]:
+    """Подряд идущие дни - одним диапазоном [первый, последний]"""
+    ranges: List[Tuple[date, date]] = []
+    for day in sorted(days):
+        if ranges and ranges[-1][1] + timedelta(days=1) == day:
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
+class SheetsReconciler:
+    """Сверка листа Reports с БД и исправление только расходящихся строк.
+
+    Лист читается большими диапазонами (несколько диапазонов в одном
+    batch_get), строки хешируются и группируются по дням. Если корневой хеш
+    совпал с хешем строк из БД - работа закончена; иначе сравниваются блоки
+    дней, а внутри расходящихся дней - строки. Исправления идут пакетами:
+    один batch_update для правок, один запрос на удаление лишних строк и
+    один append_rows для недостающих. Источник истины - БД (все версии
+    отчетов с архивом, текущие названия филиалов и имена сотрудников).
+    Строки, где в первой колонке не дата (заголовок, заметки), не трогаются.
+
+    БД и лист читаются не одновременно, а отчеты пишутся в оба места
+    по очереди. Поэтому строки, созданные позже чем за settle_seconds до
+    последнего отчета в снимке БД, не сверяются ни с одной стороны: отчет,
+    добавленный между чтениями, не удаляется как лишний, а отчет, чей
+    append_report еще не дошел, не дублируется. Они сверяются в следующий раз.
+
+    Хеши блоков дней хранятся в sheet_day_digest вместе с дешевым признаком
+    дня из БД (число строк и сумма id по report и архиву, хеш имен филиалов
+    и сотрудников). Строки читаются из БД только для дней, где признак
+    изменился, для еще не устоявшихся дней и для дней, расходящихся с листом.
+    """
+
+    def __init__(self, chunk_rows: int, ranges_per_call: int, max_changes: int, settle_seconds: int = 600):
+        self.chunk_rows = chunk_rows
+        self.ranges_per_call = ranges_per_call
+        self.max_changes = max_changes
+        self.settle_seconds = settle_seconds
+
+    async def _names_hash(self, session) -> str:
+        branches = (await session.execute(select(Branch.id, Branch.name).order_by(Branch.id))).all()
+        employees = (await session.execute(
+            select(Employee.id, Employee.full_name).order_by(Employee.id)
+        )).all()
+        spec = repr(([tuple(row) for row in branches], [tuple(row) for row in employees]))
+        return hashlib.sha256(spec.encode("utf-8")).hexdigest()[:32]
+
+    async def load_days(self, days: Iterable[date], cutoff: Optional[str] = None) -> Dict[str, List[list]]:
+        """Ожидаемые строки листа за дни days (с архивом), старше cutoff"""
+        ranges = _day_ranges(days)
+        if not ranges:
+            return {}
+        reports = reports_with_archive(lambda table: (or_(*(
+            and_(
+                table.c.report_date >= datetime.combine(first, time.min),
+                table.c.report_date < datetime.combine(last + timedelta(days=1), time.min)
+            )
+            for first, last in ranges
+        )),))
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(reports, Employee.full_name, Branch.name)
+                .outerjoin(Employee, reports.employee_id == Employee.id)
+                .outerjoin(Branch, reports.branch_id == Branch.id)
+                .order_by(reports.created_at, reports.id)
+            )
+            rows: Dict[str, List[list]] = {}
+            for report, employee_name, branch_name in result.all():
+                values = report_row({
+                    'report_date': report.report_date,
+                    'branch_name': branch_name or "",
+                    'employee_name': employee_name or "",
+                    'total_income': report.total_income,
+                    'cash': report.cash,
+                    'cashless': report.cashless,
+                    'cash_balance': report.cash_balance,
+                    'clients_count': report.clients_count,
+                    'cash_to_suppliers': report.cash_to_suppliers,
+                    'cashless_to_suppliers': report.cashless_to_suppliers,
+                    'version': report.version,
+                    'created_at': report.created_at
+                })
+                if cutoff is None or values[11] < cutoff:
+                    rows.setdefault(values[0], []).append(values)
+            return rows
+
+    async def expected_state(self) -> Optional[ExpectedState]:
+        """Блоки дней по БД: сохраненные, где признак дня не менялся, остальные - заново.
+
+        None - в БД нет отчетов.
+        """
+        reports = reports_with_archive(lambda table: ())
+        day = func.date(reports.report_date, type_=Date)
+        async with async_session_maker() as session:
+            names = await self._names_hash(session)
+            days = (await session.execute(
+                select(
+                    day.label("day"),
+                    func.count().label("rows"),
+                    func.sum(reports.id).label("id_sum"),
+                    func.max(reports.id).label("id_max"),
+                    func.max(reports.created_at).label("newest")
+                ).group_by(day)
+            )).all()
+            stored = {
+                digest.day: digest
+                for digest in (await session.execute(select(SheetDayDigest))).scalars().all()
+            }
+        if not days:
+            return None
+
+        cutoff = self.cutoff(max(row.newest for row in days))
+        signatures = {row.day: f"{row.rows}:{row.id_sum}:{row.id_max}:{names}" for row in days}
+        # В неустоявшемся дне часть строк моложе cutoff: его хеш зависит от
+        # времени запуска и не сохраняется
+        unsettled = {row.day for row in days if row.newest.strftime('%Y-%m-%d %H:%M:%S') >= cutoff}
+        dirty = {
+            day for day, signature in signatures.items()
+            if day not in unsettled and (day not in stored or stored[day].signature != signature)
+        }
+        rows = await self.load_days(dirty | unsettled, cutoff)
+        blocks = {
+            day.isoformat(): stored[day].digest
+            for day in signatures if day not in dirty and day not in unsettled and stored[day].digest
+        }
+        computed = {}
+        for day in dirty | unsettled:
+            expected = group_expected(rows.get(day.isoformat(), [])).get(day.isoformat(), [])
+            digest = block_hash([r[2] for r in expected]) if expected else ""
+            if digest:
+                blocks[day.isoformat()] = digest
+            if day in dirty:
+                computed[day] = digest
+
+        gone = (set(stored) - set(signatures)) | (unsettled & set(stored))
+        if computed or gone:
+            async def store(session: AsyncSession):
+                await session.execute(
+                    delete(SheetDayDigest).where(SheetDayDigest.day.in_(list(computed.keys() | gone)))
+                )
+                session.add_all(
+                    SheetDayDigest(day=day, signature=signatures[day], digest=digest)
+                    for day, digest in computed.items()
+                )
+            await write_queue.submit(store)
+        return ExpectedState(blocks, rows, cutoff)
+
+    def read_sheet(self, worksheet) -> List[SheetRow]:
+        ranges = [
+            f"A{start}:{LAST_COLUMN}{start + self.chunk_rows - 1}"
+            for start in range(1, max(worksheet.row_count, 1) + 1, self.chunk_rows)
+        ]
+        rows = []
+        for first in range(0, len(ranges), self.ranges_per_call):
+            with sheets_call("batch_get"):
+                values = worksheet.batch_get(
+                    ranges[first:first + self.ranges_per_call],
+                    value_render_option="UNFORMATTED_VALUE"
+                )
+            for index, chunk in enumerate(values):
+                start = (first + index) * self.chunk_rows + 1
+                for offset, cells in enumerate(chunk):
+                    row = normalize_row(cells)
+                    if DAY_PATTERN.match(row[0]):
+                        rows.append(SheetRow(start + offset, row, row_hash(row)))
+        return rows
+
+    def apply(self, spreadsheet, worksheet, plan: RepairPlan):
+        if plan.updates:
+            with sheets_call("batch_update"):
+                worksheet.batch_update([
+                    {'range': f"A{number}:{LAST_COLUMN}{number}", 'values': [values]}
+                    for number, values in plan.updates
+                ])
+        if plan.deletes:
+            # Снизу вверх, чтобы номера еще не удаленных строк не сдвигались
+            requests = [
+                {'deleteDimension': {'range': {
+                    'sheetId': worksheet.id, 'dimension': "ROWS",
+                    'startIndex': number - 1, 'endIndex': number
+                }}}
+                for number in sorted(plan.deletes, reverse=True)
+            ]
+            with sheets_call("delete_rows"):
+                spreadsheet.batch_update({'requests': requests})
+        if plan.appends:
+            with sheets_call("append_rows"):
+                worksheet.append_rows(plan.appends)
+
+    def cutoff(self, newest: datetime) -> str:
+        """Время создания (как в колонке листа), с которого строки не сверяются"""
+        return (newest - timedelta(seconds=self.settle_seconds)).strftime('%Y-%m-%d %H:%M:%S')
+
+    def _open(self):
+        service = GoogleSheetsService()
+        with sheets_call("worksheet"):
+            worksheet = service.sheet.worksheet(REPORTS_WORKSHEET)
+        return service.sheet, worksheet
+
+    def _apply(self, spreadsheet, worksheet, plan: RepairPlan, force: bool):
+        if plan.size > self.max_changes and not force:
+            raise RuntimeError(
+                f"Sheets reconciliation needs {plan.size} changes (limit {self.max_changes}); "
+                f"check with --dry-run and run with --force"
+            )
+        self.apply(spreadsheet, worksheet, plan)
+        for action, count in (("update", len(plan.updates)), ("append", len(plan.appends)),
+                              ("delete", len(plan.deletes))):
+            SHEETS_RECONCILED_ROWS.inc(count, action=action)
+
+    async def run(self, dry_run: bool = False, force: bool = False) -> RepairPlan:
+        state = await self.expected_state()
+        if state is None:
+            # Пустая БД (другой DB_URL, свежая установка) не должна стирать лист
+            logger.warning("Sheets reconciliation skipped: no reports in the database")
+            return RepairPlan([], [], [], 0)
+        # gspread синхронный - весь обмен с таблицей в отдельном потоке
+        spreadsheet, worksheet = await asyncio.to_thread(self._open)
+        sheet = [
+            sheet_row for sheet_row in await asyncio.to_thread(self.read_sheet, worksheet)
+            if sheet_row.row[11] < state.cutoff
+        ]
+        sheet_days = group_sheet(sheet)
+        days, in_sync = changed_days(
+            {day: block_hash([r.hash for r in rows]) for day, rows in sheet_days.items()},
+            state.blocks
+        )
+        plan = RepairPlan([], [], [], 0)
+        if not in_sync:
+            # Строки БД нужны только для расходящихся дней
+            missing = [date.fromisoformat(day) for day in days if day in state.blocks and day not in state.rows]
+            rows = {**state.rows, **await self.load_days(missing, state.cutoff)}
+            plan = plan_days(
+                days, sheet_days, group_expected(values for day in days for values in rows.get(day, []))
+            )
+            if not dry_run:
+                await asyncio.to_thread(self._apply, spreadsheet, worksheet, plan, force)
+        logger.info(
+            f"Sheets reconciliation{' (dry run)' if dry_run else ''}: {plan.changed_days} days differ, "
+            f"{len(plan.updates)} updated, {len(plan.appends)} appended, {len(plan.deletes)} deleted"
+        )
+        return plan
+
+
+sheets_reconciler = SheetsReconciler(
+    chunk_rows=config.SHEETS_RECONCILE_CHUNK_ROWS,
+    ranges_per_call=config.SHEETS_RECONCILE_RANGES_PER_CALL,
+    max_changes=config.SHEETS_RECONCILE_MAX_CHANGES,
+    settle_seconds=config.SHEETS_RECONCILE_SETTLE_SECONDS
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сверка листа Reports с БД")
+    parser.add_argument("--dry-run", action="store_true", help="только показать, что будет исправлено")
+    parser.add_argument("--force", action="store_true", help="исправить даже сверх SHEETS_RECONCILE_MAX_CHANGES")
+    args = parser.parse_args()
+    asyncio.run(sheets_reconciler.run(dry_run=args.dry_run, force=args.force))
+
+
+if __name__ == "__main__":
+    main()
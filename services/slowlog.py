@@ -0,0 +1,59 @@
+import json
+import os
+import pstats
+from collections import deque
+from datetime import datetime
+from typing import Dict, List
+from config import config
+from utils.logger import logger
+from utils.tracing import UpdateTrace
+
+
+class SlowUpdateLog:
+    """Журнал медленных апдейтов: память + ротируемый каталог на диске"""
+
+    def __init__(self, directory: str, keep_files: int = 50, keep_recent: int = 200):
+        self.directory = directory
+        self.keep_files = keep_files
+        self._recent = deque(maxlen=keep_recent)
+
+    def add(self, trace: UpdateTrace) -> Dict:
+        entry = trace.to_dict()
+        entry['at'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        self._recent.append(entry)
+        return entry
+
+    def worst(self, limit: int = 10) -> List[Dict]:
+        return sorted(self._recent, key=lambda e: e['duration_ms'], reverse=True)[:limit]
+
+    def dump(self, entry: Dict, profile=None):
+        """Записать трассу (и профиль cProfile) на диск. Вызывать вне event loop"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            base = os.path.join(
+                self.directory,
+                f"{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{entry['update_id']}"
+            )
+            with open(f"{base}.json", "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, indent=2)
+            if profile is not None:
+                pstats.Stats(profile).dump_stats(f"{base}.pstats")
+            self._rotate()
+        except OSError as e:
+            logger.error(f"Error writing slow update trace: {e}")
+
+    def _rotate(self):
+        # Одна запись - это .json и, возможно, .pstats с тем же именем
+        names = sorted({
+            os.path.splitext(name)[0]
+            for name in os.listdir(self.directory)
+            if name.endswith((".json", ".pstats"))
+        })
+        for stale in names[:-self.keep_files] if self.keep_files else []:
+            for ext in (".json", ".pstats"):
+                path = os.path.join(self.directory, stale + ext)
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+slow_log = SlowUpdateLog(config.SLOW_UPDATE_DIR, config.SLOW_UPDATE_KEEP)
@@ -0,0 +1,185 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import pytz
+from sqlalchemy import select
+from config import config
+from database.invalidation import invalidation_bus
+from database.models import Branch, Employee, Report
+from database.replicas import read_session
+from utils.metrics import registry
+
+
+class TrackedEmployee(NamedTuple):
+    id: int
+    telegram_id: int
+    full_name: str
+    branch_id: int
+
+
+class SubmissionTracker:
+    """Кто сдал отчет за день: битовые маски по плотному индексу сотрудников.
+
+    Бит i маски дня - сотрудник employees[i] сдал отчет. Маски активных
+    сотрудников и филиалов строятся при перестроении, поэтому "кто не сдал"
+    и заполненность филиалов считаются операциями над int, без запросов.
+
+    День - местная дата филиала сотрудника, как у напоминаний: отчет,
+    сданный в 01:00 по Владивостоку, относится к местному дню, а не к дате
+    UTC. Без явного дня каждый сотрудник проверяется по своему "сегодня".
+    """
+
+    def __init__(self, default_timezone: str, keep_days: int = 3):
+        self.default_timezone = default_timezone
+        self.keep_days = keep_days
+        self.employees: List[TrackedEmployee] = []
+        self._index: Dict[int, int] = {}
+        self._branch_masks: Dict[int, int] = {}
+        self._branch_zones: Dict[int, str] = {}
+        self._zone_masks: Dict[str, int] = {}
+        self._all_mask = 0
+        self._days: Dict[date, int] = {}
+        self._stale = True
+        self._rebuilding = False
+        self._pending: List[Tuple[datetime, int]] = []
+
+    def business_day(self, zone: Optional[str] = None) -> date:
+        """Сегодняшняя дата в часовом поясе zone (по умолчанию - общем)"""
+        return datetime.now(pytz.timezone(zone or self.default_timezone)).date()
+
+    def local_day(self, branch_id: int, moment: datetime) -> date:
+        """Местная дата филиала для момента moment в UTC"""
+        zone = pytz.timezone(self._branch_zones.get(branch_id, self.default_timezone))
+        return pytz.utc.localize(moment).astimezone(zone).date()
+
+    async def rebuild(self):
+        """Перечитать активных сотрудников и отметки за последние сутки"""
+        # Местное "сегодня" любого пояса начинается не раньше, чем сутки назад по UTC
+        since = datetime.utcnow() - timedelta(days=2)
+        self._rebuilding = True
+        try:
+            async with read_session() as session:
+                rows = (await session.execute(
+                    select(
+                        Employee.id,
+                        Employee.telegram_id,
+                        Employee.full_name,
+                        Employee.branch_id,
+                        Branch.timezone
+                    )
+                    .join(Branch, Employee.branch_id == Branch.id)
+                    .where(Employee.is_active == True)
+                    .order_by(Branch.name, Employee.full_name)
+                )).all()
+                submitted = (await session.execute(
+                    select(Report.employee_id, Report.report_date)
+                    .where(Report.report_date >= since)
+                )).all()
+        finally:
+            self._rebuilding = False
+
+        employees, index, branch_masks, branch_zones, zone_masks = [], {}, {}, {}, {}
+        for i, (employee_id, telegram_id, full_name, branch_id, timezone) in enumerate(rows):
+            employees.append(TrackedEmployee(employee_id, telegram_id, full_name, branch_id))
+            index[employee_id] = i
+            branch_masks[branch_id] = branch_masks.get(branch_id, 0) | (1 << i)
+            zone = branch_zones[branch_id] = timezone or self.default_timezone
+            zone_masks[zone] = zone_masks.get(zone, 0) | (1 << i)
+
+        self.employees = employees
+        self._index = index
+        self._branch_masks = branch_masks
+        self._branch_zones = branch_zones
+        self._zone_masks = zone_masks
+        self._all_mask = (1 << len(employees)) - 1
+        # Индексы поменялись - маски прошлых дней больше не годятся
+        self._days = {}
+        self._stale = False
+
+        pending, self._pending = self._pending, []
+        for employee_id, moment in submitted:
+            # Отчеты уволенных не в индексе и не должны делать трекер устаревшим
+            if employee_id in index:
+                self.mark_submitted(employee_id, moment)
+        for moment, employee_id in pending:
+            self.mark_submitted(employee_id, moment)
+
+    async def ensure_fresh(self):
+        if self._stale:
+            await self.rebuild()
+
+    def mark_stale(self):
+        self._stale = True
+
+    def mark_submitted(self, employee_id: int, moment: datetime):
+        """Отметить отчет сотрудника, сданный в момент moment (UTC)"""
+        if self._rebuilding:
+            self._pending.append((moment, employee_id))
+            return
+        i = self._index.get(employee_id)
+        if i is None:
+            # Новый сотрудник: узнаем о нем при следующем перестроении
+            self._stale = True
+            return
+        day = self.local_day(self.employees[i].branch_id, moment)
+        self._days[day] = self._days.get(day, 0) | (1 << i)
+        if len(self._days) > self.keep_days:
+            del self._days[min(self._days)]
+
+    def _submitted_mask(self, day: Optional[date] = None, zone: Optional[str] = None) -> int:
+        """Сдавшие за day; без day - каждый пояс за свое местное сегодня"""
+        zones = self._zone_masks if zone is None else {zone: self._zone_masks.get(zone, 0)}
+        submitted = 0
+        for name, mask in zones.items():
+            submitted |= self._days.get(day or self.business_day(name), 0) & mask
+        return submitted
+
+    def missing(self, zone: Optional[str] = None, day: Optional[date] = None) -> List[TrackedEmployee]:
+        """Кто не сдал отчет; zone - только филиалы этого часового пояса"""
+        scope = self._all_mask if zone is None else self._zone_masks.get(zone, 0)
+        mask = scope & ~self._submitted_mask(day, zone)
+        result = []
+        while mask:
+            low = mask & -mask
+            result.append(self.employees[low.bit_length() - 1])
+            mask ^= low
+        return result
+
+    def submitted_count(self, day: Optional[date] = None) -> int:
+        return self._submitted_mask(day).bit_count()
+
+    def branch_completion(self, day: Optional[date] = None) -> Dict[int, Tuple[int, int]]:
+        """branch_id -> (сдали, всего)"""
+        submitted = self._submitted_mask(day)
+        return {
+            branch_id: ((submitted & mask).bit_count(), mask.bit_count())
+            for branch_id, mask in self._branch_masks.items()
+        }
+
+
+submission_tracker = SubmissionTracker(config.TIMEZONE)
+
+
+def _on_report_submitted(key: Optional[str]):
+    if key is None:
+        submission_tracker.mark_stale()
+        return
+    # Ключ - "момент UTC:id сотрудника", в самом моменте тоже есть двоеточия
+    moment, employee_id = key.rsplit(":", 1)
+    submission_tracker.mark_submitted(int(employee_id), datetime.fromisoformat(moment))
+
+
+invalidation_bus.subscribe("report_submitted", _on_report_submitted)
+invalidation_bus.subscribe("employee", lambda key: submission_tracker.mark_stale())
+# Смена часового пояса филиала меняет местный день его сотрудников
+invalidation_bus.subscribe("branch", lambda key: submission_tracker.mark_stale())
+
+registry.gauge(
+    "reports_submitted_today",
+    "Сотрудники, сдавшие отчет за сегодня",
+    callback=lambda: submission_tracker.submitted_count()
+)
+registry.gauge(
+    "reports_missing_today",
+    "Активные сотрудники без отчета за сегодня",
+    callback=lambda: len(submission_tracker.employees) - submission_tracker.submitted_count()
+)
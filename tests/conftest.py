@@ -0,0 +1,42 @@
+"""Общая настройка тестов: окружение до импорта config и временная SQLite"""
+import asyncio
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config читает окружение при импорте, поэтому задаем его раньше всех модулей бота
+_db_dir = tempfile.mkdtemp(prefix="finance-tests-")
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault("BOT_TOKEN", "42:TEST")
+os.environ.setdefault("REPORT_SHEET_ID", "test-sheet")
+os.environ.setdefault("METRICS_PORT", "0")
+
+import pytest
+from database.models import Base
+from database.session import engine
+from database.write_queue import write_queue
+
+
+def run(coro):
+    """Выполнить корутину в новом цикле и закрыть то, что привязано к нему"""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await write_queue.close()
+            await engine.dispose()
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def db():
+    """Пустые таблицы на время теста"""
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+    run(reset())
+    yield engine
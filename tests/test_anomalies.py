@@ -0,0 +1,44 @@
+import random
+import statistics
+import pytest
+from services.anomalies import Welford
+
+
+def _fold(values):
+    state = Welford()
+    for value in values:
+        state = state.add(value)
+    return state
+
+
+def test_add_matches_statistics():
+    values = [12.5, 7.0, 30.25, 18.0, 9.75]
+    state = _fold(values)
+    assert state.count == len(values)
+    assert state.mean == pytest.approx(statistics.mean(values))
+    assert state.std == pytest.approx(statistics.stdev(values))
+
+
+def test_remove_reverses_add():
+    rng = random.Random(7)
+    values = [rng.uniform(1000, 50000) for _ in range(50)]
+    state = _fold(values)
+    for value in values[:20]:
+        state = state.remove(value)
+    rest = values[20:]
+    assert state.count == len(rest)
+    assert state.mean == pytest.approx(statistics.mean(rest))
+    assert state.std == pytest.approx(statistics.stdev(rest))
+
+
+def test_replace_value():
+    # Новая версия отчета: старое значение убирается, новое добавляется
+    state = _fold([10.0, 20.0, 30.0]).remove(20.0).add(50.0)
+    assert state.mean == pytest.approx(statistics.mean([10.0, 30.0, 50.0]))
+    assert state.std == pytest.approx(statistics.stdev([10.0, 30.0, 50.0]))
+
+
+def test_remove_last_value_resets():
+    assert _fold([5.0]).remove(5.0) == Welford()
+    assert Welford().remove(5.0) == Welford()
+    assert _fold([4.0, 4.0]).remove(4.0).std == 0.0
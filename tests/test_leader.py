@@ -0,0 +1,72 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from database.leader import LeaderElection, claim_job_run, prune_job_runs
+from database.models import JobRun, LeaderLease
+from database.session import async_session_maker, engine
+from conftest import run
+
+
+def test_single_leader_and_takeover(db):
+    async def scenario():
+        first = LeaderElection(engine, lease_seconds=1, heartbeat_seconds=0.1)
+        second = LeaderElection(engine, lease_seconds=1, heartbeat_seconds=0.1)
+        assert await first._lease_tick()
+        assert not await second._lease_tick()
+        # Лидер продлевает свою аренду
+        assert await first._lease_tick()
+        # Аренда истекла (лидер завис) - ее забирает другой экземпляр
+        async with async_session_maker() as session:
+            await session.execute(update(LeaderLease).values(expires_at=time.time() - 1))
+            await session.commit()
+        assert await second._lease_tick()
+        assert not await first._lease_tick()
+
+    run(scenario())
+
+
+def test_stop_releases_lease(db):
+    async def scenario():
+        first = LeaderElection(engine, lease_seconds=5, heartbeat_seconds=0.05)
+        second = LeaderElection(engine, lease_seconds=5, heartbeat_seconds=0.05)
+        first.start()
+        for _ in range(50):
+            if first.is_leader():
+                break
+            await asyncio.sleep(0.02)
+        assert first.is_leader()
+        await first.stop()
+        assert not first.is_leader()
+        # Не ждем истечения аренды: она освобождена при остановке
+        assert await second._lease_tick()
+
+    run(scenario())
+
+
+def test_job_run_claimed_once(db):
+    async def scenario():
+        assert await claim_job_run("backup", "2024-03-01")
+        assert not await claim_job_run("backup", "2024-03-01")
+        assert await claim_job_run("backup", "2024-03-02")
+        assert await claim_job_run("digest", "2024-03-01")
+
+    run(scenario())
+
+
+def test_prune_job_runs(db):
+    async def scenario():
+        await claim_job_run("backup", "old")
+        await claim_job_run("backup", "new")
+        async with async_session_maker() as session:
+            await session.execute(
+                update(JobRun).where(JobRun.slot == "old")
+                .values(started_at=datetime.utcnow() - timedelta(days=10))
+            )
+            await session.commit()
+        removed = await prune_job_runs(86400)
+        async with async_session_maker() as session:
+            slots = set((await session.execute(select(JobRun.slot))).scalars())
+        return removed, slots
+
+    assert run(scenario()) == (1, {"new"})
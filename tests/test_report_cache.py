@@ -0,0 +1,48 @@
+from datetime import date
+from services.report_cache import ReportCache
+
+DAY = date(2024, 3, 1)
+
+
+def test_set_and_get():
+    cache = ReportCache()
+    cache.set("day", DAY, "text", generation=cache.generation(DAY))
+    assert cache.get("day", DAY) == "text"
+    assert cache.stats()['hits'] == 1
+
+
+def test_invalidation_during_read_drops_set():
+    cache = ReportCache()
+    generation = cache.generation(DAY)
+    # Отчет за день сохранен, пока сводка читалась из БД
+    cache.invalidate_day(DAY)
+    cache.set("day", DAY, "stale", generation=generation)
+    assert cache.get("day", DAY) is None
+
+
+def test_other_day_invalidation_keeps_set():
+    cache = ReportCache()
+    generation = cache.generation(DAY)
+    cache.invalidate_day(date(2024, 3, 2))
+    cache.set("day", DAY, "text", generation=generation)
+    assert cache.get("day", DAY) == "text"
+
+
+def test_clear_changes_epoch():
+    cache = ReportCache()
+    cache.invalidate_day(DAY)
+    generation = cache.generation(DAY)
+    # После clear счетчики дней обнулены, но снимок до clear все равно устарел
+    cache.clear()
+    assert cache.generation(DAY) != generation
+    cache.set("day", DAY, "stale", generation=generation)
+    assert cache.get("day", DAY) is None
+
+
+def test_invalidate_day_drops_entries():
+    cache = ReportCache()
+    cache.set("day", DAY, "text", branch=1)
+    cache.set("day", date(2024, 3, 2), "other")
+    cache.invalidate_day(DAY)
+    assert cache.get("day", DAY, branch=1) is None
+    assert cache.get("day", date(2024, 3, 2)) == "other"
@@ -0,0 +1,86 @@
+from datetime import date, datetime
+from aiohttp.test_utils import TestClient, TestServer, make_mocked_request
+from database.models import Branch, Employee, Report
+from database.session import async_session_maker
+from services.reporting_api import DataVersions, ReportingApi
+from conftest import run
+
+QUERY = "/api/summaries/daily?from=2024-03-01&to=2024-03-07"
+
+
+def _api() -> ReportingApi:
+    api = ReportingApi(
+        host="127.0.0.1", port=0, db_url="", pool_size=1,
+        max_concurrency=4, page_size=100, max_page_size=1000
+    )
+    api._session_maker = async_session_maker
+    return api
+
+
+def _etag(api: ReportingApi, first_day=date(2024, 3, 1), last_day=date(2024, 3, 7)) -> str:
+    return api.versions.etag(make_mocked_request("GET", QUERY), *api._range_parts(first_day, last_day))
+
+
+def test_day_bumps_change_only_their_range():
+    api = _api()
+    etag = _etag(api)
+    api.versions.bump_day("2024-03-20")
+    assert _etag(api) == etag
+    api.versions.bump_day("2024-03-03")
+    assert _etag(api) != etag
+
+
+def test_entity_bumps_change_range_etag():
+    api = _api()
+    etag = _etag(api)
+    api.versions.bump("employee", "5")
+    after_employee = _etag(api)
+    api.versions.bump("branch", "1")
+    assert len({etag, after_employee, _etag(api)}) == 3
+
+
+def test_resolved_range_is_part_of_etag():
+    # Без from/to диапазон считается от сегодня: та же строка запроса после полуночи - другой диапазон
+    api = _api()
+    assert _etag(api, last_day=date(2024, 3, 7)) != _etag(api, last_day=date(2024, 3, 8))
+
+
+def test_epoch_reset_invalidates_everything():
+    versions = DataVersions()
+    request = make_mocked_request("GET", "/api/branches")
+    etag = versions.etag(request, versions.entities["branch"])
+    versions.bump_day("2024-03-03")
+    versions.bump_day(None)
+    assert versions.days == {}
+    assert versions.etag(request, versions.entities["branch"]) != etag
+
+
+def test_daily_not_modified_until_day_changes(db):
+    async def scenario():
+        async with async_session_maker() as session:
+            branch = Branch(name="Center")
+            session.add(branch)
+            await session.flush()
+            employee = Employee(telegram_id=101, full_name="Anna", branch_id=branch.id)
+            session.add(employee)
+            await session.flush()
+            session.add(Report(
+                report_date=datetime(2024, 3, 3, 12), total_income=100, cash=50, cashless=50,
+                cash_balance=10, clients_count=3, cash_to_suppliers=0, cashless_to_suppliers=0,
+                employee_id=employee.id, branch_id=branch.id
+            ))
+            await session.commit()
+
+        api = _api()
+        statuses = []
+        async with TestClient(TestServer(api.app())) as client:
+            first = await client.get(QUERY)
+            statuses.append(first.status)
+            assert len(await first.json()) == 1
+            etag = first.headers["ETag"]
+            statuses.append((await client.get(QUERY, headers={"If-None-Match": etag})).status)
+            api.versions.bump_day("2024-03-03")
+            statuses.append((await client.get(QUERY, headers={"If-None-Match": etag})).status)
+        return statuses
+
+    assert run(scenario()) == [200, 304, 200]
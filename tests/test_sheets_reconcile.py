@@ -0,0 +1,155 @@
+from datetime import date, datetime
+import pytest
+from sqlalchemy import select
+from benchmarks.fake_gspread import FakeGspreadClient
+from database.models import Branch, Employee, Report, SheetDayDigest
+from database.session import async_session_maker
+from services.google_sheets import REPORTS_WORKSHEET, GoogleSheetsService
+from services.sheets_reconcile import (
+    SheetRow, SheetsReconciler, build_plan, normalize_row, row_hash
+)
+from conftest import run
+
+ROW_A = ["2024-03-01", "Center", "Anna", 100.0, 50.0, 50.0, 10.0, 3, 0.0, 0.0, 1, "2024-03-01 20:00:00"]
+ROW_B = ["2024-03-02", "Center", "Anna", 200.0, 150.0, 50.0, 20.0, 5, 0.0, 0.0, 1, "2024-03-02 20:00:00"]
+
+
+def _sheet(*rows):
+    result = []
+    for number, cells in enumerate(rows, start=2):
+        row = normalize_row(cells)
+        result.append(SheetRow(number, row, row_hash(row)))
+    return result
+
+
+def test_in_sync_plan_is_empty():
+    plan, in_sync = build_plan(_sheet(ROW_B, ROW_A), [ROW_A, ROW_B])
+    assert in_sync
+    assert plan.size == 0
+
+
+def test_sheet_formatting_is_normalized():
+    # Ручной ввод: число с запятой и дата серийным номером Sheets
+    edited = list(ROW_A)
+    edited[3] = "100,0"
+    edited[0] = 45352
+    plan, in_sync = build_plan(_sheet(edited), [ROW_A])
+    assert in_sync, plan
+
+
+def test_changed_row_is_updated_in_place():
+    edited = list(ROW_A)
+    edited[4] = 49.0
+    plan, in_sync = build_plan(_sheet(edited, ROW_B), [ROW_A, ROW_B])
+    assert not in_sync
+    assert plan.updates == [(2, ROW_A)]
+    assert plan.appends == plan.deletes == []
+    assert plan.changed_days == 1
+
+
+def test_missing_and_extra_rows():
+    extra = list(ROW_B)
+    extra[11] = "2024-03-02 21:00:00"
+    plan, _ = build_plan(_sheet(ROW_B, extra), [ROW_A, ROW_B])
+    assert plan.appends == [ROW_A]
+    assert plan.deletes == [3]
+    assert plan.updates == []
+    assert plan.changed_days == 2
+
+
+def test_duplicate_rows_are_deleted():
+    plan, _ = build_plan(_sheet(ROW_A, ROW_A), [ROW_A])
+    assert plan.deletes == [3] or plan.deletes == [2]
+    assert plan.size == 1
+
+
+class CountingReconciler(SheetsReconciler):
+    """Запоминает дни, строки которых читались из БД"""
+
+    def __init__(self):
+        super().__init__(chunk_rows=100, ranges_per_call=5, max_changes=100, settle_seconds=600)
+        self.loaded = []
+
+    async def load_days(self, days, cutoff=None):
+        days = sorted(days)
+        self.loaded.extend(days)
+        return await super().load_days(days, cutoff)
+
+
+@pytest.fixture
+def sheet(db):
+    client = FakeGspreadClient()
+    GoogleSheetsService.client_factory = lambda: client
+    yield client.spreadsheet.worksheet(REPORTS_WORKSHEET)
+    GoogleSheetsService.client_factory = None
+
+
+async def _seed():
+    async with async_session_maker() as session:
+        branch = Branch(name="Center")
+        session.add(branch)
+        await session.flush()
+        employee = Employee(telegram_id=101, full_name="Anna", branch_id=branch.id)
+        session.add(employee)
+        await session.flush()
+        for day in (1, 2, 3, 10):
+            _report(session, employee, datetime(2024, 3, day, 12), datetime(2024, 3, day, 20))
+        await session.commit()
+        return employee
+
+
+def _report(session, employee, report_date, created_at):
+    session.add(Report(
+        report_date=report_date, total_income=100, cash=50, cashless=50, cash_balance=10,
+        clients_count=3, cash_to_suppliers=0, cashless_to_suppliers=0,
+        employee_id=employee.id, branch_id=employee.branch_id, created_at=created_at
+    ))
+
+
+async def _digest_days():
+    async with async_session_maker() as session:
+        return sorted((await session.execute(select(SheetDayDigest.day))).scalars())
+
+
+def test_reconciler_persists_digests_and_loads_changed_days(sheet):
+    employee = run(_seed())
+    reconciler = CountingReconciler()
+
+    plan = run(reconciler.run())
+    # Последний день не устоялся: его строки моложе cutoff и не сверяются
+    assert len(plan.appends) == 3
+    assert len(sheet.rows) == 3
+    assert run(_digest_days()) == [date(2024, 3, 1), date(2024, 3, 2), date(2024, 3, 3)]
+
+    reconciler.loaded.clear()
+    plan = run(reconciler.run())
+    assert plan.size == 0
+    # Устоявшиеся дни с неизменным признаком берутся из sheet_day_digest
+    assert reconciler.loaded == [date(2024, 3, 10)]
+
+    async def add_report():
+        async with async_session_maker() as session:
+            _report(session, employee, datetime(2024, 3, 2, 15), datetime(2024, 3, 2, 21))
+            await session.commit()
+
+    run(add_report())
+    reconciler.loaded.clear()
+    plan = run(reconciler.run())
+    assert reconciler.loaded == [date(2024, 3, 2), date(2024, 3, 10)]
+    assert len(plan.appends) == 1
+    assert plan.changed_days == 1
+
+
+def test_reconciler_repairs_edited_sheet(sheet):
+    run(_seed())
+    reconciler = CountingReconciler()
+    run(reconciler.run())
+    original = list(sheet.rows[0])
+    sheet.rows[0][4] = 1.0
+
+    reconciler.loaded.clear()
+    plan = run(reconciler.run())
+    assert [number for number, _ in plan.updates] == [1]
+    assert sheet.rows[0] == original
+    # Строки БД прочитаны только для расходящегося дня
+    assert reconciler.loaded == [date(2024, 3, 10), date(2024, 3, 1)]
@@ -0,0 +1,91 @@
+from datetime import date, datetime
+from database.models import Branch, Employee, Report
+from database.session import async_session_maker
+from services.submission_tracker import SubmissionTracker
+from conftest import run
+
+DAY = date(2024, 3, 1)
+
+
+async def _seed():
+    async with async_session_maker() as session:
+        west = Branch(name="Los Angeles", timezone="America/Los_Angeles")
+        east = Branch(name="Vladivostok", timezone="Asia/Vladivostok")
+        session.add_all([west, east])
+        await session.flush()
+        session.add_all([
+            Employee(id=1, telegram_id=101, full_name="Anna", branch_id=west.id),
+            Employee(id=2, telegram_id=102, full_name="Boris", branch_id=west.id),
+            Employee(id=3, telegram_id=103, full_name="Vera", branch_id=east.id),
+            Employee(id=4, telegram_id=104, full_name="Gleb", branch_id=east.id, is_active=False)
+        ])
+        await session.commit()
+        return west.id, east.id
+
+
+def _tracker(db):
+    tracker = SubmissionTracker("Europe/Moscow")
+    west, east = run(_seed())
+    run(tracker.rebuild())
+    return tracker, west, east
+
+
+def test_rebuild_indexes_active_employees(db):
+    tracker, west, east = _tracker(db)
+    assert [e.id for e in tracker.employees] == [1, 2, 3]
+    assert {e.id for e in tracker.missing(day=DAY)} == {1, 2, 3}
+    assert tracker.branch_completion(DAY) == {west: (0, 2), east: (0, 1)}
+
+
+def test_masks_after_submissions(db):
+    tracker, west, east = _tracker(db)
+    # 12:00 UTC - 1 марта и в Лос-Анджелесе, и во Владивостоке
+    tracker.mark_submitted(2, datetime(2024, 3, 1, 12))
+    tracker.mark_submitted(3, datetime(2024, 3, 1, 12))
+    assert [e.id for e in tracker.missing(day=DAY)] == [1]
+    assert tracker.submitted_count(DAY) == 2
+    assert tracker.branch_completion(DAY) == {west: (1, 2), east: (1, 1)}
+    assert tracker.missing(zone="Asia/Vladivostok", day=DAY) == []
+
+
+def test_branch_local_day(db):
+    tracker, west, east = _tracker(db)
+    # 20:00 UTC 1 марта: во Владивостоке уже 2 марта, в Лос-Анджелесе - 1 марта
+    moment = datetime(2024, 3, 1, 20)
+    assert tracker.local_day(east, moment) == date(2024, 3, 2)
+    assert tracker.local_day(west, moment) == DAY
+    tracker.mark_submitted(3, moment)
+    tracker.mark_submitted(1, moment)
+    assert tracker.submitted_count(DAY) == 1
+    assert tracker.submitted_count(date(2024, 3, 2)) == 1
+
+
+def test_unknown_employee_marks_stale(db):
+    tracker, _, _ = _tracker(db)
+    tracker.mark_submitted(99, datetime(2024, 3, 1, 12))
+    assert tracker._stale
+    assert tracker.submitted_count(DAY) == 0
+
+
+def test_rebuild_replays_recent_reports(db):
+    tracker, west, _ = _tracker(db)
+
+    async def report():
+        async with async_session_maker() as session:
+            session.add(Report(
+                report_date=datetime.utcnow(), total_income=100, cash=50, cashless=50,
+                cash_balance=10, clients_count=3, cash_to_suppliers=0, cashless_to_suppliers=0,
+                employee_id=1, branch_id=west
+            ))
+            await session.commit()
+
+    run(report())
+    run(tracker.rebuild())
+    assert 1 not in {e.id for e in tracker.missing(zone="America/Los_Angeles")}
+
+
+def test_old_days_are_dropped(db):
+    tracker, _, _ = _tracker(db)
+    for day in range(1, 6):
+        tracker.mark_submitted(1, datetime(2024, 3, day, 12))
+    assert sorted(tracker._days) == [date(2024, 3, day) for day in range(3, 6)]
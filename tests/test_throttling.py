@@ -0,0 +1,72 @@
+import asyncio
+import time
+from middlewares.throttling import TokenBucket
+from services.outbound import BULK, INTERACTIVE, OutboundGate
+
+
+def test_bucket_burst_then_refill():
+    bucket = TokenBucket(rate=2, burst=3)
+    now = bucket.updated
+    assert [bucket.take(now) for _ in range(4)] == [True, True, True, False]
+    # За полсекунды при rate=2 набегает ровно один токен
+    assert bucket.take(now + 0.5)
+    assert not bucket.take(now + 0.5)
+
+
+def test_bucket_caps_at_burst():
+    bucket = TokenBucket(rate=10, burst=2)
+    now = bucket.updated + 60
+    assert [bucket.take(now) for _ in range(3)] == [True, True, False]
+
+
+def test_gate_priority_order():
+    async def scenario():
+        gate = OutboundGate(concurrency=1, rate=0, chat_interval=0)
+        order = []
+        await gate.acquire(INTERACTIVE)
+
+        async def send(name, priority):
+            await gate.acquire(priority)
+            order.append(name)
+            gate.release()
+
+        tasks = [
+            asyncio.create_task(send("bulk-1", BULK)),
+            asyncio.create_task(send("bulk-2", BULK)),
+            asyncio.create_task(send("answer", INTERACTIVE))
+        ]
+        await asyncio.sleep(0)
+        assert gate.waiting() == {"interactive": 1, "bulk": 2}
+        gate.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["answer", "bulk-1", "bulk-2"]
+
+
+def test_gate_rate_wait_does_not_hold_slot():
+    async def scenario():
+        gate = OutboundGate(concurrency=4, rate=20, chat_interval=0)
+        # Ведро пустое: следующий токен через 1/20 секунды
+        gate.bucket.tokens = 0
+        gate.bucket.updated = time.monotonic()
+        task = asyncio.create_task(gate.acquire(BULK))
+        await asyncio.sleep(0)
+        assert gate._active == 0
+        started = time.monotonic()
+        await task
+        assert gate._active == 1
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 0.5
+
+
+def test_gate_pause_delays_all_sends():
+    async def scenario():
+        gate = OutboundGate(concurrency=2, rate=0, chat_interval=0)
+        gate.pause(0.1)
+        started = time.monotonic()
+        await gate.acquire(INTERACTIVE)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.09
@@ -0,0 +1,94 @@
+import asyncio
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from database.models import LeaderLease
+from database.session import async_session_maker, engine
+from database.write_queue import WriteQueue, run_after_commit
+from conftest import run
+
+
+def _lease(name: str):
+    return insert(LeaderLease).values(name=name, holder="test", expires_at=0)
+
+
+async def _names():
+    async with async_session_maker() as session:
+        return set((await session.execute(select(LeaderLease.name))).scalars())
+
+
+def test_failed_work_rolls_back_only_its_savepoint(db):
+    queue = WriteQueue(async_sessionmaker(engine, class_=AsyncSession), max_delay=0.05)
+    fired = []
+
+    async def good(session, name):
+        await session.execute(_lease(name))
+        run_after_commit(session, lambda: fired.append(name))
+        return name
+
+    async def bad(session):
+        await session.execute(_lease("bad"))
+        run_after_commit(session, lambda: fired.append("bad"))
+        # Та же строка второй раз - IntegrityError внутри SAVEPOINT
+        await session.execute(_lease("bad"))
+
+    async def scenario():
+        results = await asyncio.gather(
+            queue.submit(lambda session: good(session, "a")),
+            queue.submit(bad),
+            queue.submit(lambda session: good(session, "b")),
+            return_exceptions=True
+        )
+        await queue.close()
+        return results, await _names()
+
+    (first, error, second), names = run(scenario())
+    assert (first, second) == ("a", "b")
+    assert isinstance(error, Exception)
+    assert names == {"a", "b"}
+    assert fired == ["a", "b"]
+
+
+def test_run_after_commit_without_transaction_runs_now(db):
+    async def scenario():
+        fired = []
+        async with async_session_maker() as session:
+            run_after_commit(session, lambda: fired.append(1))
+        return fired
+
+    assert run(scenario()) == [1]
+
+
+def test_run_after_commit_waits_for_outer_commit(db):
+    async def scenario():
+        fired = []
+        async with async_session_maker() as session:
+            # Объект еще не сброшен в БД: транзакции нет, но коммит впереди
+            session.add(LeaderLease(name="a", holder="test", expires_at=0))
+            run_after_commit(session, lambda: fired.append("a"))
+            async with session.begin_nested():
+                await session.execute(_lease("b"))
+            # Освобождение SAVEPOINT - еще не фиксация
+            before_commit = list(fired)
+            await session.commit()
+        return before_commit, fired
+
+    before_commit, fired = run(scenario())
+    assert before_commit == []
+    assert fired == ["a"]
+
+
+def test_run_after_commit_dropped_on_rollback(db):
+    async def scenario():
+        fired = []
+        async with async_session_maker() as session:
+            await session.execute(_lease("a"))
+            run_after_commit(session, lambda: fired.append("a"))
+            await session.rollback()
+            # Следующая транзакция той же сессии не выполняет сброшенный callback
+            await session.execute(_lease("b"))
+            await session.commit()
+        return fired, await _names()
+
+    fired, names = run(scenario())
+    assert fired == []
+    assert names == {"b"}
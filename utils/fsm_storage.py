@@ -0,0 +1,40 @@
+from typing import Any, Dict, Optional
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from utils.metrics import registry
+
+FSM_STORAGE_SECONDS = registry.histogram(
+    "fsm_storage_seconds",
+    "Длительность операций хранилища FSM",
+    ["operation"]
+)
+
+
+class InstrumentedStorage(BaseStorage):
+    """Обертка над хранилищем FSM с замером времени операций"""
+
+    def __init__(self, storage: BaseStorage):
+        self.storage = storage
+
+    async def set_state(self, key: StorageKey, state: Optional[State | str] = None) -> None:
+        with FSM_STORAGE_SECONDS.time(operation="set_state"):
+            await self.storage.set_state(key, state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        with FSM_STORAGE_SECONDS.time(operation="get_state"):
+            return await self.storage.get_state(key)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        with FSM_STORAGE_SECONDS.time(operation="set_data"):
+            await self.storage.set_data(key, data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        with FSM_STORAGE_SECONDS.time(operation="get_data"):
+            return await self.storage.get_data(key)
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        with FSM_STORAGE_SECONDS.time(operation="update_data"):
+            return await self.storage.update_data(key, data)
+
+    async def close(self) -> None:
+        await self.storage.close()
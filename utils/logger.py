@@ -1,25 +1,224 @@
+import atexit
+import glob
+import gzip
+import json
 import logging
+import os
+import queue
+import shutil
 import sys
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import BaseRotatingHandler, QueueHandler, QueueListener
+from typing import Any, Dict, Optional, Tuple
+from config import config
+from utils.metrics import registry
+
+# Контекст текущего апдейта: update_id, user_id, handler
+log_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("log_context", default=None)
+
+CONTEXT_FIELDS = ("update_id", "user_id", "handler")
+
+
+def bind_log_context(**fields):
+    """Дополнить контекст текущего апдейта (если он есть)"""
+    context = log_context.get()
+    if context is not None:
+        context.update(fields)
+
+
+class ContextFilter(logging.Filter):
+    """Копирует контекст апдейта в запись - в потоке цикла, пока он доступен"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = log_context.get()
+        if context:
+            for field in CONTEXT_FIELDS:
+                if field in context:
+                    setattr(record, field, context[field])
+        return True
+
+
+class ErrorRateLimitFilter(logging.Filter):
+    """Не больше burst одинаковых ошибок (по месту вызова) за window секунд.
+
+    Первая запись после окна получает поле suppressed - сколько пропущено.
+    """
+
+    def __init__(self, burst: int, window: float = 60):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        # место вызова -> (начало окна, записей в окне, пропущено)
+        self._seen: Dict[Tuple, Tuple[float, int, int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno < logging.ERROR:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        started, count, suppressed = self._seen.get(key, (now, 0, 0))
+        if now - started >= self.window:
+            started, count = now, 0
+        if count >= self.burst:
+            self._seen[key] = (started, count, suppressed + 1)
+            return False
+        if suppressed:
+            record.suppressed = suppressed
+        self._seen[key] = (started, count + 1, 0)
+        if len(self._seen) > 1000:
+            self._seen = {k: v for k, v in self._seen.items() if now - v[0] < self.window}
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno
+        }
+        for field in CONTEXT_FIELDS + ("suppressed",):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Формат консоли как раньше, плюс контекст апдейта"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        context = " ".join(
+            f"{field}={getattr(record, field)}"
+            for field in CONTEXT_FIELDS + ("suppressed",)
+            if getattr(record, field, None) is not None
+        )
+        return f"{text} [{context}]" if context else text
+
+
+class SizeAndTimeRotatingFileHandler(BaseRotatingHandler):
+    """Ротация по размеру или по времени, старые файлы сжимаются в .gz.
+
+    Работает в потоке QueueListener, поэтому сжатие не блокирует цикл.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, interval: float, backup_count: int):
+        super().__init__(filename, "a", encoding="utf-8", delay=False)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+        self.rollover_at = time.time() + interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.interval > 0 and time.time() >= self.rollover_at:
+            return True
+        if self.max_bytes > 0 and self.stream is not None:
+            # Без форматирования записи: файл может превысить max_bytes на одну
+            # строку, зато каждая строка форматируется один раз
+            return self.stream.tell() >= self.max_bytes
+        return False
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        target = f"{self.baseFilename}.{time.strftime('%Y%m%d-%H%M%S')}"
+        suffix = 1
+        while os.path.exists(target + ".gz"):
+            target = f"{self.baseFilename}.{time.strftime('%Y%m%d-%H%M%S')}.{suffix}"
+            suffix += 1
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            os.rename(self.baseFilename, target)
+            with open(target, "rb") as source, gzip.open(target + ".gz", "wb") as compressed:
+                shutil.copyfileobj(source, compressed)
+            os.remove(target)
+        if self.backup_count > 0:
+            backups = sorted(glob.glob(f"{glob.escape(self.baseFilename)}.*.gz"), key=os.path.getmtime)
+            for old in backups[:-self.backup_count]:
+                os.remove(old)
+        self.stream = self._open()
+        self.rollover_at = time.time() + self.interval
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler, который при переполненной очереди отбрасывает запись, а не блокирует цикл"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Только подставляем аргументы (они могут измениться после вызова).
+        # Форматирование и трейсбек - в потоке записи; копия записи не нужна,
+        # других хендлеров у логгеров с очередью нет
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
 
 def setup_logger():
     logger = logging.getLogger(__name__)
-    logger.setLevel(logging.INFO)
-    
-    # Форматтер
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
+    logger.setLevel(getattr(logging, config.LOG_LEVEL.upper(), logging.INFO))
+
     # Консольный хендлер
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # Файловый хендлер
-    file_handler = logging.FileHandler('bot.log', encoding='utf-8')
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
-    return logger
-
-logger = setup_logger()
\ No newline at end of file
+    console_handler.setFormatter(TextFormatter())
+
+    # Файловый хендлер: JSON, ротация по размеру и времени со сжатием
+    file_handler = SizeAndTimeRotatingFileHandler(
+        config.LOG_FILE,
+        max_bytes=config.LOG_MAX_BYTES,
+        interval=config.LOG_ROTATE_HOURS * 3600,
+        backup_count=config.LOG_BACKUP_COUNT
+    )
+    file_handler.setFormatter(JsonFormatter())
+
+    # В цикле событий запись только кладется в очередь, весь ввод-вывод -
+    # в фоновом потоке QueueListener
+    log_queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(ErrorRateLimitFilter(config.LOG_ERROR_BURST, window=60))
+    queue_handler.addFilter(ContextFilter())
+    listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.addHandler(queue_handler)
+    # Ошибки обработчиков aiogram пишет в свой логгер - туда же
+    aiogram_logger = logging.getLogger("aiogram")
+    aiogram_logger.addHandler(queue_handler)
+    aiogram_logger.propagate = False
+
+    return logger, queue_handler, listener
+
+logger, log_queue_handler, log_listener = setup_logger()
+
+registry.gauge(
+    "log_records_dropped",
+    "Записи лога, отброшенные из-за переполненной очереди",
+    callback=lambda: log_queue_handler.dropped
+)
+registry.gauge(
+    "log_queue_size",
+    "Записи лога в очереди на запись",
+    callback=lambda: log_queue_handler.queue.qsize()
+)
@@ -0,0 +1,103 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+from config import config
+from utils.logger import logger
+from utils.metrics import registry
+
+LOOP_LAG_SECONDS = registry.histogram(
+    "event_loop_lag_seconds",
+    "Задержка планирования event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+LOOP_LAG_CURRENT = registry.gauge(
+    "event_loop_lag_current_seconds",
+    "Последняя измеренная задержка event loop"
+)
+LOOP_STALLS = registry.counter(
+    "event_loop_stalls_total",
+    "Блокировки event loop дольше порога"
+)
+
+
+class LoopLagMonitor:
+    """Замер задержки event loop и захват стека блокирующего кода"""
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, keep_stalls: int = 20):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = deque(maxlen=keep_stalls)
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._heartbeat = time.monotonic()
+            LOOP_LAG_SECONDS.observe(lag)
+            LOOP_LAG_CURRENT.set(lag)
+
+    def _watch(self):
+        reported_heartbeat = None
+        while not self._stop.wait(self.interval / 2):
+            heartbeat = self._heartbeat
+            blocked_for = time.monotonic() - heartbeat - self.interval
+            # Один захват стека на одну блокировку
+            if blocked_for < self.threshold or heartbeat == reported_heartbeat:
+                continue
+            reported_heartbeat = heartbeat
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            LOOP_STALLS.inc()
+            self.stalls.append({
+                'at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+                'blocked_ms': round(blocked_for * 1000),
+                'stack': stack
+            })
+            logger.warning(
+                f"Event loop blocked for {blocked_for * 1000:.0f} ms, stack:\n{stack}"
+            )
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._probe())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._watchdog = None
+
+    def recent_stalls(self) -> List[Dict]:
+        return list(self.stalls)
+
+
+loop_monitor = LoopLagMonitor(
+    interval=config.LOOP_LAG_INTERVAL_MS / 1000,
+    threshold=config.LOOP_LAG_THRESHOLD_MS / 1000
+)
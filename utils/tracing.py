@@ -0,0 +1,61 @@
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+
+class UpdateTrace:
+    """Таймлайн обработки одного апдейта"""
+
+    __slots__ = ("update_id", "user_id", "started", "duration", "spans")
+
+    def __init__(self, update_id: int, user_id: Optional[int] = None):
+        self.update_id = update_id
+        self.user_id = user_id
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        # (тип, имя, смещение от начала апдейта, длительность)
+        self.spans: List[tuple] = []
+
+    def add_span(self, kind: str, name: str, duration: float):
+        offset = time.perf_counter() - duration - self.started
+        self.spans.append((kind, name, offset, duration))
+
+    def total(self, kind: str) -> float:
+        return sum(span[3] for span in self.spans if span[0] == kind)
+
+    @property
+    def handler_name(self) -> str:
+        for kind, name, _, _ in self.spans:
+            if kind == "handler":
+                return name
+        return ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        handler_time = self.total("handler")
+        return {
+            'update_id': self.update_id,
+            'user_id': self.user_id,
+            'handler': self.handler_name,
+            'duration_ms': round(self.duration * 1000, 3),
+            'handler_ms': round(handler_time * 1000, 3),
+            'middleware_ms': round((self.duration - handler_time) * 1000, 3),
+            'spans': [
+                {
+                    'kind': kind,
+                    'name': name,
+                    'offset_ms': round(offset * 1000, 3),
+                    'duration_ms': round(duration * 1000, 3)
+                }
+                for kind, name, offset, duration in self.spans
+            ]
+        }
+
+
+current_trace: ContextVar[Optional[UpdateTrace]] = ContextVar("current_trace", default=None)
+
+
+def record_span(kind: str, name: str, duration: float):
+    """Добавить участок в таймлайн текущего апдейта, если он трассируется"""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add_span(kind, name, duration)